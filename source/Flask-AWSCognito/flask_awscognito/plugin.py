@@ -95,9 +95,7 @@ class AWSCognitoAuthentication:
 
             access_token = extract_access_token(request.headers)
             try:
-                self.token_service.verify(access_token)
-                self.claims = self.token_service.claims
-                g.cognito_claims = self.claims
+                g.cognito_claims = self.token_service.verify(access_token)
             except TokenVerifyError as e:
                 _ = request.data
                 ##Original - abort(make_response(jsonify(message=str(e)), 401))
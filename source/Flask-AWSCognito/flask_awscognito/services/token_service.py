@@ -100,3 +100,4 @@ class TokenService:
         self._check_audience(claims)
 
         self.claims = claims
+        return claims
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Engines sending many independent per-resource AWS API calls, for example one AWS Lambda list_tags
+# or Amazon S3 get_bucket_tagging call per resource, through one synchronous method.
+# The "threads" engine sends the calls from a thread pool with the pooled Boto3 clients.
+# The "asyncio" engine sends every request's calls from one event loop thread with aiobotocore
+# clients, at most max_concurrency calls at a time, & needs the aiobotocore package.
+# tag-tamer-engine-check.py checks the asyncio engine against a stub endpoint.
+# Included class & methods
+# class - api_call_engine
+#  method - configure
+#  method - run_calls
+
+# Import asyncio to send the calls of the asyncio engine
+import asyncio
+# Import AWS module for python
+import botocore
+# Import collections to use ordered dictionaries for LRU ordering
+from collections import OrderedDict
+# Import the thread pool counting AWS API calls for the request using it, to send the calls of the threads engine
+from api_metrics import context_thread_pool, tag_tamer_api_metrics
+# Import hashlib to key clients without holding session tokens in the keys
+import hashlib
+# Import logging module
+import logging
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import threading to run the event loop of the asyncio engine
+import threading
+
+# The asyncio engine is only available when aiobotocore is installed
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session as get_aio_session
+except ImportError:
+    AioConfig = None
+    get_aio_session = None
+
+log = logging.getLogger(__name__)
+
+# Define api_call_engine class to send many independent AWS API calls & return their responses in order
+class api_call_engine:
+
+    #Class constructor
+    def __init__(self, engine='threads', max_concurrency=64, endpoint_urls=None, max_clients=256):
+        self.loop = None
+        self.lock = threading.Lock()
+        self.configure(engine, max_concurrency, endpoint_urls, max_clients)
+
+    # Choose the "threads" or "asyncio" engine, the maximum number of calls the asyncio engine has in flight,
+    # the service -> endpoint URL overrides of its clients, for example a local stub endpoint, & the maximum
+    # number of its cached clients
+    def configure(self, engine, max_concurrency, endpoint_urls=None, max_clients=256):
+        if engine == 'asyncio' and get_aio_session is None:
+            log.warning('The asyncio API call engine needs the aiobotocore package.  Using the threads engine instead')
+            engine = 'threads'
+        self.engine = engine
+        self.max_concurrency = max(max_concurrency, 1)
+        self.endpoint_urls = dict(endpoint_urls or dict())
+        self.max_clients = max_clients
+
+    # Returns the event loop of the asyncio engine, starting its thread on first use.  The loop's semaphore
+    # & client cache are only used from the loop thread
+    def _get_loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.semaphore = None
+                # (access key ID, session token hash, service, region) -> task creating the client
+                self.clients = OrderedDict()
+                self.aio_session = get_aio_session()
+                tag_tamer_api_metrics.register(self.aio_session.get_component('event_emitter'))
+                threading.Thread(target=self.loop.run_forever, name='api-call-engine', daemon=True).start()
+            return self.loop
+
+    # Returns the cached aiobotocore client of the service & region for the session credentials
+    async def _get_async_client(self, service, region, session_credentials):
+        session_token = session_credentials.get('SessionToken') or ''
+        client_key = (session_credentials.get('AccessKeyId'), hashlib.sha256(session_token.encode()).hexdigest(), service, region)
+        client_task = self.clients.get(client_key)
+        if client_task is None:
+            client_context = self.aio_session.create_client(service, region_name=region,
+                endpoint_url=self.endpoint_urls.get(service),
+                aws_access_key_id=session_credentials.get('AccessKeyId'),
+                aws_secret_access_key=session_credentials.get('SecretKey'),
+                aws_session_token=session_credentials.get('SessionToken'),
+                config=AioConfig(max_pool_connections=self.max_concurrency))
+            # Calls needing the client while it is created wait for the same task
+            client_task = asyncio.ensure_future(client_context.__aenter__())
+            self.clients[client_key] = client_task
+            while len(self.clients) > self.max_clients:
+                _, evicted_task = self.clients.popitem(last=False)
+                if evicted_task.done() and evicted_task.exception() is None:
+                    asyncio.ensure_future(evicted_task.result().close())
+        self.clients.move_to_end(client_key)
+        try:
+            return await client_task
+        except Exception:
+            self.clients.pop(client_key, None)
+            raise
+
+    # Returns the (response, None) or (None, ClientError) tuple of one call, waiting for a free call slot
+    async def _send_call(self, service, operation, region, params, session_credentials):
+        client = await self._get_async_client(service, region, session_credentials)
+        async with self.semaphore:
+            try:
+                return await getattr(client, operation)(**params), None
+            except botocore.exceptions.ClientError as error:
+                return None, error
+
+    # Returns the list of (response, ClientError) tuples of every (region, parameters) call.  The calls are
+    # counted for the request_metrics of the request sending them
+    async def _send_calls(self, service, operation, calls, session_credentials, this_request):
+        tag_tamer_api_metrics.set_request(this_request)
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self._send_call(service, operation, region, params, session_credentials)
+            for region, params in calls))
+
+    # Returns a list holding the (response, None) or (None, ClientError) tuple of each (region, parameters
+    # dictionary) call of the service's Boto3 operation, in call order.  The threads engine sends up to
+    # max_workers calls at a time.  Errors other than ClientErrors are raised to the caller
+    def run_calls(self, service, operation, calls, max_workers=16, **session_credentials):
+        calls = list(calls)
+        if not calls:
+            return list()
+        if self.engine == 'asyncio':
+            return asyncio.run_coroutine_threadsafe(self._send_calls(service, operation, calls, session_credentials,
+                tag_tamer_api_metrics.get_request()), self._get_loop()).result()
+
+        def _send_call(call):
+            region, params = call
+            try:
+                client = tag_tamer_session_pool.get_client(service, region, **session_credentials)
+                return getattr(client, operation)(**params), None
+            except botocore.exceptions.ClientError as error:
+                return None, error
+
+        with context_thread_pool(max_workers=max_workers) as executor:
+            return list(executor.map(_send_call, calls))
+
+# API call engine shared by every Tag Tamer module in this process
+tag_tamer_api_calls = api_call_engine()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Counters & latency histograms of every AWS API call sent by Tag Tamer, hooked into botocore's event system.
+# Calls are labelled by service, operation, the Flask route of the request that sent them & their outcome:
+# "success", "throttled", "client_error" or "error" when no response was received.  Throttled attempts &
+# retries are counted even when a later attempt succeeds.  Each request also keeps its own totals for its
+# summary log line.  Calls sent by worker threads are counted for the request that started the threads when
+# the threads run in a context_thread_pool.  Calls sent outside of a request are labelled "background".
+# Included class & methods
+# class - context_thread_pool
+#  method - submit
+# class - request_metrics
+#  method - get_summary
+# class - api_metrics
+#  method - register
+#  method - start_request
+#  method - end_request
+#  method - get_request
+#  method - set_request
+#  method - get_prometheus_metrics
+
+# Import bisect to find histogram buckets
+import bisect
+# Import collections to count calls
+from collections import Counter
+# Import thread pool to run worker threads in the context of their request
+from concurrent.futures import ThreadPoolExecutor
+# Import contextvars to follow the current request across threads & asyncio tasks
+import contextvars
+# Import logging module
+import logging
+# Import threading to guard the counters
+import threading
+# Import time methods
+from time import perf_counter
+
+log = logging.getLogger(__name__)
+
+# Error codes AWS returns when it throttles a call, as listed by botocore's standard retry mode
+throttle_error_codes = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException', 'TooManyRequestsException',
+    'ProvisionedThroughputExceededException', 'TransactionInProgressException', 'RequestLimitExceeded',
+    'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled', 'SlowDown', 'PriorRequestNotComplete',
+    'EC2ThrottledException'
+}
+# Upper bounds in seconds of the AWS API call & request latency histogram buckets
+api_call_duration_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+request_duration_buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+# The request_metrics of the request being served
+current_request = contextvars.ContextVar('tag_tamer_current_request', default=None)
+
+# Define context_thread_pool class, a thread pool running each task in a copy of the submitting thread's
+# context so the AWS API calls of its tasks are counted for the submitting request
+class context_thread_pool(ThreadPoolExecutor):
+
+    # Schedule the function to run in a copy of the caller's context & return its future
+    def submit(self, function, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, function, *args, **kwargs)
+
+# Define request_metrics class holding the AWS API call totals of one request
+class request_metrics:
+
+    #Class constructor
+    def __init__(self, route):
+        self.route = route
+        self.start_time = perf_counter()
+        self.duration = None
+        # "service:Operation" -> number of calls
+        self.api_calls = Counter()
+        self.throttled_attempts = 0
+        self.retries = 0
+        self.errors = 0
+        # Sum of the calls' latencies, larger than the request's duration when calls run concurrently
+        self.api_seconds = 0.0
+        self.lock = threading.Lock()
+
+    # Add one finished call
+    def _add_call(self, service, operation, outcome, retries, duration):
+        with self.lock:
+            self.api_calls[service + ':' + operation] += 1
+            self.retries += retries
+            self.api_seconds += duration
+            if outcome != 'success':
+                self.errors += 1
+
+    # Returns the request's summary log line
+    def get_summary(self):
+        with self.lock:
+            api_calls = ', '.join('{}={}'.format(operation, count) for operation, count in self.api_calls.most_common())
+            return 'Route "{}" took {:.3f}s & made {} AWS API calls ({} failed, {} throttled attempts, {} retries) taking {:.3f}s{}'.format(
+                self.route, self.duration if self.duration is not None else perf_counter() - self.start_time,
+                sum(self.api_calls.values()), self.errors, self.throttled_attempts, self.retries, self.api_seconds,
+                ': ' + api_calls if api_calls else '')
+
+# Returns the Prometheus label set text of the label names & values
+def _get_labels(label_names, label_values, extra_labels=''):
+    labels = ['{}="{}"'.format(label_name, str(label_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for label_name, label_value in zip(label_names, label_values)]
+    if extra_labels:
+        labels.append(extra_labels)
+    return '{' + ','.join(labels) + '}'
+
+# Define api_metrics class counting & timing the AWS API calls of every registered event emitter
+class api_metrics:
+
+    #Class constructor
+    def __init__(self):
+        # (service, operation, route, outcome) -> number of calls
+        self.calls = Counter()
+        # (service, operation, route) -> number of retries & of throttled attempts
+        self.retries = Counter()
+        self.throttled_attempts = Counter()
+        # labels -> [bucket counts, sum of the observations, number of observations]
+        self.call_durations = dict()
+        self.request_durations = dict()
+        self.lock = threading.Lock()
+
+    # Count & time the calls of every client created from now on by a Boto3, botocore or aiobotocore
+    # session's event emitter, for example session.events
+    def register(self, event_emitter):
+        event_emitter.register('before-parameter-build.*.*', self._start_call, unique_id='tag-tamer-api-metrics-start')
+        event_emitter.register('response-received.*.*', self._count_attempt, unique_id='tag-tamer-api-metrics-attempt')
+        event_emitter.register('after-call.*.*', self._end_call, unique_id='tag-tamer-api-metrics-end')
+        event_emitter.register('after-call-error.*.*', self._end_call_error, unique_id='tag-tamer-api-metrics-error')
+
+    # Start counting the calls of a request to the Flask route & return its request_metrics
+    def start_request(self, route):
+        this_request = request_metrics(route)
+        current_request.set(this_request)
+        return this_request
+
+    # Stop counting the calls of the request_metrics, or of the current request without one, add its duration
+    # to the route's histogram & return its request_metrics or None if no request was started
+    def end_request(self, this_request=None):
+        if this_request is None:
+            this_request = current_request.get()
+        if this_request is None:
+            return None
+        if current_request.get() is this_request:
+            current_request.set(None)
+        this_request.duration = perf_counter() - this_request.start_time
+        with self.lock:
+            self._observe(self.request_durations, (this_request.route,), request_duration_buckets, this_request.duration)
+        return this_request
+
+    # Returns the request_metrics of the current request or None outside of a request
+    def get_request(self):
+        return current_request.get()
+
+    # Count the calls of the current thread or asyncio task for the request_metrics, for example in the
+    # event loop of an asyncio engine
+    def set_request(self, this_request):
+        current_request.set(this_request)
+
+    # Add an observation to a histogram.  Called with the lock held
+    def _observe(self, histograms, labels, buckets, value):
+        histogram = histograms.get(labels)
+        if histogram is None:
+            histogram = [[0] * len(buckets), 0.0, 0]
+            histograms[labels] = histogram
+        bucket = bisect.bisect_left(buckets, value)
+        if bucket < len(buckets):
+            histogram[0][bucket] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    # Remember when the call started & which request sent it
+    def _start_call(self, model, context, **kwargs):
+        this_request = current_request.get()
+        context['tag_tamer_api_call'] = (model.service_model.service_name, model.name,
+            this_request.route if this_request is not None else 'background', this_request, perf_counter())
+
+    # Count an attempt of the call that AWS throttled
+    def _count_attempt(self, parsed_response, context, **kwargs):
+        call = context.get('tag_tamer_api_call')
+        if call is None or not parsed_response or parsed_response.get('Error', dict()).get('Code') not in throttle_error_codes:
+            return
+        service, operation, route, this_request, _ = call
+        with self.lock:
+            self.throttled_attempts[(service, operation, route)] += 1
+        if this_request is not None:
+            with this_request.lock:
+                this_request.throttled_attempts += 1
+
+    # Count the call with its outcome, retries & latency
+    def _add_call(self, context, outcome, retries):
+        call = context.get('tag_tamer_api_call')
+        if call is None:
+            return
+        service, operation, route, this_request, start_time = call
+        duration = perf_counter() - start_time
+        with self.lock:
+            self.calls[(service, operation, route, outcome)] += 1
+            if retries:
+                self.retries[(service, operation, route)] += retries
+            self._observe(self.call_durations, (service, operation, route), api_call_duration_buckets, duration)
+        if this_request is not None:
+            this_request._add_call(service, operation, outcome, retries, duration)
+
+    # Count a call that received a response
+    def _end_call(self, http_response, parsed, context, **kwargs):
+        error_code = parsed.get('Error', dict()).get('Code') if http_response.status_code >= 300 else None
+        if error_code is None and http_response.status_code < 300:
+            outcome = 'success'
+        elif error_code in throttle_error_codes:
+            outcome = 'throttled'
+        else:
+            outcome = 'client_error'
+        self._add_call(context, outcome, parsed.get('ResponseMetadata', dict()).get('RetryAttempts', 0))
+
+    # Count a call that ended without a response, for example after a connection error
+    def _end_call_error(self, exception, context, **kwargs):
+        self._add_call(context, 'error', 0)
+
+    # Returns the Prometheus text lines of a histogram metric
+    def _get_histogram_lines(self, name, help_text, label_names, histograms, buckets):
+        lines = ['# HELP {} {}'.format(name, help_text), '# TYPE {} histogram'.format(name)]
+        for labels, (bucket_counts, total, count) in sorted(histograms.items()):
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(buckets, bucket_counts):
+                cumulative_count += bucket_count
+                lines.append('{}_bucket{} {}'.format(name, _get_labels(label_names, labels, 'le="{}"'.format(upper_bound)), cumulative_count))
+            lines.append('{}_bucket{} {}'.format(name, _get_labels(label_names, labels, 'le="+Inf"'), count))
+            lines.append('{}_sum{} {}'.format(name, _get_labels(label_names, labels), total))
+            lines.append('{}_count{} {}'.format(name, _get_labels(label_names, labels), count))
+        return lines
+
+    # Returns every metric in the Prometheus text exposition format
+    def get_prometheus_metrics(self):
+        with self.lock:
+            lines = ['# HELP tag_tamer_aws_api_calls_total AWS API calls by service, operation, route & outcome',
+                '# TYPE tag_tamer_aws_api_calls_total counter']
+            for labels, count in sorted(self.calls.items()):
+                lines.append('tag_tamer_aws_api_calls_total{} {}'.format(_get_labels(('service', 'operation', 'route', 'outcome'), labels), count))
+            for name, help_text, counter in [
+                ('tag_tamer_aws_api_retries_total', 'AWS API call retries by service, operation & route', self.retries),
+                ('tag_tamer_aws_api_throttled_attempts_total', 'AWS API call attempts throttled by AWS by service, operation & route',
+                    self.throttled_attempts)
+            ]:
+                lines.extend(['# HELP {} {}'.format(name, help_text), '# TYPE {} counter'.format(name)])
+                for labels, count in sorted(counter.items()):
+                    lines.append('{}{} {}'.format(name, _get_labels(('service', 'operation', 'route'), labels), count))
+            lines.extend(self._get_histogram_lines('tag_tamer_aws_api_call_duration_seconds',
+                'AWS API call latency including retries by service, operation & route', ('service', 'operation', 'route'),
+                self.call_durations, api_call_duration_buckets))
+            lines.extend(self._get_histogram_lines('tag_tamer_request_duration_seconds', 'Request latency by route', ('route',),
+                self.request_durations, request_duration_buckets))
+        return '\n'.join(lines) + '\n'
+
+# Metrics shared by every Tag Tamer module in this process
+tag_tamer_api_metrics = api_metrics()
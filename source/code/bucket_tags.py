@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Concurrent reader of Amazon S3 bucket tags using one client per bucket region.
+# Included class & methods
+# class - bucket_tags
+#  method - get_bucket_region
+#  method - get_bucket_tags
+#  method - get_buckets_regions
+#  method - get_buckets_tags
+
+# Import AWS module for python
+import botocore
+# Import the engine sending the per-bucket calls concurrently
+from api_calls import tag_tamer_api_calls
+# Import logging module
+import logging
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import threading to guard the bucket region cache
+import threading
+
+log = logging.getLogger(__name__)
+
+# Bucket name -> bucket region, shared by every request since a bucket never changes region
+bucket_regions = dict()
+bucket_regions_lock = threading.Lock()
+
+# Define bucket_tags class to read the tags of many buckets concurrently
+class bucket_tags:
+
+    #Class constructor
+    def __init__(self, region, max_workers=16, **session_credentials):
+        self.session_credentials = session_credentials
+        self.region = region
+        self.max_workers = max_workers
+
+    # Returns the pooled S3 client for the given region, shared by the worker threads
+    def _get_client(self, region):
+        return tag_tamer_session_pool.get_client('s3', region, **self.session_credentials)
+
+    # Cache & return the bucket's region from its get_bucket_location response
+    def _set_bucket_region(self, bucket_name, response):
+        # Buckets in us-east-1 have no location constraint & "EU" is the legacy name of eu-west-1
+        bucket_region = response.get('LocationConstraint') or 'us-east-1'
+        if bucket_region == 'EU':
+            bucket_region = 'eu-west-1'
+        with bucket_regions_lock:
+            bucket_regions[bucket_name] = bucket_region
+        return bucket_region
+
+    # Returns the (TagSet or None, ClientError or None) tuple of a bucket's get_bucket_tagging call
+    def _get_tags_result(self, bucket_name, response, error):
+        if error is None:
+            return response.get('TagSet'), None
+        if error.response['Error']['Code'] == 'NoSuchTagSet':
+            return None, None
+        log.error("Boto3 API returned error. function: {} - {}".format(bucket_name, error))
+        return None, error
+
+    # Returns the region of the named bucket using the cached location when known
+    def get_bucket_region(self, bucket_name):
+        with bucket_regions_lock:
+            if bucket_name in bucket_regions:
+                return bucket_regions[bucket_name]
+        try:
+            response = self._get_client(self.region).get_bucket_location(
+                Bucket=bucket_name
+            )
+        except botocore.exceptions.ClientError as error:
+            log.debug("Unable to get the location of bucket {} - {}".format(bucket_name, error))
+            return self.region
+        return self._set_bucket_region(bucket_name, response)
+
+    # Returns a tuple of the bucket's TagSet list, or None if the bucket has no tag set,
+    # & the Boto3 ClientError raised reading the tags or None if the read succeeded
+    def get_bucket_tags(self, bucket_name):
+        try:
+            client = self._get_client(self.get_bucket_region(bucket_name))
+            response = client.get_bucket_tagging(
+                Bucket=bucket_name
+            )
+            return self._get_tags_result(bucket_name, response, None)
+        except botocore.exceptions.ClientError as error:
+            return self._get_tags_result(bucket_name, None, error)
+
+    # Returns a dictionary of bucket name -> region for every named bucket.  The buckets missing from the
+    # region cache are located concurrently & a bucket that cannot be located is given this object's region
+    def get_buckets_regions(self, bucket_names):
+        with bucket_regions_lock:
+            unknown_bucket_names = [bucket_name for bucket_name in dict.fromkeys(bucket_names) if bucket_name not in bucket_regions]
+        responses = tag_tamer_api_calls.run_calls('s3', 'get_bucket_location',
+            [(self.region, {'Bucket': bucket_name}) for bucket_name in unknown_bucket_names], self.max_workers, **self.session_credentials)
+        for bucket_name, (response, error) in zip(unknown_bucket_names, responses):
+            if error is None:
+                self._set_bucket_region(bucket_name, response)
+            else:
+                log.debug("Unable to get the location of bucket {} - {}".format(bucket_name, error))
+        with bucket_regions_lock:
+            return {bucket_name: bucket_regions.get(bucket_name, self.region) for bucket_name in bucket_names}
+
+    # Returns a dictionary of bucket name -> (TagSet or None, ClientError or None) for every named
+    # bucket, reading the buckets concurrently with the API call engine
+    def get_buckets_tags(self, bucket_names):
+        bucket_names = list(dict.fromkeys(bucket_names))
+        buckets_regions = self.get_buckets_regions(bucket_names)
+        responses = tag_tamer_api_calls.run_calls('s3', 'get_bucket_tagging',
+            [(buckets_regions[bucket_name], {'Bucket': bucket_name}) for bucket_name in bucket_names], self.max_workers,
+            **self.session_credentials)
+        return {bucket_name: self._get_tags_result(bucket_name, response, error)
+            for bucket_name, (response, error) in zip(bucket_names, responses)}
@@ -4,16 +4,32 @@
 # SPDX-License-Identifier: MIT-0
 
 # Purpose - functions to retrieve information regarding Amazon Cognito 
-# user pools & users
+# user pools & users.  Users' credentials are cached until shortly before they expire
 
 # Import AWS module for python
 import botocore
 import boto3
+# Import hashlib to key cached credentials without holding id tokens in the keys
+import hashlib
 # Import logging module
 import logging
+# Import threading to guard the credentials cache
+import threading
+# Import epoch time method
+from time import time
 
 log = logging.getLogger(__name__)
 
+# id token hash -> the user's Cognito identity credentials
+user_credentials_cache = dict()
+# id token hash -> lock held while the user's credentials are retrieved, so concurrent requests wait for one retrieval
+user_credentials_loading = dict()
+user_credentials_lock = threading.Lock()
+# Cached credentials are replaced this many seconds before they expire
+credentials_refresh_seconds = 300
+# Region -> Cognito Identity client shared by every request thread
+cognito_identity_clients = dict()
+
 # Function to return the authenticated user's user pool group ARN's
 def get_user_group_arns(user_name, user_pool_id, region):
     try:
@@ -30,13 +46,48 @@ def get_user_group_arns(user_name, user_pool_id, region):
         group_role_arn = False
     return group_role_arn
 
+# Returns the cached credentials of the id token hash or None if they are missing or about to expire
+def _get_cached_user_credentials(cache_key):
+    with user_credentials_lock:
+        cached_credentials = user_credentials_cache.get(cache_key)
+    if cached_credentials and cached_credentials['Expiration'].timestamp() - credentials_refresh_seconds > time():
+        return cached_credentials
+    return None
+
+# Returns the Cognito Identity client of the region, creating it on first use
+def _get_cognito_identity_client(region):
+    with user_credentials_lock:
+        if region not in cognito_identity_clients:
+            cognito_identity_clients[region] = boto3.client('cognito-identity', region_name=region)
+        return cognito_identity_clients[region]
+
 # Inputs: cognito_id_token = user's returned id_token JWT
+# Concurrent requests of the same user wait for one retrieval of their credentials, which are then
+# reused by every request until shortly before they expire
 def get_user_credentials(cognito_id_token, user_pool_id, identity_pool_id, region):
+    cache_key = hashlib.sha256((cognito_id_token or '').encode()).hexdigest()
+    cached_credentials = _get_cached_user_credentials(cache_key)
+    if cached_credentials:
+        return cached_credentials
+    with user_credentials_lock:
+        loading_lock = user_credentials_loading.setdefault(cache_key, threading.Lock())
+    try:
+        with loading_lock:
+            cached_credentials = _get_cached_user_credentials(cache_key)
+            if cached_credentials:
+                return cached_credentials
+            return _load_user_credentials(cache_key, cognito_id_token, user_pool_id, identity_pool_id, region)
+    finally:
+        with user_credentials_lock:
+            user_credentials_loading.pop(cache_key, None)
+
+# Retrieve the user's credentials from Amazon Cognito & cache them
+def _load_user_credentials(cache_key, cognito_id_token, user_pool_id, identity_pool_id, region):
     user_credentials = dict()
     idp_name = 'cognito-idp.' + region + '.amazonaws.com/' + user_pool_id
 
     try:
-        cognito_identity_client = boto3.client('cognito-identity', region_name=region)
+        cognito_identity_client = _get_cognito_identity_client(region)
         identity_id_response = cognito_identity_client.get_id(
             IdentityPoolId=identity_pool_id,
             Logins={
@@ -55,6 +106,17 @@ def get_user_credentials(cognito_id_token, user_pool_id, identity_pool_id, regio
         user_credentials['AccessKeyId'] = cognito_identity_response['Credentials']['AccessKeyId']
         user_credentials['SecretKey'] = cognito_identity_response['Credentials']['SecretKey']
         user_credentials['SessionToken'] = cognito_identity_response['Credentials']['SessionToken']
+        # The Cognito identity stays the same across credential refreshes so it keys per-user caches
+        user_credentials['IdentityId'] = identity_id
+        # Pooled Boto3 sessions are evicted when the credentials expire
+        user_credentials['Expiration'] = cognito_identity_response['Credentials'].get('Expiration')
+        if user_credentials['Expiration']:
+            with user_credentials_lock:
+                # Drop the credentials of expired id tokens, for example of users who signed in again
+                for expired_key in [key for key, credentials in user_credentials_cache.items()
+                        if credentials['Expiration'].timestamp() <= time()]:
+                    user_credentials_cache.pop(expired_key)
+                user_credentials_cache[cache_key] = user_credentials
 
     except botocore.exceptions.ClientError as error:
             log.error("Boto3 API returned error: {}".format(error))
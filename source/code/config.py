@@ -8,7 +8,8 @@
 from admin import execution_status
 # Import AWS module for python
 import botocore
-import boto3
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
 # Import JSON
 import json
 # Import logging module
@@ -26,11 +27,7 @@ class config:
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
-        self.config_client = this_session.client('config', region_name=self.region)
+        self.config_client = tag_tamer_session_pool.get_client('config', self.region, **session_credentials)
 
     #Get REQUIRED_TAGS Config Rule name & input parameters
     def get_config_rule(self, config_rule_id):
@@ -8,8 +8,9 @@
 from admin import execution_status
 # Import AWS modules for python
 import botocore
-import boto3
 from boto3.dynamodb.conditions import Key, Attr
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
 # Import logging module
 import logging
 # Import sys to return name of current function
@@ -28,13 +29,9 @@ class roles:
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
         try:
-            self.iam_resource = this_session.resource('iam', region_name=self.region)
-            self.dynamodb = this_session.resource('dynamodb', region_name=self.region)
+            self.iam_resource = tag_tamer_session_pool.get_resource('iam', self.region, **session_credentials)
+            self.dynamodb = tag_tamer_session_pool.get_resource('dynamodb', self.region, **session_credentials)
             self.table = self.dynamodb.Table('tag_tamer_roles')
         except botocore.exceptions.ClientError as error:
             log.error("Boto3 API returned error: {}".format(error))
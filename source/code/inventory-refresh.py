@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Tag Tamer's inventory store refresh.  Rebuilds every selected region & resource type of this
+# account & each member account in the inventory store with full inventory passes, for example from cron.
+# The refreshed copies are shared & served to every user whose own credentials may list the resource type:
+#   python3 inventory-refresh.py [--regions REGION ...] [--resource-types ec2 ebs s3 lambda]
+
+# Import argument parser
+import argparse
+# Import AWS module for python
+import boto3
+# Import thread pool to refresh resource types concurrently
+from concurrent.futures import ThreadPoolExecutor
+# Import the inventory store
+from inventory_store import tag_tamer_inventory_store
+# Import JSON to read Tag Tamer's parameters
+import json
+# Import logging module
+import logging
+# Import getter/setter module for AWS resources & tags
+from resources_tags import resources_tags
+# Import the cached assume role credentials
+from sts import get_accounts_session_credentials
+# Import the resource type & unit lookup
+from utilities import get_resource_type_unit
+
+log = logging.getLogger('inventory_refresh')
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    with open('tag_tamer_parameters.json') as parameters_file:
+        tag_tamer_parameters = json.load(parameters_file)['parameters']
+    parser = argparse.ArgumentParser(description='Rebuild the Tag Tamer inventory store with full inventory passes')
+    parser.add_argument('--regions', nargs='+', default=tag_tamer_parameters['selected_regions'])
+    parser.add_argument('--resource-types', nargs='+', default=['ec2', 'ebs', 's3', 'lambda'])
+    arguments = parser.parse_args()
+
+    tag_tamer_inventory_store.configure(tag_tamer_parameters.get('inventory_store_path'),
+        tag_tamer_parameters.get('inventory_store_max_age_seconds', 300),
+        tag_tamer_parameters.get('inventory_store_reconcile_seconds', 86400))
+    resources_tags.inventory_engines.update(tag_tamer_parameters.get('inventory_engines', dict()))
+    if tag_tamer_inventory_store.path is None:
+        parser.error('the inventory_store_path Tag Tamer parameter is not set')
+
+    # The credentials of this host refresh its own account & assume the member account roles
+    frozen_credentials = boto3.session.Session().get_credentials().get_frozen_credentials()
+    session_credentials = {
+        'AccessKeyId': frozen_credentials.access_key,
+        'SecretKey': frozen_credentials.secret_key,
+        'SessionToken': frozen_credentials.token
+    }
+    accounts_session_credentials = [session_credentials]
+    member_account_role_arns = tag_tamer_parameters.get('member_account_role_arns', list())
+    for role_arn, account_session_credentials in get_accounts_session_credentials(member_account_role_arns,
+            'inventory-refresh', arguments.regions[0], **session_credentials).items():
+        if account_session_credentials.get('AccessKeyId'):
+            accounts_session_credentials.append(account_session_credentials)
+        else:
+            log.error('Could not assume %s', role_arn)
+
+    refreshes = list()
+    for account_session_credentials in accounts_session_credentials:
+        for resource_type in arguments.resource_types:
+            resource_type, unit = get_resource_type_unit(resource_type)
+            # Amazon S3 lists every bucket from any region so the describe inventory engine only uses the first region
+            if unit == 'buckets' and resources_tags.inventory_engines.get('buckets') != 'tagging_api':
+                regions = arguments.regions[:1]
+            else:
+                regions = arguments.regions
+            for region in regions:
+                refreshes.append((resource_type, unit, region, account_session_credentials))
+
+    def _refresh(refresh):
+        resource_type, unit, region, account_session_credentials = refresh
+        execution_status = resources_tags(resource_type, unit, region).refresh_stored_inventory(shared=True, **account_session_credentials)
+        log.info('%s %s: %s', region, unit, execution_status['status_message'])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(_refresh, refreshes))
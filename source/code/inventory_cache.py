@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# In-process cache of resource & tag inventories shared by every request thread.
+# Entries are keyed by (identity, region, unit), expire after a TTL, are served
+# stale while a background refresh runs & are evicted least recently used first.
+# Included class & methods
+# class - inventory_cache
+#  method - configure
+#  method - get
+#  method - peek
+#  method - put
+#  method - patch
+#  method - invalidate
+#  method - clear
+
+# Import logging module
+import logging
+# Import collections to use ordered dictionaries for LRU ordering
+from collections import OrderedDict
+# Import threading to guard the cache & run background refreshes
+import threading
+# Import epoch time method
+from time import time
+
+log = logging.getLogger(__name__)
+
+# Define inventory_cache class
+class inventory_cache:
+
+    #Class constructor
+    def __init__(self, ttl_seconds=300, max_stale_seconds=3600, max_entries=64):
+        self.configure(ttl_seconds, max_stale_seconds, max_entries)
+        # cache key -> [loaded epoch time, cached value]
+        self.entries = OrderedDict()
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    # Set the time to live, the maximum age an entry may be served stale & the maximum number of entries
+    def configure(self, ttl_seconds, max_stale_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max(max_stale_seconds, ttl_seconds)
+        self.max_entries = max_entries
+
+    # Store a value & evict the least recently used entries beyond max_entries
+    def _store(self, key, value):
+        with self.lock:
+            self.entries[key] = [time(), value]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                evicted_key, _ = self.entries.popitem(last=False)
+                log.debug('Evicted inventory cache entry: %s', evicted_key[1:])
+
+    # Reload a stale entry outside of the request thread
+    def _refresh(self, key, loader, cacheable):
+        try:
+            value = loader()
+            if cacheable(value):
+                self._store(key, value)
+        except Exception as error:
+            log.error('Inventory cache refresh failed for {} - {}'.format(key[1:], error))
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    # Returns the cached value for key, calling loader() on a miss.  Entries older than the TTL
+    # are returned as-is while a background thread reloads them.  Values for which
+    # cacheable(value) is False are returned but not stored
+    def get(self, key, loader, cacheable=lambda value: True):
+        if self.max_entries < 1:
+            return loader()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                age = time() - entry[0]
+                if age < self.max_stale_seconds:
+                    self.entries.move_to_end(key)
+                    if age >= self.ttl_seconds and key not in self.refreshing:
+                        self.refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, loader, cacheable), daemon=True).start()
+                    return entry[1]
+                self.entries.pop(key)
+
+        value = loader()
+        if cacheable(value):
+            self._store(key, value)
+        return value
+
+    # Returns the cached value for key if it is younger than the TTL, otherwise None.  Never loads a value
+    def peek(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time() - entry[0] < self.ttl_seconds:
+                return entry[1]
+        return None
+
+    # Store a value built outside of get(), replacing any cached entry for key
+    def put(self, key, value):
+        if self.max_entries > 0:
+            self._store(key, value)
+
+    # Apply patch_function(value) to every cached value whose key ends with key_suffix,
+    # for example every identity's entry for one (region, unit)
+    def patch(self, key_suffix, patch_function):
+        with self.lock:
+            matching_values = [entry[1] for key, entry in self.entries.items() if key[-len(key_suffix):] == key_suffix]
+        for value in matching_values:
+            patch_function(value)
+
+    # Remove every cached entry whose key ends with key_suffix
+    def invalidate(self, key_suffix):
+        with self.lock:
+            for key in [key for key in self.entries if key[-len(key_suffix):] == key_suffix]:
+                self.entries.pop(key)
+
+    # Remove every cached entry
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# Cache shared by every Tag Tamer module in this process
+tag_tamer_inventory_cache = inventory_cache()
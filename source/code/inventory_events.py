@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Keeps the inventory store up to date with AWS CloudTrail tag & resource lifecycle events.
+# CloudTrail events delivered to an Amazon CloudWatch Logs log group are applied as deltas to the store
+# so a full inventory pass is only needed to reconcile a unit older than the reconcile interval.
+# Run as a script on the Tag Tamer host to follow the log group named by the inventory_events_log_group
+# parameter, as the tagtamer-inventory-events service does:
+#   python3 inventory_events.py [--store PATH] --follow [--log-group NAME] [--region REGION]
+# or to apply recorded CloudWatch Logs subscription payload files to the store:
+#   python3 inventory_events.py [--store PATH] PAYLOAD_FILE [PAYLOAD_FILE ...]
+# Included functions
+# function - decode_cloudwatch_logs_payload
+# function - get_inventory_deltas
+# function - ingest_cloudtrail_events
+# function - ingest_cloudwatch_logs_event
+# function - poll_log_group
+# function - follow_log_group
+
+# Import argument parser for the command line ingestion path
+import argparse
+# Import base64, gzip & JSON to decode CloudWatch Logs subscription payloads
+import base64
+import gzip
+import json
+# Import calendar to convert CloudTrail event times to epoch times
+import calendar
+# Import AWS module for python
+import boto3
+import botocore
+# Import the inventory store the events are applied to
+from inventory_store import tag_tamer_inventory_store
+# Import logging module
+import logging
+# Import Python's regex module to parse CloudTrail event names & ARNs
+import re
+# Import time methods
+import time
+
+log = logging.getLogger(__name__)
+
+# CloudWatch Logs filter pattern selecting the CloudTrail events get_inventory_deltas reads
+log_group_filter_pattern = '{ ' + ' || '.join('($.eventName = "' + event_name + '")' for event_name in (
+    'CreateTags', 'DeleteTags', 'RunInstances', 'TerminateInstances', 'CreateVolume', 'DeleteVolume',
+    'PutBucketTagging', 'DeleteBucketTagging', 'CreateBucket', 'DeleteBucket',
+    'TagResource*', 'UntagResource*', 'CreateFunction*', 'DeleteFunction*')) + ' }'
+
+# Returns the list of AWS CloudTrail event dictionaries carried by a CloudWatch Logs subscription
+# event, either still encoded in its awslogs.data element or already decoded
+def decode_cloudwatch_logs_payload(event):
+    if 'awslogs' in event:
+        payload = json.loads(gzip.decompress(base64.b64decode(event['awslogs']['data'])))
+    else:
+        payload = event
+    return [json.loads(log_event['message']) for log_event in payload.get('logEvents', list())]
+
+# Returns the {key: value} dictionary of Amazon EC2's CloudTrail tagSet items
+def _get_ec2_tag_set(tag_set):
+    return {item['key']: item.get('value') for item in (tag_set or dict()).get('items', list())}
+
+# Returns the unit of an Amazon EC2 resource ID or None for resource types Tag Tamer does not manage
+def _get_ec2_unit(resource_id):
+    if resource_id.startswith('i-'):
+        return 'instances'
+    elif resource_id.startswith('vol-'):
+        return 'volumes'
+    return None
+
+# Returns the (unit, resource ID) of a resource ARN or (None, None) for resource types Tag Tamer does not manage
+def _get_arn_unit_resource_id(resource_arn):
+    if re.search('^arn:[^:]+:ec2:[^:]*:[^:]*:instance/', resource_arn):
+        return 'instances', resource_arn.split('/')[-1]
+    elif re.search('^arn:[^:]+:ec2:[^:]*:[^:]*:volume/', resource_arn):
+        return 'volumes', resource_arn.split('/')[-1]
+    elif re.search('^arn:[^:]+:s3:::', resource_arn):
+        return 'buckets', resource_arn.split(':::')[-1]
+    elif re.search('^arn:[^:]+:lambda:[^:]*:[^:]*:function:', resource_arn):
+        # Tags belong to the unqualified function ARN
+        return 'functions', ':'.join(resource_arn.split(':')[:7])
+    return None, None
+
+# Returns a list of (account ID, region or None for every region, unit, resource ID, action, tags, epoch time)
+# deltas for one AWS CloudTrail event.  Failed, read-only & unrelated events return no deltas
+def get_inventory_deltas(cloudtrail_event):
+    if cloudtrail_event.get('errorCode') or cloudtrail_event.get('readOnly'):
+        return list()
+    account_id = cloudtrail_event.get('recipientAccountId')
+    region = cloudtrail_event.get('awsRegion')
+    event_time = calendar.timegm(time.strptime(cloudtrail_event['eventTime'], '%Y-%m-%dT%H:%M:%SZ'))
+    # Lambda event names carry an API version suffix, for example TagResource20170331v2
+    event_name = re.sub('[0-9]{8}(v[0-9]+)?$', '', cloudtrail_event.get('eventName', ''))
+    event_source = cloudtrail_event.get('eventSource')
+    request_parameters = cloudtrail_event.get('requestParameters') or dict()
+    response_elements = cloudtrail_event.get('responseElements') or dict()
+    changes = list()
+
+    if event_source == 'ec2.amazonaws.com':
+        if event_name == 'CreateTags' or event_name == 'DeleteTags':
+            tags = _get_ec2_tag_set(request_parameters.get('tagSet'))
+            for item in request_parameters.get('resourcesSet', dict()).get('items', list()):
+                changes.append((_get_ec2_unit(item['resourceId']), item['resourceId'],
+                    'tag' if event_name == 'CreateTags' else 'untag', tags))
+        elif event_name == 'RunInstances':
+            for item in response_elements.get('instancesSet', dict()).get('items', list()):
+                changes.append(('instances', item['instanceId'], 'create', _get_ec2_tag_set(item.get('tagSet'))))
+        elif event_name == 'TerminateInstances':
+            for item in request_parameters.get('instancesSet', dict()).get('items', list()):
+                changes.append(('instances', item['instanceId'], 'delete', None))
+        elif event_name == 'CreateVolume':
+            changes.append(('volumes', response_elements.get('volumeId'), 'create', _get_ec2_tag_set(response_elements.get('tagSet'))))
+        elif event_name == 'DeleteVolume':
+            changes.append(('volumes', request_parameters.get('volumeId'), 'delete', None))
+
+    elif event_source == 's3.amazonaws.com':
+        bucket_name = request_parameters.get('bucketName')
+        region = None
+        if event_name == 'PutBucketTagging':
+            tag_set = request_parameters.get('Tagging', dict()).get('TagSet', dict()).get('Tag', list())
+            # CloudTrail records a tag set of one tag as a dictionary instead of a list
+            if isinstance(tag_set, dict):
+                tag_set = [tag_set]
+            changes.append(('buckets', bucket_name, 'replace', {tag['Key']: tag.get('Value', '') for tag in tag_set}))
+        elif event_name == 'DeleteBucketTagging':
+            changes.append(('buckets', bucket_name, 'replace', None))
+        elif event_name == 'CreateBucket':
+            changes.append(('buckets', bucket_name, 'create', None))
+        elif event_name == 'DeleteBucket':
+            changes.append(('buckets', bucket_name, 'delete', None))
+
+    elif event_source == 'lambda.amazonaws.com':
+        if event_name == 'TagResource' or event_name == 'UntagResource':
+            _, function_arn = _get_arn_unit_resource_id(request_parameters.get('resource', ''))
+            if event_name == 'TagResource':
+                changes.append(('functions', function_arn, 'tag', request_parameters.get('tags') or dict()))
+            else:
+                changes.append(('functions', function_arn, 'untag', dict.fromkeys(request_parameters.get('tagKeys') or list())))
+        elif event_name == 'CreateFunction':
+            changes.append(('functions', response_elements.get('functionArn'), 'create', request_parameters.get('tags')))
+        elif event_name == 'DeleteFunction':
+            function_name = request_parameters.get('functionName', '')
+            if not function_name.startswith('arn:'):
+                partition = (re.findall('^arn:([^:]+):', (cloudtrail_event.get('userIdentity') or dict()).get('arn', '')) or ['aws'])[0]
+                function_name = 'arn:{}:lambda:{}:{}:function:{}'.format(partition, region, account_id, function_name)
+            changes.append(('functions', _get_arn_unit_resource_id(function_name)[1], 'delete', None))
+
+    elif event_source == 'tagging.amazonaws.com':
+        if event_name == 'TagResources' or event_name == 'UntagResources':
+            for resource_arn in request_parameters.get('resourceARNList', list()):
+                unit, resource_id = _get_arn_unit_resource_id(resource_arn)
+                if event_name == 'TagResources':
+                    changes.append((unit, resource_id, 'tag', request_parameters.get('tags') or dict()))
+                else:
+                    changes.append((unit, resource_id, 'untag', dict.fromkeys(request_parameters.get('tagKeys') or list())))
+
+    return [(account_id, None if unit == 'buckets' else region, unit, resource_id, action, tags, event_time)
+        for unit, resource_id, action, tags in changes if unit and resource_id]
+
+# Apply a list of AWS CloudTrail event dictionaries to the inventory store.  Returns the number of deltas applied
+def ingest_cloudtrail_events(cloudtrail_events, store=None):
+    store = store or tag_tamer_inventory_store
+    deltas = list()
+    for cloudtrail_event in cloudtrail_events:
+        try:
+            deltas.extend(get_inventory_deltas(cloudtrail_event))
+        except (KeyError, TypeError, ValueError) as error:
+            log.error("Could not read CloudTrail event {} - {}".format(cloudtrail_event.get('eventID'), error))
+    return store.apply_deltas(deltas)
+
+# Apply every AWS CloudTrail event of a CloudWatch Logs subscription event to the inventory store.
+# Returns the number of deltas applied
+def ingest_cloudwatch_logs_event(event, store=None):
+    return ingest_cloudtrail_events(decode_cloudwatch_logs_payload(event), store)
+
+# Apply the CloudTrail events a log group received between two epoch times to the inventory store.
+# applied_event_ids maps the IDs of log events already applied to their epoch times & is updated.
+# accounts_regions, when given, is a set updated with the (account ID, region) pairs of the events read.
+# Returns the number of deltas applied
+def poll_log_group(client, log_group_name, start_time, end_time, applied_event_ids, store=None, accounts_regions=None):
+    cloudtrail_events = list()
+    paginator = client.get_paginator('filter_log_events')
+    for page in paginator.paginate(logGroupName=log_group_name, filterPattern=log_group_filter_pattern,
+        startTime=int(start_time * 1000), endTime=int(end_time * 1000)):
+        for log_event in page.get('events', list()):
+            if log_event['eventId'] in applied_event_ids:
+                continue
+            applied_event_ids[log_event['eventId']] = log_event['timestamp'] / 1000
+            try:
+                cloudtrail_events.append(json.loads(log_event['message']))
+            except ValueError as error:
+                log.error("Could not read log event {} - {}".format(log_event['eventId'], error))
+    if accounts_regions is not None:
+        accounts_regions.update((cloudtrail_event.get('recipientAccountId'), cloudtrail_event.get('awsRegion'))
+            for cloudtrail_event in cloudtrail_events
+            if cloudtrail_event.get('recipientAccountId') and cloudtrail_event.get('awsRegion'))
+    return ingest_cloudtrail_events(cloudtrail_events, store)
+
+# Apply the CloudTrail events of a log group to the inventory store as they arrive, reading the log group every
+# poll_seconds from where the last read stopped.  CloudTrail delivers events to CloudWatch Logs minutes after
+# they happen so every read goes back lookback_seconds & skips log events it already applied.  Only the units of the
+# accounts & regions the log group has delivered events for since the follower started are kept current by it.
+# max_polls limits the number of reads, by default it follows the log group until stopped
+def follow_log_group(log_group_name, region, poll_seconds=60, lookback_seconds=900, max_polls=None, store=None):
+    store = store or tag_tamer_inventory_store
+    client = boto3.client('logs', region_name=region)
+    checkpoint_name = 'logs:' + region + ':' + log_group_name
+    read_time = store.get_checkpoint(checkpoint_name) or time.time()
+    applied_event_ids = dict()
+    # (account ID, region) pairs the log group delivers events for
+    accounts_regions = set()
+    poll_count = 0
+    while max_polls is None or poll_count < max_polls:
+        if poll_count:
+            time.sleep(poll_seconds)
+        poll_count += 1
+        poll_time = time.time()
+        try:
+            applied_count = poll_log_group(client, log_group_name, read_time - lookback_seconds, poll_time,
+                applied_event_ids, store, accounts_regions)
+        except botocore.exceptions.ClientError as error:
+            log.error("Boto3 API returned error: {}".format(error))
+            continue
+        log.info('%s: applied %d inventory changes', log_group_name, applied_count)
+        read_time = poll_time
+        store.set_checkpoint(checkpoint_name, read_time)
+        store.set_last_applied_event(read_time, accounts_regions)
+        for event_id, event_time in list(applied_event_ids.items()):
+            if event_time < read_time - lookback_seconds:
+                del applied_event_ids[event_id]
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Apply AWS CloudTrail events from a CloudWatch Logs log group or recorded subscription payloads to the inventory store')
+    parser.add_argument('--store', help='inventory store file, by default the inventory_store_path Tag Tamer parameter')
+    parser.add_argument('--follow', action='store_true', help='follow the CloudTrail log group until stopped')
+    parser.add_argument('--log-group', help='CloudTrail log group, by default the inventory_events_log_group Tag Tamer parameter')
+    parser.add_argument('--region', help='region of the log group, by default the default_region Tag Tamer parameter')
+    parser.add_argument('--poll-seconds', type=int, default=60)
+    parser.add_argument('payload_files', nargs='*')
+    arguments = parser.parse_args()
+    with open('tag_tamer_parameters.json') as parameters_file:
+        parameters = json.load(parameters_file)['parameters']
+    store_path = arguments.store or parameters.get('inventory_store_path')
+    log_group_name = arguments.log_group or parameters.get('inventory_events_log_group')
+    if store_path is None:
+        parser.exit(message='The inventory store is disabled, set the inventory_store_path parameter to use it\n')
+    tag_tamer_inventory_store.configure(store_path)
+    if arguments.follow:
+        if log_group_name is None:
+            parser.exit(message='No CloudTrail log group to follow, set the inventory_events_log_group parameter to follow one\n')
+        follow_log_group(log_group_name, arguments.region or parameters.get('default_region'), arguments.poll_seconds)
+    for payload_file in arguments.payload_files:
+        with open(payload_file) as payload:
+            log.info('%s: applied %d inventory changes', payload_file, ingest_cloudwatch_logs_event(json.load(payload)))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Pages of resource & tag inventory rows returned by the Tag Tamer JSON API.
+# Rows are ordered by a sort key made of strings.  Every page but the last ends with an opaque
+# cursor holding the sort key of its last row so the next page starts right after that row,
+# even when resources are added or removed between the requests.
+# Included functions
+# function - encode_cursor
+# function - decode_cursor
+# function - get_inventory_page
+
+# Import base64 to make cursors safe in URL query strings
+import base64
+# Import heapq to select one page of rows without sorting the whole inventory
+import heapq
+# Import json to serialize cursors
+import json
+# Import logging module
+import logging
+
+log = logging.getLogger(__name__)
+
+# Returns the opaque cursor of a sort key.  The cursor scope names the route, resource type & sort
+# order the cursor was issued for so it cannot continue a different listing
+def encode_cursor(sort_key, cursor_scope):
+    cursor = json.dumps([cursor_scope, list(sort_key)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(cursor).decode('ascii').rstrip('=')
+
+# Returns the sort key of a cursor encoded by encode_cursor or None if the cursor is malformed
+# or was issued for another cursor scope
+def decode_cursor(cursor, cursor_scope):
+    try:
+        decoded_cursor = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+        decoded_scope, sort_key = decoded_cursor
+    except (TypeError, ValueError) as error:
+        log.debug('The page cursor "%s" cannot be decoded - %s', cursor, error)
+        return None
+    if decoded_scope != cursor_scope or not isinstance(sort_key, list) or not all(isinstance(part, str) for part in sort_key):
+        log.debug('The page cursor "%s" was not issued for "%s"', cursor, cursor_scope)
+        return None
+    return tuple(sort_key)
+
+# Returns the list of at most page_size rows following the after_key sort key, or starting the
+# inventory without one, & the sort key of the page's last row or None when no rows follow.
+# sort_key returns a tuple of strings uniquely ordering each row
+def get_inventory_page(rows, sort_key, page_size, after_key=None, descending=False):
+    keyed_rows = ((sort_key(row), row) for row in rows)
+    if after_key is not None:
+        if descending:
+            keyed_rows = (keyed_row for keyed_row in keyed_rows if keyed_row[0] < after_key)
+        else:
+            keyed_rows = (keyed_row for keyed_row in keyed_rows if keyed_row[0] > after_key)
+    # Selecting one row more than the page tells whether another page follows
+    select_rows = heapq.nlargest if descending else heapq.nsmallest
+    keyed_page = select_rows(page_size + 1, keyed_rows, key=lambda keyed_row: keyed_row[0])
+    next_key = keyed_page[page_size - 1][0] if len(keyed_page) > page_size else None
+    return [row for _, row in keyed_page[:page_size]], next_key
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# SQLite store of every account, region & unit's resources & tags persisted across restarts.
+# Units are written in bulk by full inventory passes, kept current by AWS CloudTrail events &
+# Tag Tamer's own tag writes & searched with SQL through the tag key & tag key:value indexes.
+# Each IAM role or user keeps its own copy of a unit, which is only served to the same principal.
+# Copies rebuilt by the scheduled inventory refresh are shared & served to every user allowed to list the unit.
+# Included class & methods
+# class - inventory_store
+#  method - configure
+#  method - is_fresh
+#  method - get_tag_index
+#  method - get_resources_tags
+#  method - get_tag_keys
+#  method - get_tag_values
+#  method - find_resources
+#  method - reconcile
+#  method - apply_deltas
+#  method - set_last_applied_event
+#  method - get_checkpoint
+#  method - set_checkpoint
+# function - get_store_owner
+# function - get_stored_tag_index
+# function - refresh_stored_tag_index
+# function - save_stored_tag_index
+
+# Import collections to use ordered dictionaries for storage
+from collections import OrderedDict
+# Import the inventory cache class to remember authorization checks
+from inventory_cache import inventory_cache
+# Import logging module
+import logging
+# Import Python's regex module to skip AWS-applied tags
+import re
+# Import SQLite
+import sqlite3
+# Import the AWS account & principal lookups of session credentials
+from sts import get_account_id, get_principal_arn
+# Import the tag index stored units are served as
+from tag_index import tag_index
+# Import threading to hold each thread's SQLite connection
+import threading
+# Import epoch time method
+from time import time
+
+log = logging.getLogger(__name__)
+
+# Stores written with another schema version are emptied & rebuilt by inventory passes
+schema_version = 3
+dropped_schema = '''
+DROP TABLE IF EXISTS units;
+DROP TABLE IF EXISTS resources;
+DROP TABLE IF EXISTS tags;
+DROP TABLE IF EXISTS checkpoints;
+'''
+schema = '''
+CREATE TABLE IF NOT EXISTS units (
+    account_id TEXT NOT NULL, principal TEXT NOT NULL, region TEXT NOT NULL, unit TEXT NOT NULL, reconciled REAL NOT NULL,
+    last_applied_event REAL,
+    PRIMARY KEY (account_id, principal, region, unit));
+CREATE TABLE IF NOT EXISTS resources (
+    account_id TEXT NOT NULL, principal TEXT NOT NULL, region TEXT NOT NULL, unit TEXT NOT NULL, resource_id TEXT NOT NULL,
+    tagged INTEGER NOT NULL,
+    PRIMARY KEY (account_id, principal, region, unit, resource_id));
+CREATE TABLE IF NOT EXISTS tags (
+    account_id TEXT NOT NULL, principal TEXT NOT NULL, region TEXT NOT NULL, unit TEXT NOT NULL, resource_id TEXT NOT NULL,
+    key TEXT NOT NULL, value TEXT NOT NULL,
+    PRIMARY KEY (account_id, principal, region, unit, resource_id, key));
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT NOT NULL PRIMARY KEY, position REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+CREATE INDEX IF NOT EXISTS tags_key_value ON tags (key, value);
+CREATE INDEX IF NOT EXISTS resources_unit_region ON resources (unit, region);
+'''
+
+# The rows of one account, principal, region & unit
+unit_scope = 'account_id = ? AND principal = ? AND region = ? AND unit = ?'
+# Principal of the shared copies written by the scheduled inventory refresh
+shared_principal = '*'
+
+# Define inventory_store class
+class inventory_store:
+
+    #Class constructor
+    # Without a path the store is disabled & every inventory is a full inventory pass
+    def __init__(self, path=None, max_age_seconds=300, reconcile_seconds=86400):
+        self.configure(path, max_age_seconds, reconcile_seconds)
+        # Each thread keeps its own SQLite connection
+        self.connections = threading.local()
+
+    # Set the SQLite database file path, the maximum age of a unit's last full inventory pass or last applied
+    # AWS CloudTrail events & the maximum age of a unit kept current by events before a full inventory pass reconciles it
+    def configure(self, path, max_age_seconds=300, reconcile_seconds=86400):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.reconcile_seconds = max(reconcile_seconds, max_age_seconds)
+
+    # Returns this thread's connection to the database, creating the schema on first use
+    def _get_connection(self):
+        connection = self.connections.__dict__.get(self.path)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # Readers in other processes are not blocked while a unit is written
+            connection.execute('PRAGMA journal_mode=WAL')
+            if connection.execute('PRAGMA user_version').fetchone()[0] != schema_version:
+                connection.executescript(dropped_schema)
+                connection.execute('PRAGMA user_version = {}'.format(schema_version))
+            connection.executescript(schema)
+            self.connections.__dict__[self.path] = connection
+        return connection
+
+    # Returns True if the principal's copy of the account, region & unit was reconciled within the maximum age, or
+    # within the reconcile interval while the AWS CloudTrail events applied to it are younger than the maximum age
+    def is_fresh(self, account_id, principal, region, unit):
+        row = self._get_connection().execute('SELECT reconciled, last_applied_event FROM units WHERE ' + unit_scope,
+            (account_id, principal, region, unit)).fetchone()
+        if row is None:
+            return False
+        reconciled, last_applied_event = row
+        current_time = time()
+        if reconciled + self.max_age_seconds >= current_time:
+            return True
+        return (reconciled + self.reconcile_seconds >= current_time and last_applied_event is not None
+            and last_applied_event + self.max_age_seconds >= current_time)
+
+    # Returns a dictionary of resource ID -> tags dictionary or None for the unit's resources in resource ID order.
+    # condition & parameters optionally narrow the resources
+    def _get_resources(self, account_id, principal, region, unit, condition='', parameters=()):
+        resources = OrderedDict()
+        rows = self._get_connection().execute(
+            'SELECT resources.resource_id, resources.tagged, tags.key, tags.value FROM resources '
+            'LEFT JOIN tags USING (account_id, principal, region, unit, resource_id) '
+            'WHERE resources.account_id = ? AND resources.principal = ? AND resources.region = ? AND resources.unit = ? ' + condition +
+            ' ORDER BY resources.resource_id', (account_id, principal, region, unit) + tuple(parameters))
+        for resource_id, tagged, tag_key, tag_value in rows:
+            if resource_id not in resources:
+                resources[resource_id] = dict() if tagged else None
+            if tag_key is not None:
+                resources[resource_id][tag_key] = tag_value
+        return resources
+
+    # Returns a tag index of the account, region & unit's resources
+    def get_tag_index(self, account_id, principal, region, unit):
+        inventory_index = tag_index()
+        for resource_id, resource_tags in self._get_resources(account_id, principal, region, unit).items():
+            inventory_index.add_resource(resource_id, resource_tags.items() if resource_tags is not None else None)
+        inventory_index.my_status.success(message='Resources and tags found!')
+        return inventory_index
+
+    # Returns a nested dictionary of every resource & its key:value tags in resource ID order
+    def get_resources_tags(self, account_id, principal, region, unit):
+        tagged_resource_inventory = self._get_resources(account_id, principal, region, unit)
+        for resource_id, resource_tags in tagged_resource_inventory.items():
+            if resource_tags is None:
+                tagged_resource_inventory[resource_id] = {"No Tags Found": "No Tags Found"}
+        return tagged_resource_inventory
+
+    # Returns the sorted list of distinct tag keys
+    def get_tag_keys(self, account_id, principal, region, unit):
+        rows = self._get_connection().execute('SELECT DISTINCT key FROM tags WHERE ' + unit_scope, (account_id, principal, region, unit))
+        return sorted((row[0] for row in rows), key=str.lower)
+
+    # Returns the sorted list of distinct, non-empty tag values
+    def get_tag_values(self, account_id, principal, region, unit):
+        rows = self._get_connection().execute('SELECT DISTINCT value FROM tags WHERE ' + unit_scope + " AND value != ''",
+            (account_id, principal, region, unit))
+        return sorted((row[0] for row in rows), key=str.lower)
+
+    # Returns a dictionary of resource ID -> tags dictionary or None for the resources satisfying a tag_filter_expression.
+    # Each clause is one indexed lookup, negated clauses select the unit's other resources & the clauses
+    # are joined with INTERSECT for "AND" & UNION for "OR"
+    def find_resources(self, account_id, principal, region, unit, tag_filter):
+        scope = (account_id, principal, region, unit)
+        if not tag_filter.clauses:
+            return self._get_resources(*scope)
+        clause_queries = list()
+        parameters = list()
+        for tag_key, tag_value, negated in tag_filter.clauses:
+            if tag_value is None:
+                clause_query = 'SELECT resource_id FROM tags WHERE ' + unit_scope + ' AND key = ?'
+                clause_parameters = scope + (tag_key,)
+            else:
+                clause_query = 'SELECT resource_id FROM tags WHERE ' + unit_scope + ' AND key = ? AND value = ?'
+                clause_parameters = scope + (tag_key, tag_value)
+            if negated:
+                clause_query = 'SELECT resource_id FROM resources WHERE ' + unit_scope + ' AND resource_id NOT IN (' + clause_query + ')'
+                clause_parameters = scope + clause_parameters
+            clause_queries.append(clause_query)
+            parameters.extend(clause_parameters)
+        matching_query = (' INTERSECT ' if tag_filter.conjunction == 'AND' else ' UNION ').join(clause_queries)
+        return self._get_resources(*scope, 'AND resources.resource_id IN (' + matching_query + ')', parameters)
+
+    # Replace the principal's copy of the account, region & unit's resources with those of a full inventory pass
+    # started at reconciled_time in one transaction
+    def reconcile(self, account_id, principal, region, unit, inventory_index, reconciled_time):
+        scope = (account_id, principal, region, unit)
+        resources = inventory_index.get_resources()
+        connection = self._get_connection()
+        with connection:
+            connection.execute('DELETE FROM tags WHERE ' + unit_scope, scope)
+            connection.execute('DELETE FROM resources WHERE ' + unit_scope, scope)
+            connection.executemany('INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?)',
+                (scope + (resource_id, int(resource_tags is not None)) for resource_id, resource_tags in resources))
+            connection.executemany('INSERT INTO tags VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (scope + (resource_id, tag_key, tag_value)
+                    for resource_id, resource_tags in resources for tag_key, tag_value in (resource_tags or dict()).items()))
+            connection.execute('INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, NULL)', scope + (reconciled_time,))
+
+    # Apply a list of (account ID or None for every account, region or None for every region, unit, resource ID,
+    # action, tags, epoch time) deltas in one transaction to the copies of every principal.  Deltas older than a
+    # copy's last reconciliation & deltas for units not yet in the store are skipped.  Returns the number applied
+    def apply_deltas(self, deltas):
+        if not deltas or self.path is None:
+            return 0
+        applied_count = 0
+        connection = self._get_connection()
+        with connection:
+            for account_id, region, unit, resource_id, action, tags, event_time in deltas:
+                units = connection.execute('SELECT account_id, principal, region FROM units WHERE unit = ? AND reconciled <= ?'
+                    + (' AND account_id = ?' if account_id is not None else '') + (' AND region = ?' if region is not None else ''),
+                    tuple(value for value in (unit, event_time, account_id, region) if value is not None)).fetchall()
+                for unit_account_id, unit_principal, unit_region in units:
+                    if _apply_delta(connection, (unit_account_id, unit_principal, unit_region, unit), resource_id, action,
+                        {tag_key: tag_value for tag_key, tag_value in (tags or dict()).items() if not re.search("^aws:", tag_key)}):
+                        applied_count += 1
+        return applied_count
+
+    # Record that the units of the (account ID, region) pairs an AWS CloudTrail log group delivers events for, which
+    # were reconciled before applied_time, have the events read up to that epoch time applied, for example after each
+    # read of the log group.  Units of other accounts & regions keep the freshness of their last full inventory pass.
+    # Tag Tamer's own tag writes are not recorded because they do not keep a unit current with changes made outside of Tag Tamer
+    def set_last_applied_event(self, applied_time, accounts_regions):
+        if self.path is None or not accounts_regions:
+            return
+        connection = self._get_connection()
+        with connection:
+            connection.executemany('UPDATE units SET last_applied_event = ? WHERE account_id = ? AND region = ? AND reconciled <= ? '
+                'AND (last_applied_event IS NULL OR last_applied_event < ?)',
+                ((applied_time, account_id, region, applied_time, applied_time) for account_id, region in accounts_regions))
+
+    # Returns the epoch time an event source was last read up to or None if it was never read
+    def get_checkpoint(self, name):
+        row = self._get_connection().execute('SELECT position FROM checkpoints WHERE name = ?', (name,)).fetchone()
+        return row[0] if row is not None else None
+
+    # Record the epoch time an event source was read up to
+    def set_checkpoint(self, name, position):
+        connection = self._get_connection()
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?)', (name, position))
+
+# Apply one delta to the resources of the (account ID, principal, region, unit) scope.  Returns True if they changed
+def _apply_delta(connection, scope, resource_id, action, tags):
+    exists = connection.execute('SELECT tagged FROM resources WHERE ' + unit_scope + ' AND resource_id = ?',
+        scope + (resource_id,)).fetchone() is not None
+    if action == 'delete':
+        connection.execute('DELETE FROM tags WHERE ' + unit_scope + ' AND resource_id = ?', scope + (resource_id,))
+        connection.execute('DELETE FROM resources WHERE ' + unit_scope + ' AND resource_id = ?', scope + (resource_id,))
+        return exists
+    if not exists and action != 'create':
+        return False
+    if action == 'replace':
+        connection.execute('DELETE FROM tags WHERE ' + unit_scope + ' AND resource_id = ?', scope + (resource_id,))
+    if action == 'untag':
+        for tag_key, tag_value in tags.items():
+            # Amazon EC2 DeleteTags only deletes a tag whose value matches when a value is given
+            connection.execute('DELETE FROM tags WHERE ' + unit_scope + ' AND resource_id = ? AND key = ?'
+                + (' AND value = ?' if tag_value is not None else ''),
+                scope + (resource_id, tag_key) + ((tag_value,) if tag_value is not None else ()))
+        return True
+    connection.executemany('INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (scope + (resource_id, tag_key, tag_value) for tag_key, tag_value in tags.items()))
+    if not exists:
+        connection.execute('INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?)', scope + (resource_id, int(bool(tags))))
+    elif tags or action == 'replace':
+        connection.execute('UPDATE resources SET tagged = ? WHERE ' + unit_scope + ' AND resource_id = ?',
+            (int(bool(tags)),) + scope + (resource_id,))
+    return True
+
+# Remembers for the inventory cache TTL which identities may list which region & unit
+store_authorizations = inventory_cache(ttl_seconds=300, max_stale_seconds=300, max_entries=1024)
+
+# Returns the (account ID, principal ARN) owning the store's copies of units read with the session credentials
+# or None if either cannot be retrieved
+def _get_owner(region, **session_credentials):
+    account_id = get_account_id(region, **session_credentials)
+    principal = get_principal_arn(region, **session_credentials)
+    if account_id is None or principal is None:
+        return None
+    return account_id, principal
+
+# Returns the (account ID, principal ARN) owning the region & unit in the store if the store holds a fresh copy
+# read by the principal of the session credentials, or else a fresh shared copy of the same account, that
+# authorize() confirms the user may still read, otherwise None
+def get_store_owner(region, unit, authorize, **session_credentials):
+    store = tag_tamer_inventory_store
+    if store.path is None:
+        return None
+    owner = _get_owner(region, **session_credentials)
+    if owner is None:
+        return None
+    if not store.is_fresh(*owner, region, unit):
+        owner = (owner[0], shared_principal)
+        if not store.is_fresh(*owner, region, unit):
+            return None
+    caller_identity = session_credentials.get('IdentityId') or session_credentials['AccessKeyId']
+    if not store_authorizations.get((caller_identity, region, unit), authorize, cacheable=lambda authorized: authorized):
+        return None
+    return owner
+
+# Returns the store's tag index of the region & unit for the account of the session credentials once
+# authorize() confirms the user may list the unit's resources.  Otherwise returns the tag index built by
+# scan() & reconciles the store with it
+def get_stored_tag_index(region, unit, scan, authorize, **session_credentials):
+    store = tag_tamer_inventory_store
+    if store.path is None:
+        return scan()
+    owner = get_store_owner(region, unit, authorize, **session_credentials)
+    if owner is not None:
+        return store.get_tag_index(*owner, region, unit)
+    return refresh_stored_tag_index(region, unit, scan, **session_credentials)
+
+# Returns the tag index built by scan() after replacing the session credentials' copy of the region & unit
+# in the store with it, or the account's shared copy when shared is True
+def refresh_stored_tag_index(region, unit, scan, shared=False, **session_credentials):
+    # Events arriving during the inventory pass are newer than the reconciliation time & are applied again
+    reconciled_time = time()
+    inventory_index = scan()
+    save_stored_tag_index(region, unit, inventory_index, reconciled_time, shared=shared, **session_credentials)
+    return inventory_index
+
+# Replace the session credentials' copy of the region & unit in the store, or the account's shared copy when
+# shared is True, with a successfully built tag index whose inventory pass started at reconciled_time.
+# Indexes of tagged resources only are not saved so every stored unit lists its untagged resources too
+def save_stored_tag_index(region, unit, inventory_index, reconciled_time, shared=False, **session_credentials):
+    store = tag_tamer_inventory_store
+    if (store.path is None or inventory_index.my_status.get_status().get('alert_level') != 'success'
+            or not inventory_index.lists_untagged):
+        return
+    owner = _get_owner(region, **session_credentials)
+    if owner is not None:
+        if shared:
+            owner = (owner[0], shared_principal)
+        try:
+            store.reconcile(*owner, region, unit, inventory_index, reconciled_time)
+        except sqlite3.Error as error:
+            log.error("Could not save the inventory store: {}".format(error))
+
+# Store shared by every Tag Tamer module in this process
+tag_tamer_inventory_store = inventory_store()
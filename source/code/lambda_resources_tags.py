@@ -9,20 +9,33 @@
 # class - lambda_resources_tags
 #  method - get_lambda_names_ids
 #  method - get_lambda_resources_tags
+#  method - get_lambda_functions_tags
+#  method - get_lambda_tag_index
+#  method - walk_lambda_tag_index
 #  method - get_lambda_tag_keys
 #  method - get_lambda_tag_values
 #  method - set_lambda_resources_tags
 
-# Import administrative functions
-from admin import execution_status
 # Import AWS module for python
-import boto3, botocore
+import botocore
 # Import collections to use ordered dictionaries for storage
 from collections import OrderedDict
+# Import the engine sending the per-function calls concurrently
+from api_calls import tag_tamer_api_calls
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
 # Import logging module
 import logging
-# Import Python's regex module to filter Boto3's API responses 
-import re
+# Import tag filter compiler
+from tag_filters import compile_tag_filters
+# Import bulk tag writers
+from tag_writers import tagging_api_tag_writer, get_tag_changes, write_tag_changes, get_tag_write_results, record_first_tag_writes
+# Import Resource Groups Tagging API inventory engine
+from tagging_api_inventory import tagging_api_inventory
+# Import single-pass index of resources & tags
+from tag_index import tag_index, get_cached_tag_index, peek_cached_tag_index, put_cached_tag_index
+# Import the persisted inventory store kept up to date by AWS CloudTrail events
+from inventory_store import get_stored_tag_index, refresh_stored_tag_index
 
 # Instantiate logging for this module using its file name
 log = logging.getLogger(__name__)
@@ -31,215 +44,63 @@ log = logging.getLogger(__name__)
 class lambda_resources_tags:
     
     # Class constructor
-    def __init__(self, resource_type, region):
+    # max_workers sets how many Lambda list_tags calls run at the same time,
+    # inventory_engine selects the "describe" or "tagging_api" inventory engine &
+    # tag_write_engine selects the "native" or "tagging_api" tag write engine
+    def __init__(self, resource_type, region, max_workers=16, inventory_engine='describe', tag_write_engine='native'):
         self.resource_type = resource_type
         self.region = region
+        self.max_workers = max_workers
+        self.inventory_engine = inventory_engine
+        self.tag_write_engine = tag_write_engine
+
+    # Returns the pooled Lambda client for the session credentials
+    def _get_client(self, **session_credentials):
+        return tag_tamer_session_pool.get_client(self.resource_type, self.region, **session_credentials)
+
+    # Returns the tag index of every Lambda function shared by all of this class's getters.  list_untagged
+    # asks for an index of the untagged functions too, built with the "describe" engine, which replaces
+    # a cached index of tagged functions only
+    def _get_tag_index(self, list_untagged=False, **session_credentials):
+        inventory_scanner = self
+        if list_untagged:
+            inventory_scanner = lambda_resources_tags(self.resource_type, self.region, self.max_workers, 'describe')
+        inventory_index = get_cached_tag_index(self.region, 'functions',
+            lambda: get_stored_tag_index(self.region, 'functions',
+                lambda: inventory_scanner.get_lambda_tag_index(**session_credentials),
+                lambda: self._authorize_inventory(**session_credentials), **session_credentials),
+            **session_credentials)
+        if list_untagged and not inventory_index.lists_untagged:
+            inventory_index = refresh_stored_tag_index(self.region, 'functions',
+                lambda: inventory_scanner.get_lambda_tag_index(**session_credentials), **session_credentials)
+            put_cached_tag_index(self.region, 'functions', inventory_index, **session_credentials)
+        return inventory_index
+
+    # Returns True if the user may list Lambda functions.  One small list call guards every
+    # inventory served from the persisted store
+    def _authorize_inventory(self, **session_credentials):
+        try:
+            self._get_client(**session_credentials).list_functions(MaxItems=1)
+            return True
+        except botocore.exceptions.ClientError as error:
+            log.error("Boto3 API returned error: {}".format(error))
+            return False
 
     # Returns a filtered list of all resource names & ID's for the resource type specified  
     def get_lambda_names_ids(self, filter_tags, **session_credentials):
-        my_status = execution_status()
         self.filter_tags = filter_tags
-        tag_key1_state = True if self.filter_tags.get('tag_key1') else False
-        tag_value1_state = True if self.filter_tags.get('tag_value1') else False
-        tag_key2_state = True if self.filter_tags.get('tag_key2') else False
-        tag_value2_state = True if self.filter_tags.get('tag_value2') else False
+        tag_filter = compile_tag_filters(self.filter_tags)
         resource_inventory = dict()
 
-        self.session_credentials = {}
-        self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
-        self.session_credentials['SecretKey'] = session_credentials['SecretKey']
-        self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
-
-        def _intersection_union_invalid(tag_dict, function_name, function_arn):
-            resource_inventory['No matching resource'] = 'No matching resource'
-        
-        if self.filter_tags.get('conjunction') == 'AND':
-            
-            def _intersection_tfff(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key1') in tag_dict:
-                    resource_inventory[function_arn] = function_name
-            
-            def _intersection_fftf(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key2') in tag_dict:
-                    resource_inventory[function_arn] = function_name
-                     
-            def _intersection_fftt(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key2') in tag_dict:
-                    if tag_dict.get(self.filter_tags.get('tag_key2')) == self.filter_tags.get('tag_value2'):
-                        resource_inventory[function_arn] = function_name             
-            
-            def _intersection_ttff(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key1') in tag_dict:
-                    if tag_dict.get(self.filter_tags.get('tag_key1')) == self.filter_tags.get('tag_value1'):
-                        resource_inventory[function_arn] = function_name                   
-
-            def _intersection_tftf(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key1') in tag_dict and self.filter_tags.get('tag_key2') in tag_dict:
-                    resource_inventory[function_arn] = function_name
-                         
-            def _intersection_tftt(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key1') in tag_dict and self.filter_tags.get('tag_key2') in tag_dict:
-                    if tag_dict.get(self.filter_tags.get('tag_key2')) == self.filter_tags.get('tag_value2'):
-                        resource_inventory[function_arn] = function_name
-                            
-            def _intersection_tttf(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key1') in tag_dict and self.filter_tags.get('tag_key2') in tag_dict:
-                    if tag_dict.get(self.filter_tags.get('tag_key1')) == self.filter_tags.get('tag_value1'):
-                        resource_inventory[function_arn] = function_name
-                         
-            def _intersection_tttt(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key1') in tag_dict and self.filter_tags.get('tag_key2') in tag_dict:
-                    if tag_dict.get(self.filter_tags.get('tag_key1')) == self.filter_tags.get('tag_value1'):
-                        if tag_dict.get(self.filter_tags.get('tag_key2')) == self.filter_tags.get('tag_value2'):
-                            resource_inventory[function_arn] = function_name                   
-
-            def _intersection_ffff(tag_dict, function_name, function_arn):
-                resource_inventory[function_arn] = function_name
-
-            # "AND" Truth table check for tag_key1, tag_value1, tag_key2, tag_value2
-            intersection_combos = {
-                (False, False, False, True): _intersection_union_invalid,
-                (False, True, False, False): _intersection_union_invalid,
-                (False, True, False, True): _intersection_union_invalid,
-                (True, False, False, True): _intersection_union_invalid,
-                (True, True, False, True): _intersection_union_invalid,
-                (False, True, True, False): _intersection_union_invalid,
-                (False, False, True, False): _intersection_fftf,
-                (False, False, True, True): _intersection_fftt,
-                (True, False, False, False): _intersection_tfff,
-                (True, True, False, False): _intersection_ttff,
-                (True, False, True, False): _intersection_tftf,
-                (True, False, True, True): _intersection_tftt,
-                (True, True, True, False): _intersection_tttf,
-                (True, True, True, True): _intersection_tttt,
-                (False, False, False, False): _intersection_ffff
-            }
-                
-            try:
-                client = this_session.client(self.resource_type, region_name=self.region)
-                # Get all the Lambda functions in the region
-                my_functions = client.list_functions()
-                for item in my_functions['Functions']:
-                    try:
-                        # Get all the tags for a given Lambda function
-                        response = client.list_tags(
-                            Resource=item['FunctionArn']
-                        )
-                        intersection_combos[(tag_key1_state,
-                            tag_value1_state,
-                            tag_key2_state,
-                            tag_value2_state)](response.get('Tags'), item['FunctionName'], item['FunctionArn'])
-                    
-                    except botocore.exceptions.ClientError as error:
-                        log.error("Boto3 API returned error: {}".format(error))
-                        if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
-                            my_status.error(message='You are not authorized to view these resources')
-                        else:
-                            my_status.error()
-                my_status.success(message='Resources and tags found!')
-            except botocore.exceptions.ClientError as error:
-                log.error("Boto3 API returned error: {}".format(error))
-                if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-            
-
-        if self.filter_tags.get('conjunction') == 'OR':
-
-            def _union_tfff_tftf_fftf(tag_dict, function_name, function_arn):
-                if self.filter_tags.get('tag_key1') in tag_dict or self.filter_tags.get('tag_key2') in tag_dict:
-                    print(function_name)
-                    print(self.filter_tags.get('tag_key1'))
-                    print(self.filter_tags.get('tag_key2'))
-                    print(tag_dict)
-                    resource_inventory[function_arn] = function_name
-                
-            def _union_tttf(tag_dict, function_name, function_arn):
-                if  self.filter_tags.get('tag_key1') in tag_dict:
-                    if tag_dict[self.filter_tags.get('tag_key1')] == self.filter_tags.get('tag_value1'):
-                        resource_inventory[function_arn] = function_name
-                elif self.filter_tags.get('tag_key2') in tag_dict:
-                    resource_inventory[function_arn] = function_name
-
-            def _union_tftt(tag_dict, function_name, function_arn):
-                if  self.filter_tags.get('tag_key2') in tag_dict:
-                    if tag_dict[self.filter_tags.get('tag_key2')] == self.filter_tags.get('tag_value2'):
-                        resource_inventory[function_arn] = function_name
-                elif self.filter_tags.get('tag_key1') in tag_dict:
-                    resource_inventory[function_arn] = function_name
-
-            def _union_fftt(tag_dict, function_name, function_arn):
-                if  self.filter_tags.get('tag_key2') in tag_dict:
-                    if tag_dict[self.filter_tags.get('tag_key2')] == self.filter_tags.get('tag_value2'):
-                        resource_inventory[function_arn] = function_name
-            
-            def _union_ttff(tag_dict, function_name, function_arn):
-                if  self.filter_tags.get('tag_key1') in tag_dict:
-                    if tag_dict[self.filter_tags.get('tag_key1')] == self.filter_tags.get('tag_value1'):
-                        resource_inventory[function_arn] = function_name
+        # Every Lambda function & its tags from the shared inventory pass.  Lambda's ListTags
+        # has no server-side filter so the whole search is evaluated against the index, which
+        # lists the untagged functions too when the search can match them
+        inventory_index = self._get_tag_index(list_untagged=tag_filter.matches(None), **session_credentials)
+        my_status = inventory_index.my_status
 
-            def _union_tttt(tag_dict, function_name, function_arn):
-                if  self.filter_tags.get('tag_key1') in tag_dict:
-                    if tag_dict[self.filter_tags.get('tag_key1')] == self.filter_tags.get('tag_value1'):
-                        resource_inventory[function_arn] = function_name
-                elif  self.filter_tags.get('tag_key2') in tag_dict:
-                    if tag_dict[self.filter_tags.get('tag_key2')] == self.filter_tags.get('tag_value2'):
-                        resource_inventory[function_arn] = function_name
-            
-            def _union_ffff(tag_dict, function_name, function_arn):
-                resource_inventory[function_arn] = function_name
-
-            # "OR" Truth table check for tag_key1, tag_value1, tag_key2, tag_value2
-            or_combos = {
-                (False, False, False, True): _intersection_union_invalid,
-                (False, True, False, False): _intersection_union_invalid,
-                (False, True, False, True): _intersection_union_invalid,
-                (False, True, True, True): _intersection_union_invalid,
-                (True, True, False, True): _intersection_union_invalid,
-                (False, False, True, False): _union_tfff_tftf_fftf,
-                (False, False, True, True): _union_fftt,
-                (True, False, False, False): _union_tfff_tftf_fftf,
-                (True, False, True, False): _union_tfff_tftf_fftf,
-                (True, False, True, True): _union_tftt,
-                (True, True, False, False): _union_ttff,
-                (True, True, True, False): _union_tttf,
-                (True, True, True, True): _union_tttt,
-                (False, False, False, False): _union_ffff
-            }
-                
-            try:
-                client = this_session.client(self.resource_type, region_name=self.region)
-                # Get all the Lambda functions in the region
-                my_functions = client.list_functions()
-                for item in my_functions['Functions']:
-                    try:
-                        # Get all the tags for a given Lambda function
-                        response = client.list_tags(
-                            Resource=item['FunctionArn']
-                        )
-                        or_combos[(tag_key1_state,
-                            tag_value1_state,
-                            tag_key2_state,
-                            tag_value2_state)](response.get('Tags'), item['FunctionName'], item['FunctionArn'])
-                    
-                    except botocore.exceptions.ClientError as error:
-                        log.error("Boto3 API returned error: {}".format(error))
-                        if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
-                            my_status.error(message='You are not authorized to view these resources')
-                        else:
-                            my_status.error()
-                my_status.success(message='Resources and tags found!')
-            except botocore.exceptions.ClientError as error:
-                log.error("Boto3 API returned error: {}".format(error))
-                if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
+        for function_arn in inventory_index.find_resources(tag_filter):
+            # The function name is the last element of its unqualified ARN
+            resource_inventory[function_arn] = function_arn.split(':')[6]
 
         # Sort the resources based on the resource's name
         ordered_inventory = OrderedDict()
@@ -252,220 +113,160 @@ class lambda_resources_tags:
     # Returns a nested dictionary of every resource & its key:value tags for the chosen resource type
     # No input arguments
     def get_lambda_resources_tags(self, **session_credentials):
-        my_status = execution_status()
-        # Instantiate dictionaries to hold resources & their tags
-        tagged_resource_inventory = dict()
+        inventory_index = self._get_tag_index(**session_credentials)
+        tagged_resource_inventory = inventory_index.get_resources_tags()
+        if inventory_index.my_status.get_status().get('alert_level') == 'danger':
+            tagged_resource_inventory["No Resource Found"] = {"No Tags Found": "No Tags Found"}
+        return tagged_resource_inventory, inventory_index.my_status.get_status()
 
-        self.session_credentials = dict()
-        self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
-        self.session_credentials['SecretKey'] = session_credentials['SecretKey']
-        self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
+    # method - get_lambda_tag_index
+    # Returns a tag index of every Lambda function & its tags built by one inventory pass
+    # No input arguments
+    def get_lambda_tag_index(self, **session_credentials):
+        inventory_index = tag_index()
 
         try:
-            client = this_session.client(self.resource_type, region_name=self.region)
-            # Get all the Lambda functions in the region
-            my_functions = client.list_functions()
-            for item in my_functions['Functions']:
-                resource_tags = dict()
-                sorted_resource_tags = dict()
-                function_arn = item['FunctionArn']
-                try:
-                    # Get all the tags for a given Lambda function
-                    response = client.list_tags(
-                        Resource=function_arn
-                    )
-                    for tag_key, tag_value in response['Tags'].items():       
-                        if not re.search("^aws:", tag_key):
-                            resource_tags[tag_key] = tag_value
-                except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error: {}".format(error))
-                    resource_tags["No Tags Found"] = "No Tags Found"
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
-                        
-                        my_status.error(message='You are not authorized to view these resources')
-                    else:
-                        my_status.error()
-                sorted_resource_tags = OrderedDict(sorted(resource_tags.items()))
-                tagged_resource_inventory[item['FunctionArn']] = sorted_resource_tags
-                my_status.success(message='Resources and tags found!')
+            for _ in self.walk_lambda_tag_index(inventory_index, **session_credentials):
+                pass
+            if inventory_index.my_status.get_status().get('alert_level') != 'danger':
+                inventory_index.my_status.success(message='Resources and tags found!')
         except botocore.exceptions.ClientError as error:
             log.error("Boto3 API returned error: {}".format(error))
-            tagged_resource_inventory["No Resource Found"] = {"No Tags Found": "No Tags Found"}
             if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
-                
-                my_status.error(message='You are not authorized to view these resources')
+                inventory_index.my_status.error(message='You are not authorized to view these resources')
+            else:
+                inventory_index.my_status.error()
+        return inventory_index
+
+    # method - walk_lambda_tag_index
+    # Adds every Lambda function & its tags to the tag index, yielding (function arn, tags dictionary or None)
+    # tuples as each page of functions is read.  Boto3 ClientErrors listing the functions are raised to the caller
+    # 1 input - tag index
+    def walk_lambda_tag_index(self, inventory_index, **session_credentials):
+        if self.inventory_engine == 'tagging_api':
+            walked_functions = 0
+            inventory_index.lists_untagged = False
+            try:
+                for function_arn, function_tags in tagging_api_inventory(self.region, **session_credentials).walk_tag_index(inventory_index, 'functions'):
+                    walked_functions += 1
+                    yield function_arn, function_tags
+                return
+            except botocore.exceptions.ClientError as error:
+                # Functions already yielded cannot be read again by another engine
+                if walked_functions:
+                    raise
+                log.error("Boto3 API returned error: {}".format(error))
+                log.info('Using the describe inventory engine for functions')
+                inventory_index.lists_untagged = True
+
+        client = self._get_client(**session_credentials)
+        # Page through all the Lambda functions in the region
+        paginator = client.get_paginator('list_functions')
+        for page in paginator.paginate():
+            function_arns = [item['FunctionArn'] for item in page['Functions']]
+            # Get the tags of up to max_workers functions of the page at a time
+            for function_arn, (function_tags, error) in self.get_lambda_functions_tags(function_arns, **session_credentials).items():
+                inventory_index.add_resource(function_arn, function_tags.items() if function_tags is not None else None)
+                if error:
+                    if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
+                        inventory_index.my_status.error(message='You are not authorized to view these resources')
+                    else:
+                        inventory_index.my_status.error()
+                yield function_arn, inventory_index.get_resource_tags(function_arn)
+
+    # method - get_lambda_functions_tags
+    # Returns a dictionary of Lambda arn -> (tags dictionary or None, ClientError or None) reading the
+    # tags of up to max_workers functions at a time
+    # 1 input - list of Lambda arns
+    def get_lambda_functions_tags(self, function_arns, **session_credentials):
+        function_arns = list(function_arns)
+        # Get all the tags of every Lambda function concurrently
+        responses = tag_tamer_api_calls.run_calls(self.resource_type, 'list_tags',
+            [(self.region, {'Resource': function_arn}) for function_arn in function_arns], self.max_workers, **session_credentials)
+        functions_tags = dict()
+        for function_arn, (response, error) in zip(function_arns, responses):
+            if error is None:
+                functions_tags[function_arn] = (response.get('Tags', dict()), None)
             else:
-                my_status.error()
-        return tagged_resource_inventory, my_status.get_status()
+                log.error("Boto3 API returned error: {}".format(error))
+                functions_tags[function_arn] = (None, error)
+        return functions_tags
+
+    # Returns a dictionary of Lambda arn -> tags dictionary for the given functions, taken from the cached
+    # tag index while it is younger than the cache TTL & otherwise read for only the functions missing from it.
+    # Functions whose tags could not be read are left out
+    def _get_current_tags(self, function_arns, **session_credentials):
+        current_tags = dict()
+        inventory_index = peek_cached_tag_index(self.region, 'functions', **session_credentials)
+        if inventory_index is not None:
+            current_tags = inventory_index.get_resources_by_id(function_arns)
+        missing_function_arns = [function_arn for function_arn in dict.fromkeys(function_arns) if function_arn not in current_tags]
+        if not missing_function_arns:
+            return current_tags
+        if self.tag_write_engine == 'tagging_api':
+            # One Tagging API call reads the tags of up to 100 functions
+            try:
+                current_tags.update(tagging_api_inventory(self.region, **session_credentials).get_resources_tags_by_arn('functions', missing_function_arns))
+            except botocore.exceptions.ClientError as error:
+                log.error("Boto3 API returned error: {}".format(error))
+        else:
+            for function_arn, (function_tags, error) in self.get_lambda_functions_tags(missing_function_arns, **session_credentials).items():
+                if error is None:
+                    current_tags[function_arn] = function_tags
+        return current_tags
 
     # method - get_lambda_tag_keys
     # Getter method retrieves every tag:key for object's resource type
     # No input arguments
     def get_lambda_tag_keys(self, **session_credentials):
-        my_status = execution_status()
-        tag_keys_inventory = list()
-
-        self.session_credentials = dict()
-        self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
-        self.session_credentials['SecretKey'] = session_credentials['SecretKey']
-        self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
-
-        try:
-            client = this_session.client(self.resource_type, region_name=self.region)
-            # Get all the Lambda functions in the region
-            my_functions = client.list_functions()
-            for item in my_functions['Functions']:
-                function_arn = item['FunctionArn']
-                try:
-                    # Get all the tags for a given Lambda function
-                    response = client.list_tags(
-                        Resource=function_arn
-                    )
-                    try:
-                        # Add all tag keys to the list
-                        for tag_key, _ in response['Tags'].items():       
-                            if not re.search("^aws:", tag_key):
-                                tag_keys_inventory.append(tag_key)
-                        my_status.success(message='Resources and tags found!')
-                    except:
-                        tag_keys_inventory.append("No tag keys found")
-                        my_status.error(message='You are not authorized to view these resources')
-                except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error: {}".format(error))
-                    tag_keys_inventory.append("No tag keys found")
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':                        
-                        my_status.error(message='You are not authorized to view these resources')
-                    else:
-                        my_status.error()
-
-        except botocore.exceptions.ClientError as error:
-            log.error("Boto3 API returned error: {}".format(error))
+        inventory_index = self._get_tag_index(**session_credentials)
+        tag_keys_inventory = inventory_index.get_tag_keys()
+        if inventory_index.my_status.get_status().get('alert_level') == 'danger':
             tag_keys_inventory.append("No tag keys found")
-            if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':                
-                my_status.error(message='You are not authorized to view these resources')
-            else:
-                my_status.error()
-        
-        #Remove duplicate tags & sort
-        tag_keys_inventory = list(set(tag_keys_inventory))
-        tag_keys_inventory.sort(key=str.lower)
-
-        return tag_keys_inventory, my_status.get_status()
+        return tag_keys_inventory, inventory_index.my_status.get_status()
 
 
     # method - get_lambda_tag_values
     # Getter method retrieves every tag:value for object's resource type
     # No input arguments
     def get_lambda_tag_values(self, **session_credentials):
-        my_status = execution_status()
-        tag_values_inventory = list()
-
-        self.session_credentials = dict()
-        self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
-        self.session_credentials['SecretKey'] = session_credentials['SecretKey']
-        self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
-
-        try:
-            client = this_session.client(self.resource_type, region_name=self.region)
-            # Get all the Lambda functions in the region
-            my_functions = client.list_functions()
-            for item in my_functions['Functions']:
-                function_arn = item['FunctionArn']
-                try:
-                    # Get all the tags for a given Lambda function
-                    response = client.list_tags(
-                        Resource=function_arn
-                    )
-                    try:
-                        # Add all tag keys to the list
-                        for tag_key, tag_value in response['Tags'].items():       
-                            # Exclude any AWS-applied tags which begin with "aws:"
-                            if not re.search("^aws:", tag_key) and tag_value:
-                                tag_values_inventory.append(tag_value)
-                    except:
-                        #tag_values_inventory.append("No tag values found")
-                        tag_values_inventory.append("")
-                        my_status.warning(message='No tags found for this resource.')
-                except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error: {}".format(error))
-                    #tag_values_inventory.append("No tag values found")
-                    tag_values_inventory.append("")
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':                        
-                        my_status.error(message='You are not authorized to view these resources')
-                    else:
-                        my_status.error()
-            
-            my_status.success(message='Resources and tags found!')
-                
-        except botocore.exceptions.ClientError as error:
-            log.error("Boto3 API returned error: {}".format(error))
-            #tag_values_inventory.append("No tag values found")
+        inventory_index = self._get_tag_index(**session_credentials)
+        tag_values_inventory = inventory_index.get_tag_values()
+        if inventory_index.my_status.get_status().get('alert_level') == 'danger':
             tag_values_inventory.append("")
-            if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':                    
-                my_status.error(message='You are not authorized to view these resources')
-            else:
-                my_status.error()
-        
-        #Remove duplicate tags & sort
-        tag_values_inventory = list(set(tag_values_inventory))
-        tag_values_inventory.sort(key=str.lower)
-
-        return tag_values_inventory, my_status.get_status()
+        return tag_values_inventory, inventory_index.my_status.get_status()
 
     # method - set_lambda_resources_tags
     # Setter method to update tags on user-selected resources 
     # 2 inputs - list of resource Lambda arns to tag, list of individual tag key:value dictionaries
+    # Returns a dictionary of Lambda arn:'success', 'unchanged' or AWS error code & the execution status of the update
     def set_lambda_resources_tags(self, resources_to_tag, chosen_tags, **session_credentials):
-        my_status = execution_status()
-        resources_updated_tags = dict()
-        tag_dict = dict()
-
-        self.session_credentials = dict()
-        self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
-        self.session_credentials['SecretKey'] = session_credentials['SecretKey']
-        self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
+        # Only write the chosen tags each function lacks
+        current_tags = self._get_current_tags(resources_to_tag, **session_credentials)
+        tag_changes, unchanged_resource_arns = get_tag_changes(resources_to_tag, chosen_tags, current_tags)
+
+        # Batched TagResources requests sent concurrently
+        if self.tag_write_engine == 'tagging_api':
+            write_function = tagging_api_tag_writer(self.region, **session_credentials).tag_resources
+        else:
+            def write_function(function_arns, tags):
+                function_arns = list(function_arns)
+                function_write_errors = dict()
+                # for Lambda Boto3 API covert list of tags dicts to single key:value tag dict 
+                tag_dict = dict()
+                for tag in tags:
+                    tag_dict[tag['Key']] = tag['Value']
+                # Tag every function concurrently
+                responses = tag_tamer_api_calls.run_calls(self.resource_type, 'tag_resource',
+                    [(self.region, {'Resource': resource_arn, 'Tags': tag_dict}) for resource_arn in function_arns],
+                    self.max_workers, **session_credentials)
+                for resource_arn, (response, error) in zip(function_arns, responses):
+                    if error is not None:
+                        log.error("Boto3 API returned error: {}".format(error))
+                    function_write_errors[resource_arn] = error
+                return function_write_errors
 
-        # for Lambda Boto3 API covert list of tags dicts to single key:value tag dict 
-        for tag in chosen_tags:
-            tag_dict[tag['Key']] = tag['Value']
-       
-        for resource_arn in resources_to_tag:
-            try:
-                client = this_session.client(self.resource_type, region_name=self.region)
-                try:
-                    response = client.tag_resource(
-                        Resource=resource_arn,
-                        Tags=tag_dict
-                    )
-                    my_status.success(message='Tags updated successfully!')
-                except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error: {}".format(error))
-                    resources_updated_tags["No Resources Found"] = "No Tags Applied"
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':                        
-                        my_status.error(message='You are not authorized to modify these resources')
-                    else:
-                        my_status.error()
-            except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error: {}".format(error))
-                    resources_updated_tags["No Resources Found"] = "No Tags Applied"
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':                        
-                        my_status.error(message='You are not authorized to modify these resources')
-                    else:
-                        my_status.error()
-        return my_status.get_status()
\ No newline at end of file
+        write_errors = write_tag_changes(self.region, 'functions', tag_changes, write_function)
+        record_first_tag_writes(self.region, 'functions', [function_arn for function_arn, error in write_errors.items()
+            if error is None and not current_tags.get(function_arn)], chosen_tags, **session_credentials)
+        return get_tag_write_results(write_errors, unchanged_resource_arns)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Getters & setters running the multi_region_resources_tags methods in every member account concurrently
+# using the cached session credentials of an AWS IAM Role in each account.  Every result carries the
+# account it was found in & an account that fails does not fail the others.
+# Resources are identified across accounts by "account:region:resource ID" qualified resource IDs.
+# Included class & methods
+# class - multi_account_resources_tags
+#  method - get_resources
+#  method - get_resources_tags
+#  method - stream_resources
+#  method - stream_resources_tags
+#  method - get_resources_tags_by_id
+#  method - get_tag_keys
+#  method - get_tag_values
+#  method - set_resources_tags
+
+# Import administrative functions
+from admin import execution_status
+# Import collections to use ordered dictionaries for storage
+from collections import OrderedDict
+# Import the thread pool counting AWS API calls for the request using it, to query accounts concurrently
+from api_metrics import context_thread_pool
+# Import logging module
+import logging
+# Import the multi-region getters & setters
+from multi_region_resources_tags import multi_region_resources_tags, qualify_resource_id, split_resource_id, merge_execution_status, merge_streams
+# Import the cached assume role credentials
+from sts import get_accounts_session_credentials, get_role_account_id
+# Import the tag write status builder
+from tag_writers import get_tag_write_status
+
+log = logging.getLogger(__name__)
+
+# Define multi_account_resources_tags class to get/set resources & their assigned tags in many accounts
+class multi_account_resources_tags:
+
+    #Class constructor
+    # role_arns lists the AWS IAM Role to assume in each member account & user_name names the role sessions.
+    # refresh reads resources & tags from AWS instead of the inventory store & cached tag indexes
+    def __init__(self, resource_type, unit, regions, role_arns, user_name, max_workers=8, refresh=False):
+        self.resource_type = resource_type
+        self.unit = unit
+        self.regions = list(regions)
+        self.role_arns = list(role_arns)
+        self.user_name = user_name
+        self.max_workers = max_workers
+        self.refresh = refresh
+
+    # Returns a list of (account ID, result, execution status) tuples from calling the multi_region_resources_tags
+    # method in every account concurrently.  The result of an account whose role could not be assumed is None
+    def _fan_out(self, method_name, *args, **session_credentials):
+        accounts_session_credentials = get_accounts_session_credentials(self.role_arns, self.user_name,
+            self.regions[0], **session_credentials)
+
+        def _call_account(role_arn):
+            account_id = get_role_account_id(role_arn)
+            account_session_credentials = accounts_session_credentials[role_arn]
+            if not account_session_credentials.get('AccessKeyId'):
+                my_status = execution_status()
+                my_status.error(message='You are not authorized to view these resources')
+                return account_id, None, my_status.get_status()
+            result, account_status = getattr(multi_region_resources_tags(self.resource_type, self.unit, self.regions, refresh=self.refresh),
+                method_name)(*args, **account_session_credentials)
+            return account_id, result, account_status
+
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            return list(executor.map(_call_account, self.role_arns))
+
+    # Returns one execution status for the account results
+    def _merge_status(self, account_results):
+        return merge_execution_status([(account_id, account_status) for account_id, _, account_status in account_results],
+            scope='accounts')
+
+    # Returns a list of (resource ID, resource name, region, account ID) tuples sorted by resource name
+    # for the resources matching the filter tags in every account & region
+    def get_resources(self, filter_tags, **session_credentials):
+        account_results = self._fan_out('get_resources', filter_tags, **session_credentials)
+        named_resource_inventory = list()
+        for account_id, result, account_status in account_results:
+            if result is not None and account_status.get('alert_level') != 'danger':
+                named_resource_inventory.extend(resource + (account_id,) for resource in result)
+        named_resource_inventory.sort(key=lambda item: (item[1], item[3], item[2]))
+        return named_resource_inventory, self._merge_status(account_results)
+
+    # Returns a nested dictionary of (account ID, region, resource ID) -> key:value tags for every resource
+    # in every account & region
+    def get_resources_tags(self, **session_credentials):
+        account_results = self._fan_out('get_resources_tags', **session_credentials)
+        tagged_resource_inventory = dict()
+        for account_id, result, account_status in account_results:
+            if result is not None and account_status.get('alert_level') != 'danger':
+                for (region, resource_id), resource_tags in result.items():
+                    tagged_resource_inventory[(account_id, region, resource_id)] = resource_tags
+        merged_status = self._merge_status(account_results)
+        if merged_status.get('alert_level') == 'danger':
+            tagged_resource_inventory[("", "", "No Resource Found")] = {"No Tags Found": "No Tags Found"}
+        return tagged_resource_inventory, merged_status
+
+    # Returns a generator of (account ID, row) tuples yielded as the multi_region_resources_tags stream method
+    # produces them in every account concurrently, & one execution status for the accounts, which is final once
+    # the generator is exhausted
+    def _stream_fan_out(self, method_name, *args, **session_credentials):
+        accounts_session_credentials = get_accounts_session_credentials(self.role_arns, self.user_name,
+            self.regions[0], **session_credentials)
+        account_role_arns = {get_role_account_id(role_arn): role_arn for role_arn in self.role_arns}
+
+        def _stream_account(account_id):
+            account_session_credentials = accounts_session_credentials[account_role_arns[account_id]]
+            if not account_session_credentials.get('AccessKeyId'):
+                my_status = execution_status()
+                my_status.error(message='You are not authorized to view these resources')
+                return iter(()), my_status.get_status()
+            return getattr(multi_region_resources_tags(self.resource_type, self.unit, self.regions, refresh=self.refresh),
+                method_name)(*args, **account_session_credentials)
+
+        return merge_streams(list(account_role_arns), _stream_account, self.max_workers, scope='accounts')
+
+    # Returns a generator of (resource ID, resource name, region, account ID) tuples for the resources matching
+    # the filter tags in every account & region, yielded as they are found, & one execution status for the
+    # accounts, which is final once the generator is exhausted
+    def stream_resources(self, filter_tags, **session_credentials):
+        account_rows, merged_status = self._stream_fan_out('stream_resources', filter_tags, **session_credentials)
+        return (resource + (account_id,) for account_id, resource in account_rows), merged_status
+
+    # Returns a generator of ((account ID, region, resource ID), key:value tags) tuples for every resource in
+    # every account & region, yielded as they are found, & one execution status for the accounts, which is
+    # final once the generator is exhausted
+    def stream_resources_tags(self, **session_credentials):
+        account_rows, merged_status = self._stream_fan_out('stream_resources_tags', **session_credentials)
+        return (((account_id,) + inventory_key, resource_tags) for account_id, (inventory_key, resource_tags) in account_rows), merged_status
+
+    # Returns a nested dictionary of (account ID, region, resource ID) -> key:value tags read for only the given
+    # "account:region:resource ID" qualified resource IDs, each account's resources read concurrently, & one
+    # execution status for the accounts
+    def get_resources_tags_by_id(self, resource_ids, **session_credentials):
+        account_role_arns = {get_role_account_id(role_arn): role_arn for role_arn in self.role_arns}
+        account_resources = OrderedDict()
+        for qualified_resource_id in resource_ids:
+            account_id, region_resource_id = split_resource_id(qualified_resource_id)
+            account_resources.setdefault(account_id, list()).append(region_resource_id)
+        if not account_resources:
+            my_status = execution_status()
+            my_status.success(message='Resources and tags found!')
+            return dict(), my_status.get_status()
+        accounts_session_credentials = get_accounts_session_credentials(
+            [account_role_arns[account_id] for account_id in account_resources if account_id in account_role_arns],
+            self.user_name, self.regions[0], **session_credentials)
+
+        def _read_account(account_id):
+            account_session_credentials = accounts_session_credentials.get(account_role_arns.get(account_id), dict())
+            if not account_session_credentials.get('AccessKeyId'):
+                my_status = execution_status()
+                my_status.error(message='You are not authorized to view these resources')
+                return account_id, None, my_status.get_status()
+            result, account_status = multi_region_resources_tags(self.resource_type, self.unit, self.regions, refresh=self.refresh).get_resources_tags_by_id(
+                account_resources[account_id], **account_session_credentials)
+            return account_id, result, account_status
+
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            account_results = list(executor.map(_read_account, account_resources))
+        tagged_resource_inventory = dict()
+        for account_id, result, account_status in account_results:
+            if result is not None:
+                for (region, resource_id), resource_tags in result.items():
+                    tagged_resource_inventory[(account_id, region, resource_id)] = resource_tags
+        return tagged_resource_inventory, self._merge_status(account_results)
+
+    # Returns the sorted list of distinct values returned by a multi_region_resources_tags list getter in every account
+    def _get_sorted_union(self, method_name, **session_credentials):
+        account_results = self._fan_out(method_name, **session_credentials)
+        values = set()
+        for _, result, account_status in account_results:
+            if result is not None and account_status.get('alert_level') != 'danger':
+                values.update(result)
+        return sorted(values, key=str.lower), self._merge_status(account_results)
+
+    # Returns a sorted list of all tag keys found in every account
+    def get_tag_keys(self, **session_credentials):
+        return self._get_sorted_union('get_tag_keys', **session_credentials)
+
+    # Returns a sorted list of all tag values found in every account
+    def get_tag_values(self, **session_credentials):
+        return self._get_sorted_union('get_tag_values', **session_credentials)
+
+    #Setter method to update tags on user-selected resources in every account concurrently
+    #Takes a list of "account:region:resource ID" qualified resource IDs & returns a dictionary of qualified
+    #resource ID:'success', 'unchanged' or AWS error code & the execution status of the update
+    def set_resources_tags(self, resources_to_tag, chosen_tags, **session_credentials):
+        account_role_arns = {get_role_account_id(role_arn): role_arn for role_arn in self.role_arns}
+        account_resources = OrderedDict()
+        for qualified_resource_id in resources_to_tag:
+            account_id, region_resource_id = split_resource_id(qualified_resource_id)
+            account_resources.setdefault(account_id, list()).append(region_resource_id)
+        accounts_session_credentials = get_accounts_session_credentials(
+            [account_role_arns[account_id] for account_id in account_resources if account_id in account_role_arns],
+            self.user_name, self.regions[0], **session_credentials)
+
+        def _set_account(account_id):
+            account_session_credentials = accounts_session_credentials.get(account_role_arns.get(account_id), dict())
+            if not account_session_credentials.get('AccessKeyId'):
+                return {region_resource_id: 'AccessDenied' for region_resource_id in account_resources[account_id]}
+            region_updated_tags, _ = multi_region_resources_tags(self.resource_type, self.unit, self.regions, refresh=self.refresh).set_resources_tags(
+                account_resources[account_id], chosen_tags, **account_session_credentials)
+            return region_updated_tags
+
+        resources_updated_tags = dict()
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            for account_id, region_updated_tags in zip(account_resources, executor.map(_set_account, account_resources)):
+                for region_resource_id, result in region_updated_tags.items():
+                    resources_updated_tags[qualify_resource_id(account_id, region_resource_id)] = result
+        return resources_updated_tags, get_tag_write_status(resources_updated_tags)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Getters & setters running the resources_tags methods in every selected AWS region concurrently.
+# Every result carries the region it was found in & a region that fails does not fail the others.
+# Resources are identified across regions by "region:resource ID" qualified resource IDs.
+# Included class & methods
+# class - multi_region_resources_tags
+#  method - get_resources
+#  method - get_resources_tags
+#  method - stream_resources
+#  method - stream_resources_tags
+#  method - get_resources_tags_by_id
+#  method - get_tag_keys
+#  method - get_tag_values
+#  method - set_resources_tags
+# function - qualify_resource_id
+# function - split_resource_id
+# function - merge_execution_status
+# function - merge_streams
+
+# Import administrative functions
+from admin import execution_status
+# Import AWS module for python
+import botocore
+# Import the bucket region cache filled by bucket inventories
+from bucket_tags import bucket_regions
+# Import collections to use ordered dictionaries for storage
+from collections import OrderedDict
+# Import the thread pool counting AWS API calls for the request using it, to query regions concurrently
+from api_metrics import context_thread_pool
+# Import logging module
+import logging
+# Import queue to merge the rows streamed by many regions
+import queue
+# Import the single region getters & setters
+from resources_tags import resources_tags
+# Import the tag write status builder
+from tag_writers import get_tag_write_status
+
+log = logging.getLogger(__name__)
+
+# Returns the qualified resource ID identifying a resource across regions
+def qualify_resource_id(region, resource_id):
+    return region + ':' + resource_id
+
+# Returns the (region, resource ID) tuple of a qualified resource ID.  Region names never contain ":"
+def split_resource_id(qualified_resource_id):
+    region, resource_id = qualified_resource_id.split(':', 1)
+    return region, resource_id
+
+# Returns one execution status for a list of (name, execution status) tuples, one per region or account.
+# The names that failed while others succeeded are listed in a warning
+def merge_execution_status(named_statuses, scope='regions'):
+    failed_statuses = [(name, named_status) for name, named_status in named_statuses
+        if named_status.get('alert_level') == 'danger']
+    if len(failed_statuses) == len(named_statuses):
+        return failed_statuses[0][1]
+    if failed_statuses:
+        my_status = execution_status()
+        my_status.warning(message='Results are missing for these {}: {}'.format(scope,
+            ', '.join('{} ({})'.format(name, named_status.get('status_message')) for name, named_status in failed_statuses)))
+        return my_status.get_status()
+    warning_statuses = [named_status for _, named_status in named_statuses if named_status.get('alert_level') == 'warning']
+    return warning_statuses[0] if warning_statuses else named_statuses[0][1]
+
+# Returns a generator of (name, row) tuples yielded as soon as any of the row streams returned by
+# stream_function(name), a (rows generator, execution status) tuple, produces them for every name, read
+# concurrently, & one execution status for the names, which is final once the generator is exhausted
+def merge_streams(names, stream_function, max_workers=8, scope='regions'):
+    merged_status = dict()
+
+    def _merge():
+        rows = queue.Queue()
+
+        def _stream_name(name):
+            name_status = None
+            try:
+                name_rows, name_status = stream_function(name)
+                for row in name_rows:
+                    rows.put((name, row))
+            except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as error:
+                log.error("Boto3 API returned error. {}: {} - {}".format(scope[:-1], name, error))
+                my_status = execution_status()
+                my_status.error()
+                name_status = my_status.get_status()
+            finally:
+                # None marks the end of the name's rows
+                rows.put((name, None))
+            return name, name_status
+
+        executor = context_thread_pool(max_workers=max_workers)
+        try:
+            futures = [executor.submit(_stream_name, name) for name in names]
+            streaming_names = len(futures)
+            while streaming_names:
+                name, row = rows.get()
+                if row is None:
+                    streaming_names -= 1
+                else:
+                    yield name, row
+            merged_status.update(merge_execution_status([future.result() for future in futures], scope=scope))
+        finally:
+            # A client that disconnects stops the merge but lets the running streams finish
+            executor.shutdown(wait=False)
+
+    return _merge(), merged_status
+
+# Define multi_region_resources_tags class to get/set resources & their assigned tags in many regions
+class multi_region_resources_tags:
+
+    #Class constructor
+    # refresh reads resources & tags from AWS instead of the inventory store & cached tag indexes
+    def __init__(self, resource_type, unit, regions, max_workers=8, refresh=False):
+        self.resource_type = resource_type
+        self.unit = unit
+        self.regions = list(regions)
+        self.max_workers = max_workers
+        self.refresh = refresh
+
+    # Returns the regions to query.  Amazon S3 lists every bucket from any region so the
+    # describe inventory engine only queries the first region for buckets
+    def _get_query_regions(self):
+        if self.unit == 'buckets' and resources_tags.inventory_engines.get('buckets') != 'tagging_api':
+            return self.regions[:1]
+        return self.regions
+
+    # Returns the region a resource found in query_region belongs to
+    def _get_resource_region(self, query_region, resource_id):
+        if self.unit == 'buckets':
+            return bucket_regions.get(resource_id, query_region)
+        return query_region
+
+    # Returns a list of (region, result, execution status) tuples from calling the resources_tags
+    # method in every region concurrently.  The result of a region that raised an error is None
+    def _fan_out(self, regions, method_name, *args, **session_credentials):
+        def _call_region(region):
+            try:
+                result, region_status = getattr(resources_tags(self.resource_type, self.unit, region, self.refresh), method_name)(*args, **session_credentials)
+                return region, result, region_status
+            except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as error:
+                log.error("Boto3 API returned error. region: {} - {}".format(region, error))
+                my_status = execution_status()
+                my_status.error()
+                return region, None, my_status.get_status()
+
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            return list(executor.map(_call_region, regions))
+
+    # Returns one execution status for the regional results
+    def _merge_status(self, regional_results):
+        return merge_execution_status([(region, region_status) for region, _, region_status in regional_results])
+
+    # Returns a list of (resource ID, resource name, region) tuples sorted by resource name
+    # for the resources matching the filter tags in every region
+    def get_resources(self, filter_tags, **session_credentials):
+        regional_results = self._fan_out(self._get_query_regions(), 'get_resources', filter_tags, **session_credentials)
+        named_resource_inventory = list()
+        for region, result, region_status in regional_results:
+            if result is not None and region_status.get('alert_level') != 'danger':
+                named_resource_inventory.extend((resource_id, resource_name, self._get_resource_region(region, resource_id))
+                    for resource_id, resource_name in result)
+        named_resource_inventory.sort(key=lambda item: (item[1], item[2]))
+        return named_resource_inventory, self._merge_status(regional_results)
+
+    # Returns a nested dictionary of (region, resource ID) -> key:value tags for every resource in every region
+    def get_resources_tags(self, **session_credentials):
+        regional_results = self._fan_out(self._get_query_regions(), 'get_resources_tags', **session_credentials)
+        tagged_resource_inventory = dict()
+        for region, result, region_status in regional_results:
+            if result is not None and region_status.get('alert_level') != 'danger':
+                for resource_id, resource_tags in result.items():
+                    tagged_resource_inventory[(self._get_resource_region(region, resource_id), resource_id)] = resource_tags
+        merged_status = self._merge_status(regional_results)
+        if merged_status.get('alert_level') == 'danger':
+            tagged_resource_inventory[("", "No Resource Found")] = {"No Tags Found": "No Tags Found"}
+        return tagged_resource_inventory, merged_status
+
+    # Returns a generator of (resource ID, resource name, region) tuples for the resources matching the filter
+    # tags in every region, yielded as each region finds them, & one execution status for the regions, which
+    # is final once the generator is exhausted
+    def stream_resources(self, filter_tags, **session_credentials):
+        region_rows, merged_status = merge_streams(self._get_query_regions(),
+            lambda region: resources_tags(self.resource_type, self.unit, region, self.refresh).stream_resources(filter_tags, **session_credentials),
+            self.max_workers)
+        return ((resource_id, resource_name, self._get_resource_region(region, resource_id))
+            for region, (resource_id, resource_name) in region_rows), merged_status
+
+    # Returns a generator of ((region, resource ID), key:value tags) tuples for every resource in every region,
+    # yielded as each region finds them, & one execution status for the regions, which is final once the
+    # generator is exhausted
+    def stream_resources_tags(self, **session_credentials):
+        region_rows, merged_status = merge_streams(self._get_query_regions(),
+            lambda region: resources_tags(self.resource_type, self.unit, region, self.refresh).stream_resources_tags(**session_credentials),
+            self.max_workers)
+        return (((self._get_resource_region(region, resource_id), resource_id), resource_tags)
+            for region, (resource_id, resource_tags) in region_rows), merged_status
+
+    # Returns a nested dictionary of (region, resource ID) -> key:value tags read for only the given qualified
+    # resource IDs, each region's resources read concurrently, & one execution status for the regions
+    def get_resources_tags_by_id(self, resource_ids, **session_credentials):
+        regional_resources = OrderedDict()
+        for qualified_resource_id in resource_ids:
+            region, resource_id = split_resource_id(qualified_resource_id)
+            regional_resources.setdefault(region, list()).append(resource_id)
+        if not regional_resources:
+            my_status = execution_status()
+            my_status.success(message='Resources and tags found!')
+            return dict(), my_status.get_status()
+
+        def _read_region(region):
+            try:
+                result, region_status = resources_tags(self.resource_type, self.unit, region, self.refresh).get_resources_tags_by_id(
+                    regional_resources[region], **session_credentials)
+                return region, result, region_status
+            except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as error:
+                log.error("Boto3 API returned error. region: {} - {}".format(region, error))
+                my_status = execution_status()
+                my_status.error()
+                return region, None, my_status.get_status()
+
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            regional_results = list(executor.map(_read_region, regional_resources))
+        tagged_resource_inventory = dict()
+        for region, result, region_status in regional_results:
+            if result is not None:
+                for resource_id, resource_tags in result.items():
+                    tagged_resource_inventory[(region, resource_id)] = resource_tags
+        return tagged_resource_inventory, self._merge_status(regional_results)
+
+    # Returns the sorted list of distinct values returned by a resources_tags list getter in every region
+    def _get_sorted_union(self, method_name, **session_credentials):
+        regional_results = self._fan_out(self._get_query_regions(), method_name, **session_credentials)
+        values = set()
+        for _, result, region_status in regional_results:
+            if result is not None and region_status.get('alert_level') != 'danger':
+                values.update(result)
+        return sorted(values, key=str.lower), self._merge_status(regional_results)
+
+    # Returns a sorted list of all tag keys found in every region
+    def get_tag_keys(self, **session_credentials):
+        return self._get_sorted_union('get_tag_keys', **session_credentials)
+
+    # Returns a sorted list of all tag values found in every region
+    def get_tag_values(self, **session_credentials):
+        return self._get_sorted_union('get_tag_values', **session_credentials)
+
+    #Setter method to update tags on user-selected resources in every region concurrently
+    #Takes a list of qualified resource IDs & returns a dictionary of qualified resource ID:'success',
+    #'unchanged' or AWS error code & the execution status of the update
+    def set_resources_tags(self, resources_to_tag, chosen_tags, **session_credentials):
+        regional_resources = OrderedDict()
+        for qualified_resource_id in resources_to_tag:
+            region, resource_id = split_resource_id(qualified_resource_id)
+            regional_resources.setdefault(region, list()).append(resource_id)
+
+        def _set_region(region):
+            try:
+                return resources_tags(self.resource_type, self.unit, region, self.refresh).set_resources_tags(
+                    regional_resources[region], chosen_tags, **session_credentials)
+            except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as error:
+                log.error("Boto3 API returned error. region: {} - {}".format(region, error))
+                return {resource_id: 'RegionFailed' for resource_id in regional_resources[region]}, None
+
+        resources_updated_tags = dict()
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            for region, (region_updated_tags, _) in zip(regional_resources, executor.map(_set_region, regional_resources)):
+                for resource_id, result in region_updated_tags.items():
+                    resources_updated_tags[qualify_resource_id(region, resource_id)] = result
+        return resources_updated_tags, get_tag_write_status(resources_updated_tags)
@@ -7,26 +7,64 @@
 # Import administrative functions
 from admin import execution_status
 # Import AWS module for python
-import boto3, botocore
+import botocore
 # Import collections to use ordered dictionaries for storage
 from collections import OrderedDict
+# Import concurrent reader of Amazon S3 bucket tags
+from bucket_tags import bucket_tags
 # Import AWS Lambda resources & tags getters & setters
 from lambda_resources_tags import * 
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import Resource Groups Tagging API inventory engine
+from tagging_api_inventory import tagging_api_inventory, get_resource_arn, get_resource_id
+# Import tag filter compiler
+from tag_filters import compile_tag_filters
+# Import bulk tag writers
+from tag_writers import ec2_tag_writer, tagging_api_tag_writer, get_tag_changes, write_tag_changes, get_tag_write_results, record_tag_writes, record_first_tag_writes, record_tag_write_errors
+# Import single-pass index of resources & tags
+from tag_index import tag_index, get_cached_tag_index, peek_cached_tag_index, put_cached_tag_index
+# Import the persisted inventory store kept up to date by AWS CloudTrail events
+from inventory_store import tag_tamer_inventory_store, get_store_owner, get_stored_tag_index, refresh_stored_tag_index, save_stored_tag_index
+# Import the engine sending per-resource AWS API calls concurrently
+from api_calls import tag_tamer_api_calls
 # Import logging module
 import logging
-# Import Python's regex module to filter Boto3's API responses 
-import re
 # Import sys to return name of current function
 import sys
+# Import time methods
+from time import time
 
 # Instantiate logging for this module using its file name
 log = logging.getLogger(__name__)
 
 # Define resources_tags class to get/set resources & their assigned tags
 class resources_tags:
+
+    # Inventory engine used for each unit.  "describe" uses each service's describe & list APIs.
+    # "describe_tags" reads instances & volumes with Amazon EC2's DescribeTags, which only returns
+    # the (resource ID, key, value) tags of tagged resources instead of complete resource descriptions.
+    # "tagging_api" uses the Resource Groups Tagging API, which only returns resources that are
+    # or have been tagged, & falls back to "describe" if the Tagging API returns an error.
+    # The engines listing tagged resources only build the tag key & value lists.  Resource lists
+    # that can include untagged resources always use "describe"
+    inventory_engines = {
+        'instances': 'describe_tags',
+        'volumes': 'describe_tags',
+        'buckets': 'describe',
+        'functions': 'describe'
+    }
+    # Tag write engine used for buckets & functions.  "native" uses each service's own tagging APIs.
+    # "tagging_api" sends batched Resource Groups Tagging API TagResources requests, which add to
+    # the existing tags of a resource & need the tag:GetResources & tag:TagResources permissions
+    tag_write_engines = {
+        'buckets': 'native',
+        'functions': 'native'
+    }
     
     #Class constructor
-    def __init__(self, resource_type, unit, region):
+    # refresh reads resources & tags from AWS instead of the inventory store & cached tag indexes
+    def __init__(self, resource_type, unit, region, refresh=False):
         # EBS uses the "ec2" Boto3 client
         if resource_type == "ebs":
             self.resource_type = "ec2"
@@ -34,6 +72,9 @@ class resources_tags:
             self.resource_type = resource_type
         self.unit = unit
         self.region = region
+        self.refresh = refresh
+        # Tag indexes used by this object keyed by identity, region & unit
+        self.tag_indexes = dict()
 
     #Returns a sorted list of all resources for the resource type specified  
     def get_resources(self, filter_tags, **session_credentials):
@@ -41,258 +82,58 @@ class resources_tags:
         self.filter_tags = dict()
         self.filter_tags = filter_tags
         log.debug("The received filter tags are: {}".format(self.filter_tags))
+        tag_filter = compile_tag_filters(self.filter_tags)
 
         self.session_credentials = {}
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
         
-        client = this_session.client(self.resource_type, region_name=self.region)
-
-        def _get_filtered_resources(client_command):
-            
-            filters_list = list()
-
-            # Issue Boto3 method using client, client command & filters list
-            def _boto3_get_method():
-                try:
-                    filtered_resources = getattr(client, client_command)(
-                        Filters=filters_list
-                    )
-                    my_status.success(message='Resources Found!')
-                    log.debug("The filtered resources are: {}".format(filtered_resources))
-                    return filtered_resources
-                    
-                except botocore.exceptions.ClientError as error:
-                    errorString = "Boto3 API returned error. function: {} - {}"
-                    log.error(errorString.format(sys._getframe().f_code.co_name, error))
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                        error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                        error.response['Error']['Code'] == 'AccessDenied':
-                        my_status.error(message='You are not authorized to view these resources')
-                    else:
-                        my_status.error()
-                    filtered_resources = dict()
-                    return filtered_resources
-            
-            # Add any selected tag keys and values to the AWS resource filter "filters_list"
-            if self.filter_tags.get('conjunction') == 'AND':
-                if self.filter_tags.get('tag_key1'):
-                    tag_dict = dict()
-                    tag_value_list = list()
-                    if self.filter_tags.get('tag_value1'):
-                        tag_dict['Name'] = 'tag:' + self.filter_tags.get('tag_key1')
-                        tag_value_list.append(self.filter_tags.get('tag_value1'))
-                    else:
-                        tag_dict['Name'] = 'tag-key'
-                        tag_value_list.append(self.filter_tags.get('tag_key1'))
-                    tag_dict['Values'] = tag_value_list
-                    filters_list.append(tag_dict)
-                if self.filter_tags.get('tag_key2'):
-                    tag_dict = dict()
-                    tag_value_list = list()
-                    if self.filter_tags.get('tag_value2'):
-                        tag_dict['Name'] = 'tag:' + self.filter_tags.get('tag_key2')
-                        tag_value_list.append(self.filter_tags.get('tag_value2'))
-                    else:
-                        tag_dict['Name'] = 'tag-key'
-                        tag_value_list.append(self.filter_tags.get('tag_key2'))
-                    tag_dict['Values'] = tag_value_list
-                    filters_list.append(tag_dict)
-                
-                requested_resources = _boto3_get_method()
-                returned_dict = dict()
-                returned_dict['results_1'] = requested_resources
-                return returned_dict
-
-            elif self.filter_tags.get('conjunction') == 'OR':
-                tag1_matching_resources = dict()
-                tag2_matching_resources = dict()
-                if self.filter_tags.get('tag_key1'):
-                    tag_dict = dict()
-                    tag_value_list = list()
-                    if self.filter_tags.get('tag_value1'):
-                        tag_dict['Name'] = 'tag:' + self.filter_tags.get('tag_key1')
-                        tag_value_list.append(self.filter_tags.get('tag_value1'))
-                    else:
-                        tag_dict['Name'] = 'tag-key'
-                        tag_value_list.append(self.filter_tags.get('tag_key1'))
-                    tag_dict['Values'] = tag_value_list
-                    filters_list.append(tag_dict)
-                    tag1_matching_resources = _boto3_get_method()
-                if self.filter_tags.get('tag_key2'):
-                    filters_list = list()
-                    tag_dict = dict()
-                    tag_value_list = list()
-                    if self.filter_tags.get('tag_value2'):
-                        tag_dict['Name'] = 'tag:' + self.filter_tags.get('tag_key2')
-                        tag_value_list.append(self.filter_tags.get('tag_value2'))
-                    else:
-                        tag_dict['Name'] = 'tag-key'
-                        tag_value_list.append(self.filter_tags.get('tag_key2'))
-                    tag_dict['Values'] = tag_value_list
-                    filters_list.append(tag_dict)
-                    tag2_matching_resources = _boto3_get_method()
-            
-                returned_dict = dict()
-                # Place Boto3 filtered results into a dictionary return package
-                if tag1_matching_resources and tag2_matching_resources:
-                    returned_dict['results_1'] = tag1_matching_resources
-                    returned_dict['results_2'] = tag2_matching_resources
-                    return returned_dict
-                elif tag1_matching_resources and not tag2_matching_resources:
-                    returned_dict['results_1'] = tag1_matching_resources
-                    return returned_dict
-                elif not tag1_matching_resources and tag2_matching_resources:
-                    returned_dict['results_1'] = tag2_matching_resources
-                    return returned_dict
-                else:
-                    return None
-
-            else:
-                    return None
-
-        def _get_named_resources(client_command):
-            try:
-                named_resources = getattr(client, client_command)(
-                    Filters=[
-                        {
-                            'Name': 'tag-key',
-                            'Values': [
-                                'name',
-                                'Name'
-                            ]
-                        }
-                    ]
-                )
-                my_status.success(message='Resources Found!')
-                log.debug("The named resources are: {}".format(named_resources))
-                return named_resources
-
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(sys._getframe().f_code.co_name, error))
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-                named_resources = dict()
-                return named_resources
+        # Search the inventory store's tag indexes instead of AWS when it holds a fresh copy of the unit
+        store_owner = self._get_store_owner(**session_credentials)
+        if store_owner is not None:
+            named_resource_inventory = dict()
+            for resource_id, resource_tags in tag_tamer_inventory_store.find_resources(*store_owner, self.region, self.unit, tag_filter).items():
+                named_resource_inventory[resource_id] = self._get_resource_name(resource_id, resource_tags)
+            my_status.success(message='Resources Found!')
+            return sorted(named_resource_inventory.items(), key=lambda item: item[1]), my_status.get_status()
+
+        # Search the inverted index of the unit's cached tag index while it is younger than the cache TTL
+        # when it includes every resource the search can match
+        inventory_index = self._peek_tag_index(**session_credentials)
+        if inventory_index is not None and (inventory_index.lists_untagged or not tag_filter.matches(None)):
+            named_resource_inventory = dict()
+            for resource_id in inventory_index.find_resources(tag_filter):
+                named_resource_inventory[resource_id] = self._get_resource_name(resource_id, inventory_index.get_resource_tags(resource_id))
+            my_status.success(message='Resources Found!')
+            return sorted(named_resource_inventory.items(), key=lambda item: item[1]), my_status.get_status()
 
         named_resource_inventory = dict()
-        if self.unit == 'instances':
-            if self.filter_tags.get('tag_key1') or self.filter_tags.get('tag_key2'):
-                try:
-                    filtered_resources = _get_filtered_resources('describe_instances')
-                    for _, results in filtered_resources.items():
-                        for item in results['Reservations']:
-                            for resource in item['Instances']:
-                                named_resource_inventory[resource['InstanceId']] = 'no name found'
-                                for tag in resource['Tags']:
-                                    if(tag['Key'].lower() == 'name'):
-                                        named_resource_inventory[resource['InstanceId']] = tag['Value']
-
-                except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error. function: {} - {}".format(sys._getframe().f_code.co_name, error))
-            else:
-                try:
-                    named_resources = _get_named_resources('describe_instances')
-                    selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                    for resource in selected_resource_type.instances.all():
-                        named_resource_inventory[resource.id] = 'no name found'
-                    for item in named_resources['Reservations']:
-                        for resource in item['Instances']:
-                            for tag in resource['Tags']:
-                                if(tag['Key'].lower() == 'name'):
-                                    named_resource_inventory[resource['InstanceId']] = tag['Value']
-                    my_status.success(message='Resources Found!')
-                except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error. function: {} - {}".format(sys._getframe().f_code.co_name, error))
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                        error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                        error.response['Error']['Code'] == 'AccessDenied':
-                        my_status.error(message='You are not authorized to view these resources')
-                    else:
-                        my_status.error()
-
-        elif self.unit == 'volumes':
-            if self.filter_tags.get('tag_key1') or self.filter_tags.get('tag_key2'):
-                try:
-                    filtered_resources = _get_filtered_resources('describe_volumes')
-                    for _, results in filtered_resources.items():
-                        for item in results['Volumes']:
-                            named_resource_inventory[item['VolumeId']] = 'no name found'
-                            for tag in item['Tags']:
-                                if(tag['Key'].lower() == 'name'):
-                                    named_resource_inventory[item['VolumeId']] = tag['Value']
-
-                except botocore.exceptions.ClientError as error:
-                    log.error("Boto3 API returned error. function: {} - {}".format(sys._getframe().f_code.co_name, error))
-            else:
-                try:
-                    named_resources = _get_named_resources('describe_volumes')
-                    selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                    for resource in selected_resource_type.volumes.all():
-                        named_resource_inventory[resource.id] = 'no name found'
-                    for item in named_resources['Volumes']:
-                            for tag in item['Tags']:
-                                if(tag['Key'].lower() == 'name'):
-                                    named_resource_inventory[item['VolumeId']] = tag['Value']
-                    my_status.success(message='Resources Found!')
-                except botocore.exceptions.ClientError as error:
-                    errorString = "Boto3 API returned error. function: {} - {}"
-                    log.error(errorString.format(sys._getframe().f_code.co_name, error))
-                    named_resource_inventory["No Resource Found"] = "No Resource Found"
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                        error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                        error.response['Error']['Code'] == 'AccessDenied':
-                        my_status.error(message='You are not authorized to view these resources')
-                    else:
-                        my_status.error()
+        tagging_api_resources = None
+        # The Tagging API never lists untagged resources so searches an untagged resource can match skip it
+        if tag_filter.clauses and not tag_filter.matches(None) and self.inventory_engines.get(self.unit) == 'tagging_api':
+            tagging_api_resources = self._get_tagging_api_named_resources(tag_filter, **session_credentials)
+
+        if tagging_api_resources is not None:
+            named_resource_inventory = tagging_api_resources
+            my_status.success(message='Resources Found!')
+        elif self.unit == 'instances' or self.unit == 'volumes':
+            # Resources are found in the cached tag index so each page of a paged inventory shares one pass.
+            # Searches untagged resources cannot match use the index of the unit's configured inventory engine
+            inventory_index = self._get_tag_index(list_untagged=tag_filter.matches(None), **session_credentials)
+            for resource_id in inventory_index.find_resources(tag_filter):
+                named_resource_inventory[resource_id] = self._get_resource_name(resource_id, inventory_index.get_resource_tags(resource_id))
+            my_status = inventory_index.my_status
 
         elif self.unit == 'buckets':
-            if self.filter_tags.get('tag_key1') or self.filter_tags.get('tag_key2'):
-                for resource in selected_resource_type.buckets.all(): 
-                    log.debug("This bucket name is: {}".format(resource))
-                    try:
-                        response = client.get_bucket_tagging(
-                            Bucket=resource.name
-                        )
-                        my_status.success(message='Resources Found!')
-                    except botocore.exceptions.ClientError as error:
-                        errorString = "Boto3 API returned error. function: {} - {}"
-                        log.error(errorString.format(resource.name, error))
-                        if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                            error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                            error.response['Error']['Code'] == 'AccessDenied':
-                            my_status.error(message='You are not authorized to view these resources')
-                        else:
-                            my_status.error()
-                        response = dict()
-                    if 'TagSet' in response:
-                        for tag in response['TagSet']:
-                            if self.filter_tags.get('tag_key1'):
-                                if self.filter_tags.get('tag_value1'):
-                                    if tag.get('Key') == self.filter_tags.get('tag_key1') and tag.get('Value') == self.filter_tags.get('tag_value1'):
-                                        named_resource_inventory[resource.name] = resource.name
-                                else:
-                                    if tag.get('Key') == self.filter_tags.get('tag_key1'):
-                                        named_resource_inventory[resource.name] = resource.name
-                            if self.filter_tags.get('tag_key2'):
-                                if self.filter_tags.get('tag_value2'):
-                                    if tag.get('Key') == self.filter_tags.get('tag_key2') and tag.get('Value') == self.filter_tags.get('tag_value2'):
-                                        named_resource_inventory[resource.name] = resource.name
-                                else:
-                                    if tag.get('Key') == self.filter_tags.get('tag_key2'):
-                                        named_resource_inventory[resource.name] = resource.name
+            if tag_filter.clauses:
+                # S3 has no server-side tag filter so buckets are matched against the shared tag index
+                inventory_index = self._get_tag_index(list_untagged=tag_filter.matches(None), **session_credentials)
+                for bucket_name in inventory_index.find_resources(tag_filter):
+                    named_resource_inventory[bucket_name] = bucket_name
+                my_status = inventory_index.my_status
             else:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
+                selected_resource_type = tag_tamer_session_pool.get_resource(self.resource_type, self.region, **session_credentials)
                 try:
                     for resource in selected_resource_type.buckets.all():   
                         named_resource_inventory[resource.name] = resource.name
@@ -310,8 +151,8 @@ class resources_tags:
                         my_status.error()
 
         elif self.unit == "functions":
-            functions_inventory = lambda_resources_tags(self.resource_type, self.region)
-            named_resource_inventory, lambda_resources_status = functions_inventory.get_lambda_names_ids(self.filter_tags, **self.session_credentials)
+            functions_inventory = lambda_resources_tags(self.resource_type, self.region, inventory_engine=self.inventory_engines.get('functions'))
+            named_resource_inventory, lambda_resources_status = functions_inventory.get_lambda_names_ids(self.filter_tags, **session_credentials)
             return named_resource_inventory, lambda_resources_status
 
         # Sort the resources based on the resource's name
@@ -319,291 +160,394 @@ class resources_tags:
         ordered_inventory = sorted(named_resource_inventory.items(), key=lambda item: item[1])
         return ordered_inventory, my_status.get_status()
             
+    # Returns a dictionary of resource ID:name for the resources matching the tag filter using
+    # Tagging API TagFilters, or None if the Tagging API returned an error
+    def _get_tagging_api_named_resources(self, tag_filter, **session_credentials):
+        named_resource_inventory = dict()
+        try:
+            inventory = tagging_api_inventory(self.region, **session_credentials)
+            filtered_resources = list()
+            for tag_filter_list in tag_filter.get_tagging_api_filter_lists():
+                filtered_resources.extend(inventory.get_resources_tags(self.unit, tag_filter_list))
+            filtered_tags = dict(filtered_resources)
+            matching_resource_ids = tag_filter.filter_resources(
+                (resource_id, dict(tags)) for resource_id, tags in filtered_resources)
+            for resource_id in matching_resource_ids:
+                tags = filtered_tags[resource_id]
+                if self.unit == 'instances' or self.unit == 'volumes':
+                    named_resource_inventory[resource_id] = 'no name found'
+                    for tag_key, tag_value in tags:
+                        if(tag_key.lower() == 'name'):
+                            named_resource_inventory[resource_id] = tag_value
+                elif self.unit == 'functions':
+                    # The function name is the last element of its unqualified ARN
+                    named_resource_inventory[resource_id] = resource_id.split(':')[6]
+                else:
+                    named_resource_inventory[resource_id] = resource_id
+        except botocore.exceptions.ClientError as error:
+            log.error("Boto3 API returned error. function: {} - {}".format(sys._getframe().f_code.co_name, error))
+            return None
+        return named_resource_inventory
+
+    # Returns the tag index for this object's resource type built by one inventory pass.
+    # Indexes are shared across requests through the inventory cache keyed by the user's
+    # identity, region & unit so every getter & every reload shares one pass.  list_untagged asks for
+    # an index of the untagged resources too, which replaces a cached index of tagged resources only
+    def _get_tag_index(self, list_untagged=False, **session_credentials):
+        index_key = (session_credentials.get('IdentityId') or session_credentials['AccessKeyId'], self.region, self.unit)
+        inventory_engine = 'describe' if list_untagged else None
+        inventory_index = self.tag_indexes.get(index_key)
+        if inventory_index is None and not self.refresh:
+            inventory_index = get_cached_tag_index(self.region, self.unit,
+                lambda: get_stored_tag_index(self.region, self.unit,
+                    lambda: self._scan_tag_index(inventory_engine, **session_credentials),
+                    lambda: self._authorize_inventory(**session_credentials), **session_credentials),
+                **session_credentials)
+        if inventory_index is None or (list_untagged and not inventory_index.lists_untagged):
+            inventory_index = refresh_stored_tag_index(self.region, self.unit,
+                lambda: self._scan_tag_index(inventory_engine, **session_credentials), **session_credentials)
+            put_cached_tag_index(self.region, self.unit, inventory_index, **session_credentials)
+        self.tag_indexes[index_key] = inventory_index
+        return inventory_index
+
+    # Returns the (account ID, principal ARN) owning this object's unit in the inventory store when the getters
+    # can search the store instead of AWS, otherwise None
+    def _get_store_owner(self, **session_credentials):
+        if self.refresh:
+            return None
+        return get_store_owner(self.region, self.unit,
+            lambda: self._authorize_inventory(**session_credentials), **session_credentials)
+
+    # Returns the user's cached tag index of this object's unit while it is younger than the cache TTL, otherwise None
+    def _peek_tag_index(self, **session_credentials):
+        if self.refresh:
+            return None
+        return peek_cached_tag_index(self.region, self.unit, **session_credentials)
+
+    # Rebuild this object's unit in the inventory store with a full inventory pass & return its execution status.
+    # shared rebuilds the account's copy served to every user allowed to list the unit instead of the caller's own.
+    # The store only holds units listing their untagged resources so the pass uses the describe inventory engine
+    def refresh_stored_inventory(self, shared=False, **session_credentials):
+        inventory_index = refresh_stored_tag_index(self.region, self.unit,
+            lambda: self._scan_tag_index('describe', **session_credentials), shared=shared, **session_credentials)
+        return inventory_index.my_status.get_status()
+
+    # Returns the name shown for a resource with a tags dictionary or None
+    def _get_resource_name(self, resource_id, resource_tags):
+        if self.unit == 'functions':
+            # The function name is the last element of its unqualified ARN
+            return resource_id.split(':')[6]
+        elif self.unit == 'buckets':
+            return resource_id
+        for tag_key, tag_value in (resource_tags or dict()).items():
+            if(tag_key.lower() == 'name'):
+                return tag_value
+        return 'no name found'
+
+    # Returns True if the user may list this object's resource type.  One small list call
+    # guards every inventory served from the persisted store
+    def _authorize_inventory(self, **session_credentials):
+        try:
+            if self.unit == 'instances':
+                tag_tamer_session_pool.get_client('ec2', self.region, **session_credentials).describe_instances(MaxResults=5)
+            elif self.unit == 'volumes':
+                tag_tamer_session_pool.get_client('ec2', self.region, **session_credentials).describe_volumes(MaxResults=5)
+            elif self.unit == 'buckets':
+                tag_tamer_session_pool.get_client('s3', self.region, **session_credentials).list_buckets()
+            elif self.unit == 'functions':
+                tag_tamer_session_pool.get_client('lambda', self.region, **session_credentials).list_functions(MaxItems=1)
+            return True
+        except botocore.exceptions.ClientError as error:
+            log.error("Boto3 API returned error: {}".format(error))
+            return False
+
+    # Inventory pass building a new tag index for this object's resource type with the inventory engine,
+    # by default the engine configured for the unit
+    def _scan_tag_index(self, inventory_engine=None, **session_credentials):
+        inventory_index = tag_index()
+        try:
+            for _ in self._walk_tag_index(inventory_index, inventory_engine or self.inventory_engines.get(self.unit), **session_credentials):
+                pass
+            if inventory_index.my_status.get_status().get('alert_level') != 'danger':
+                inventory_index.my_status.success(message='Resources and tags found!')
+        except botocore.exceptions.ClientError as error:
+            self._set_inventory_error(inventory_index.my_status, error)
+        return inventory_index
+
+    # Set the execution status of an inventory pass that failed with a Boto3 ClientError
+    def _set_inventory_error(self, my_status, error):
+        errorString = "Boto3 API returned error. function: {} - {}"
+        log.error(errorString.format(self.unit, error))
+        if error.response['Error']['Code'] == 'AccessDeniedException' or \
+            error.response['Error']['Code'] == 'UnauthorizedOperation' or \
+            error.response['Error']['Code'] == 'AccessDenied':
+            my_status.error(message='You are not authorized to view these resources')
+        else:
+            my_status.error()
+
+    # Inventory pass adding every resource of this object's resource type & its tags to the tag index using
+    # the inventory engine.  Yields each (resource ID, tags dictionary or None) tuple as its page arrives.
+    # Indexes built by an engine listing tagged resources only are marked as not listing untagged resources.
+    # Boto3 ClientErrors are raised to the caller
+    def _walk_tag_index(self, inventory_index, inventory_engine, **session_credentials):
+        if self.unit == 'functions':
+            functions_inventory = lambda_resources_tags(self.resource_type, self.region, inventory_engine=inventory_engine)
+            yield from functions_inventory.walk_lambda_tag_index(inventory_index, **session_credentials)
+            return
+
+        if inventory_engine == 'tagging_api':
+            walked_resources = 0
+            inventory_index.lists_untagged = False
+            try:
+                for resource_id, resource_tags in tagging_api_inventory(self.region, **session_credentials).walk_tag_index(inventory_index, self.unit):
+                    walked_resources += 1
+                    yield resource_id, resource_tags
+                return
+            except botocore.exceptions.ClientError as error:
+                # Resources already yielded cannot be read again by another engine
+                if walked_resources:
+                    raise
+                errorString = "Boto3 API returned error. function: {} - {}"
+                log.error(errorString.format(self.unit, error))
+                log.info('Using the describe inventory engine for %s', self.unit)
+                inventory_index.lists_untagged = True
+
+        # Interate through resources & inject resource ID's with user-defined tag key:value pairs per resource into the index
+        selected_resource_type = tag_tamer_session_pool.get_resource(self.resource_type, self.region, **session_credentials)
+        if (self.unit == 'instances' or self.unit == 'volumes') and inventory_engine == 'describe_tags':
+            inventory_index.lists_untagged = False
+            resources = self._walk_ec2_tags(**session_credentials)
+        elif self.unit == 'instances':
+            resources = ((item.id, [(tag["Key"], tag["Value"]) for tag in item.tags] if item.tags is not None else None)
+                for item in selected_resource_type.instances.all())
+        elif self.unit == 'volumes':
+            resources = ((item.id, [(tag["Key"], tag["Value"]) for tag in item.tags] if item.tags is not None else None)
+                for item in selected_resource_type.volumes.all())
+        elif self.unit == 'buckets':
+            resources = self._walk_buckets_tags(selected_resource_type, **session_credentials)
+        for resource_id, tags in resources:
+            inventory_index.add_resource(resource_id, tags)
+            yield resource_id, inventory_index.get_resource_tags(resource_id)
+
+    # Yields a (resource ID, list of (key, value) tag tuples) tuple for every tagged instance or volume as each
+    # page of one paginated Amazon EC2 DescribeTags call stream arrives.  DescribeTags lists tags in resource ID
+    # order & a resource's tags may span pages, so the last resource of a page is held until the next page
+    def _walk_ec2_tags(self, **session_credentials):
+        client = tag_tamer_session_pool.get_client('ec2', self.region, **session_credentials)
+        paginator = client.get_paginator('describe_tags')
+        held_resource_id = None
+        held_tags = list()
+        for page in paginator.paginate(Filters=[{'Name': 'resource-type', 'Values': [self.unit[:-1]]}], MaxResults=1000):
+            for tag in page['Tags']:
+                if tag['ResourceId'] != held_resource_id:
+                    if held_resource_id is not None:
+                        yield held_resource_id, held_tags
+                    held_resource_id = tag['ResourceId']
+                    held_tags = list()
+                held_tags.append((tag['Key'], tag['Value']))
+        if held_resource_id is not None:
+            yield held_resource_id, held_tags
+
+    # Yields a (bucket name, list of (key, value) tag tuples or None) tuple for every bucket, reading the
+    # tags of 100 buckets at a time
+    def _walk_buckets_tags(self, selected_resource_type, **session_credentials):
+        bucket_names = [item.name for item in selected_resource_type.buckets.all()]
+        buckets_tags_reader = bucket_tags(self.region, **session_credentials)
+        for start in range(0, len(bucket_names), 100):
+            for bucket_name, (tag_set, _) in buckets_tags_reader.get_buckets_tags(bucket_names[start:start + 100]).items():
+                yield bucket_name, [(tag["Key"], tag["Value"]) for tag in tag_set] if tag_set is not None else None
+
+    # Yields a (resource ID, tags dictionary or None) tuple for every resource of this object's resource type
+    # matching the tag filter as it is found & sets the status of the inventory index it builds once done.
+    # A fresh inventory store or cached tag index answers without an inventory pass, otherwise the completed
+    # pass is cached & saved in the inventory store like any other
+    def _walk_inventory(self, inventory_index, tag_filter, **session_credentials):
+        store_owner = self._get_store_owner(**session_credentials)
+        if store_owner is not None:
+            yield from tag_tamer_inventory_store.find_resources(*store_owner, self.region, self.unit, tag_filter).items()
+            inventory_index.my_status.success(message='Resources and tags found!')
+            return
+        cached_index = self._peek_tag_index(**session_credentials)
+        if cached_index is not None and (cached_index.lists_untagged or not tag_filter.matches(None)):
+            for resource_id in cached_index.find_resources(tag_filter):
+                yield resource_id, cached_index.get_resource_tags(resource_id)
+            inventory_index.my_status.success(message='Resources and tags found!')
+            return
+
+        # Engines listing tagged resources only cannot find the untagged resources the search matches
+        inventory_engine = 'describe' if tag_filter.matches(None) else self.inventory_engines.get(self.unit)
+        reconciled_time = time()
+        try:
+            for resource_id, resource_tags in self._walk_tag_index(inventory_index, inventory_engine, **session_credentials):
+                if tag_filter.matches(resource_tags):
+                    yield resource_id, resource_tags
+            if inventory_index.my_status.get_status().get('alert_level') != 'danger':
+                inventory_index.my_status.success(message='Resources and tags found!')
+        except botocore.exceptions.ClientError as error:
+            self._set_inventory_error(inventory_index.my_status, error)
+        put_cached_tag_index(self.region, self.unit, inventory_index, **session_credentials)
+        save_stored_tag_index(self.region, self.unit, inventory_index, reconciled_time, **session_credentials)
+
+    # Returns a generator of (resource ID, tags dictionary) tuples for every resource & its key:value tags
+    # yielded in inventory order as each page arrives, & the execution status of the inventory, which is
+    # final once the generator is exhausted
+    def stream_resources_tags(self, **session_credentials):
+        inventory_index = tag_index()
+        def _stream():
+            for resource_id, resource_tags in self._walk_inventory(inventory_index, compile_tag_filters(dict()), **session_credentials):
+                yield resource_id, resource_tags if resource_tags is not None else {"No Tags Found": "No Tags Found"}
+        return _stream(), inventory_index.my_status.get_status()
+
+    # Returns a generator of (resource ID, resource name) tuples for the resources matching the filter tags
+    # yielded in inventory order as each page arrives, & the execution status of the inventory, which is
+    # final once the generator is exhausted
+    def stream_resources(self, filter_tags, **session_credentials):
+        inventory_index = tag_index()
+        tag_filter = compile_tag_filters(filter_tags)
+        def _stream():
+            for resource_id, resource_tags in self._walk_inventory(inventory_index, tag_filter, **session_credentials):
+                yield resource_id, self._get_resource_name(resource_id, resource_tags)
+        return _stream(), inventory_index.my_status.get_status()
+
     # Returns a nested dictionary of every resource & its key:value tags for the chosen resource type
     # No input arguments
     def get_resources_tags(self, **session_credentials):
         log.debug('The received session credentials are: %s', session_credentials)
-        my_status = execution_status()
-        # Instantiate dictionaries to hold resources & their tags
-        tagged_resource_inventory = {}
-        sorted_tagged_resource_inventory = {}
-
         self.session_credentials = {}
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
-        
-        # Interate through resources & inject resource ID's with user-defined tag key:value pairs per resource into a nested dictionary
-        # indexed by resource ID
-        if self.unit == 'instances':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.instances.all():
-                    resource_tags = {}
-                    sorted_resource_tags = {}
-                    try:
-                        for tag in item.tags:
-                            if not re.search("^aws:", tag["Key"]):
-                                resource_tags[tag["Key"]] = tag["Value"]
-                    except:
-                        resource_tags["No Tags Found"] = "No Tags Found"
-                    sorted_resource_tags = OrderedDict(sorted(resource_tags.items()))
-                    tagged_resource_inventory[item.id] = sorted_resource_tags
-                my_status.success(message='Resources and tags found!')
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                tagged_resource_inventory["No Resource Found"] = {"No Tags Found": "No Tags Found"}
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'volumes':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.volumes.all():
-                    resource_tags = {}
-                    sorted_resource_tags = {}
-                    try:
-                        for tag in item.tags:
-                            if not re.search("^aws:", tag["Key"]):
-                                resource_tags[tag["Key"]] = tag["Value"]
-                    except:
-                        resource_tags["No Tags Found"] = "No Tags Found"
-                    sorted_resource_tags = OrderedDict(sorted(resource_tags.items()))
-                    tagged_resource_inventory[item.id] = sorted_resource_tags
-                my_status.success(message='Resources and tags found!')
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                tagged_resource_inventory["No Resource Found"] = {"No Tags Found": "No Tags Found"}
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'buckets':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.buckets.all():
-                    resource_tags = {}
-                    sorted_resource_tags = {}
-                    try:
-                        for tag in selected_resource_type.BucketTagging(item.name).tag_set:
-                            if not re.search("^aws:", tag["Key"]):
-                                resource_tags[tag["Key"]] = tag["Value"]
-                    except:
-                        resource_tags["No Tags Found"] = "No Tags Found"
-                    sorted_resource_tags = OrderedDict(sorted(resource_tags.items()))
-                    tagged_resource_inventory[item.name] = sorted_resource_tags
-                my_status.success(message='Resources and tags found!')
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                tagged_resource_inventory["No Resource Found"] = {"No Tags Found": "No Tags Found"}
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'functions':
-            functions_inventory = lambda_resources_tags(self.resource_type, self.region)
-            tagged_resource_inventory, lambda_resources_status = functions_inventory.get_lambda_resources_tags(**self.session_credentials)
-            return tagged_resource_inventory, lambda_resources_status
 
-        sorted_tagged_resource_inventory = OrderedDict(sorted(tagged_resource_inventory.items()))
+        store_owner = self._get_store_owner(**session_credentials)
+        if store_owner is not None:
+            my_status = execution_status()
+            my_status.success(message='Resources and tags found!')
+            return tag_tamer_inventory_store.get_resources_tags(*store_owner, self.region, self.unit), my_status.get_status()
+
+        inventory_index = self._get_tag_index(list_untagged=True, **session_credentials)
+        sorted_tagged_resource_inventory = inventory_index.get_resources_tags()
+        if inventory_index.my_status.get_status().get('alert_level') == 'danger':
+            sorted_tagged_resource_inventory["No Resource Found"] = {"No Tags Found": "No Tags Found"}
+
+        return sorted_tagged_resource_inventory, inventory_index.my_status.get_status()
 
-        return sorted_tagged_resource_inventory, my_status.get_status()
+    # Returns a dictionary of resource ID -> key:value tags read for only the given resources, for example the
+    # resources just tagged, & the execution status of the read.  Instance & volume tags are read by batched
+    # describe_tags calls, function tags by list_tags & bucket tags by bucket.  Resources whose tags could not
+    # be read are left out
+    def get_resources_tags_by_id(self, resource_ids, **session_credentials):
+        my_status = execution_status()
+        resource_ids = list(dict.fromkeys(resource_ids))
+        read_tags = self._read_resources_tags(resource_ids, **session_credentials)
+        tagged_resource_inventory = OrderedDict((resource_id, read_tags[resource_id] or {"No Tags Found": "No Tags Found"})
+            for resource_id in resource_ids if resource_id in read_tags)
+        if len(tagged_resource_inventory) == len(resource_ids):
+            my_status.success(message='Resources and tags found!')
+        elif tagged_resource_inventory:
+            my_status.warning(message='Tags could not be read for: {}'.format(
+                ', '.join(resource_id for resource_id in resource_ids if resource_id not in tagged_resource_inventory)))
+        else:
+            my_status.error()
+        return tagged_resource_inventory, my_status.get_status()
 
     # Getter method retrieves every tag:key for object's resource type
     # No input arguments
     def get_tag_keys(self, **session_credentials):
-        my_status = execution_status()
-        sorted_tag_keys_inventory = list()
-
         self.session_credentials = {}
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
 
-        if self.unit == 'instances':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.instances.all():
-                    try:
-                        for tag in item.tags:
-                            if not re.search("^aws:", tag["Key"]):
-                                sorted_tag_keys_inventory.append(tag["Key"])
-                        my_status.success(message='Resources and tags found!')
-                    except:
-                        #sorted_tag_keys_inventory.append("No tag keys found")
-                        sorted_tag_keys_inventory.append("")
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                #sorted_tag_keys_inventory.append("No tag keys found")
-                sorted_tag_keys_inventory.append("")
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'volumes':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.volumes.all():
-                    try:
-                        for tag in item.tags:
-                            if not re.search("^aws:", tag["Key"]):
-                                sorted_tag_keys_inventory.append(tag["Key"])
-                        my_status.success(message='Resources and tags found!')
-                    except:
-                        sorted_tag_keys_inventory.append("No Tags Found")
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                sorted_tag_keys_inventory.append("No Tags Found")
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'buckets':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.buckets.all():
-                    try:
-                        for tag in selected_resource_type.BucketTagging(item.name).tag_set:
-                            if not re.search("^aws:", tag["Key"]):
-                                sorted_tag_keys_inventory.append(tag["Key"])
-                        my_status.success(message='Resources and tags found!')
-                    except:
-                        sorted_tag_keys_inventory.append("No Tags Found")
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                sorted_tag_keys_inventory.append("No Tags Found")
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'functions':
-            functions_inventory = lambda_resources_tags(self.resource_type, self.region)
-            sorted_tag_keys_inventory, lambda_resources_status = functions_inventory.get_lambda_tag_keys(**self.session_credentials)
-            return sorted_tag_keys_inventory, lambda_resources_status
+        store_owner = self._get_store_owner(**session_credentials)
+        if store_owner is not None:
+            my_status = execution_status()
+            my_status.success(message='Resources and tags found!')
+            return tag_tamer_inventory_store.get_tag_keys(*store_owner, self.region, self.unit), my_status.get_status()
 
-        #Remove duplicate tags & sort
-        sorted_tag_keys_inventory = list(set(sorted_tag_keys_inventory))
-        sorted_tag_keys_inventory.sort(key=str.lower)
+        inventory_index = self._get_tag_index(**session_credentials)
+        sorted_tag_keys_inventory = inventory_index.get_tag_keys()
+        if inventory_index.my_status.get_status().get('alert_level') == 'danger':
+            sorted_tag_keys_inventory.append("No Tags Found")
 
-        return sorted_tag_keys_inventory, my_status.get_status()
+        return sorted_tag_keys_inventory, inventory_index.my_status.get_status()
 
     # Getter method retrieves every tag:value for object's resource type
     # No input arguments
     def get_tag_values(self, **session_credentials):
-        my_status = execution_status()
-        sorted_tag_values_inventory = list()
-
         self.session_credentials = {}
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
 
-        if self.unit == 'instances':
+        store_owner = self._get_store_owner(**session_credentials)
+        if store_owner is not None:
+            my_status = execution_status()
+            my_status.success(message='Resources and tags found!')
+            return tag_tamer_inventory_store.get_tag_values(*store_owner, self.region, self.unit), my_status.get_status()
+
+        inventory_index = self._get_tag_index(**session_credentials)
+        sorted_tag_values_inventory = inventory_index.get_tag_values()
+        if inventory_index.my_status.get_status().get('alert_level') == 'danger':
+            sorted_tag_values_inventory.append("No Tags Found")
+
+        return sorted_tag_values_inventory, inventory_index.my_status.get_status()
+
+    # Returns a dictionary of resource ID -> tags dictionary or None for the given resources, taken from the
+    # cached tag index while it is younger than the cache TTL & otherwise read for only the resources missing
+    # from it.  Resources whose tags could not be read are left out
+    def _get_current_tags(self, resource_ids, **session_credentials):
+        current_tags = dict()
+        inventory_index = peek_cached_tag_index(self.region, self.unit, **session_credentials)
+        if inventory_index is not None:
+            current_tags = inventory_index.get_resources_by_id(resource_ids)
+        missing_resource_ids = [resource_id for resource_id in dict.fromkeys(resource_ids) if resource_id not in current_tags]
+        if not missing_resource_ids:
+            return current_tags
+        if self.unit == 'buckets' and self.tag_write_engines.get('buckets') == 'tagging_api':
+            # One Tagging API call reads the tags of up to 100 buckets
             try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.instances.all():
-                    try:
-                        for tag in item.tags:
-                            if not re.search("^aws:", tag["Key"]) and tag["Value"]:
-                                sorted_tag_values_inventory.append(tag["Value"])
-                    except:
-                        sorted_tag_values_inventory.append("No Tags Found")
-                my_status.success(message='Resources and tags found!')
+                partition = tag_tamer_session_pool.get_session(**session_credentials).get_partition_for_region(self.region)
+                current_tags.update(tagging_api_inventory(self.region, **session_credentials).get_resources_tags_by_arn(self.unit,
+                    [get_resource_arn(self.unit, resource_id, partition) for resource_id in missing_resource_ids]))
             except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                sorted_tag_values_inventory.append("No Tags Found")
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'volumes':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.volumes.all():
-                    try:
-                        for tag in item.tags:
-                            if not re.search("^aws:", tag["Key"])  and tag["Value"]:
-                                sorted_tag_values_inventory.append(tag["Value"])
-                    except:
-                        sorted_tag_values_inventory.append("No Tags Found")
-                my_status.success(message='Resources and tags found!')
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                sorted_tag_values_inventory.append("No Tags Found")
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
+                log.error("Boto3 API returned error. function: {} - {}".format(sys._getframe().f_code.co_name, error))
+        else:
+            current_tags.update(self._read_resources_tags(missing_resource_ids, **session_credentials))
+        return current_tags
+
+    # Returns a dictionary of resource ID -> tags dictionary or None for the given instances, volumes, buckets or
+    # functions.  Resources whose tags could not be read are left out
+    def _read_resources_tags(self, resource_ids, **session_credentials):
+        current_tags = dict()
+        if self.unit == 'instances' or self.unit == 'volumes':
+            client = tag_tamer_session_pool.get_client(self.resource_type, self.region, **session_credentials)
+            paginator = client.get_paginator('describe_tags')
+            # Read the tags of up to 200 resources per describe_tags filter
+            for start in range(0, len(resource_ids), 200):
+                batch_resources_tags = {resource_id: dict() for resource_id in resource_ids[start:start + 200]}
+                try:
+                    for page in paginator.paginate(
+                        Filters=[{'Name': 'resource-id', 'Values': list(batch_resources_tags)}],
+                        PaginationConfig={'PageSize': 1000}
+                    ):
+                        for tag in page['Tags']:
+                            batch_resources_tags[tag['ResourceId']][tag['Key']] = tag['Value']
+                    current_tags.update(batch_resources_tags)
+                except botocore.exceptions.ClientError as error:
+                    log.error("Boto3 API returned error. function: {} - {}".format(sys._getframe().f_code.co_name, error))
         elif self.unit == 'buckets':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for item in selected_resource_type.buckets.all():
-                    try:
-                        for tag in selected_resource_type.BucketTagging(item.name).tag_set:
-                            if not re.search("^aws:", tag["Key"])  and tag["Value"]:
-                                sorted_tag_values_inventory.append(tag["Value"])
-                    except:
-                        sorted_tag_values_inventory.append("No Tags Found")
-                my_status.success(message='Resources and tags found!')
-            except botocore.exceptions.ClientError as error:
-                errorString = "Boto3 API returned error. function: {} - {}"
-                log.error(errorString.format(self.unit, error))
-                sorted_tag_values_inventory.append("No Tags Found")
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to view these resources')
-                else:
-                    my_status.error()
+            for bucket_name, (tag_set, error) in bucket_tags(self.region, **session_credentials).get_buckets_tags(resource_ids).items():
+                if error is None:
+                    current_tags[bucket_name] = {tag['Key']: tag['Value'] for tag in tag_set} if tag_set is not None else None
         elif self.unit == 'functions':
             functions_inventory = lambda_resources_tags(self.resource_type, self.region)
-            sorted_tag_values_inventory, lambda_resources_status = functions_inventory.get_lambda_tag_values(**self.session_credentials)
-            return sorted_tag_values_inventory, lambda_resources_status
-        
-        #Remove duplicate tags & sort
-        sorted_tag_values_inventory = list(set(sorted_tag_values_inventory))
-        sorted_tag_values_inventory.sort(key=str.lower)
-
-        return sorted_tag_values_inventory, my_status.get_status()
+            for function_arn, (function_tags, error) in functions_inventory.get_lambda_functions_tags(resource_ids, **session_credentials).items():
+                if error is None:
+                    current_tags[function_arn] = function_tags or None
+        return current_tags
 
     #Setter method to update tags on user-selected resources 
+    #Returns a dictionary of resource ID:'success' or AWS error code & the execution status of the update
     def set_resources_tags(self, resources_to_tag, chosen_tags, **session_credentials):
 
         resources_updated_tags = dict()
@@ -613,104 +557,66 @@ class resources_tags:
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
 
-        if self.unit == 'instances':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for resource_id in resources_to_tag:
-                        resource_tag_list = []
-                        instance = selected_resource_type.Instance(resource_id)
-                        resource_tag_list = instance.create_tags(
-                            Tags=chosen_tags
-                        )
-                resources_updated_tags[resource_id] = resource_tag_list
-                my_status.success(message='Tags updated successfully!')
-            except botocore.exceptions.ClientError as error:
-                log.error("Boto3 API returned error: resource {} - {}".format(resource_id, error))
-                #log.error(error.response)
-                resources_updated_tags["No Resources Found"] = "No Tags Applied"
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':
-                    my_status.error(message='You are not authorized to modify these resources')
-                else:
-                    my_status.error()
-        elif self.unit == 'volumes':
-            try:
-                selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                for resource_id in resources_to_tag:
-                        resource_tag_list = []
-                        volume = selected_resource_type.Volume(resource_id)
-                        resource_tag_list = volume.create_tags(
-                            Tags=chosen_tags
-                        )
-                resources_updated_tags[resource_id] = resource_tag_list
-                my_status.success(message='Tags updated successfully!')
-            except botocore.exceptions.ClientError as error:
-                log.error("Boto3 API returned error: resource {} - {}".format(resource_id, error))
-                #log.error(error.response)
-                resources_updated_tags["No Resources Found"] = "No Tags Applied"
-                if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                    error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                    error.response['Error']['Code'] == 'AccessDenied':                   
-                    my_status.error(message='You are not authorized to modify these resources')
-                else:
-                    my_status.error()
+        if self.unit == 'instances' or self.unit == 'volumes':
+            # Batched multi-resource CreateTags requests sent concurrently for the tags each resource lacks
+            current_tags = self._get_current_tags(resources_to_tag, **session_credentials)
+            tag_changes, unchanged_resource_ids = get_tag_changes(resources_to_tag, chosen_tags, current_tags)
+            writer = ec2_tag_writer(self.region, **session_credentials)
+            write_errors = write_tag_changes(self.region, self.unit, tag_changes, writer.create_tags)
+            record_first_tag_writes(self.region, self.unit, [resource_id for resource_id, error in write_errors.items()
+                if error is None and not current_tags.get(resource_id)], chosen_tags, **session_credentials)
+            return get_tag_write_results(write_errors, unchanged_resource_ids)
+        elif self.unit == 'buckets' and self.tag_write_engines.get('buckets') == 'tagging_api':
+            # Batched TagResources requests sent concurrently for the tags each bucket lacks.  Existing bucket tags are kept
+            current_tags = self._get_current_tags(resources_to_tag, **session_credentials)
+            tag_changes, unchanged_resource_ids = get_tag_changes(resources_to_tag, chosen_tags, current_tags)
+            partition = tag_tamer_session_pool.get_session(**session_credentials).get_partition_for_region(self.region)
+            writer = tagging_api_tag_writer(self.region, **session_credentials)
+            def _tag_buckets(bucket_names, tags):
+                arn_write_errors = writer.tag_resources([get_resource_arn(self.unit, bucket_name, partition) for bucket_name in bucket_names], tags)
+                return {get_resource_id(self.unit, resource_arn): error for resource_arn, error in arn_write_errors.items()}
+            write_errors = write_tag_changes(self.region, self.unit, tag_changes, _tag_buckets)
+            return get_tag_write_results(write_errors, unchanged_resource_ids)
         elif self.unit == 'buckets':
-            for resource_id in resources_to_tag:
-                tag_set_dict = dict()
-                resource_tag_list = list()
-                current_applied_tags = dict()
-                try:
-                    client = this_session.client(self.resource_type, region_name=self.region)
-                    current_applied_tags = client.get_bucket_tagging(
-                        Bucket=resource_id
-                    )
-                    log.debug("The existing tags for {} are {}".format(resource_id, current_applied_tags))
-                except botocore.exceptions.ClientError as error:
-                    errorString = "Boto3 API returned error: resource {} - {}"
-                    log.error(errorString.format(resource_id, error))
-                    #log.error(error.response)
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                        error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                        error.response['Error']['Code'] == 'AccessDenied':  
-                        my_status.error(message='You are not authorized to view these resources')
+            # PutBucketTagging replaces a bucket's whole tag set so every bucket's current tags are read first
+            write_errors = dict()
+            bucket_reader = bucket_tags(self.region, **session_credentials)
+            buckets_tags = bucket_reader.get_buckets_tags(dict.fromkeys(resources_to_tag))
+            current_tags = {bucket_name: {tag['Key']: tag['Value'] for tag in tag_set} if tag_set is not None else None
+                for bucket_name, (tag_set, error) in buckets_tags.items() if error is None}
+            tag_changes, unchanged_resource_ids = get_tag_changes(resources_to_tag, chosen_tags, current_tags)
+            for tags, bucket_names in tag_changes:
+                bucket_puts = list()
+                for resource_id in bucket_names:
+                    # Never replace the tag set of a bucket whose current tags could not be read
+                    if resource_id not in current_tags:
+                        write_errors[resource_id] = buckets_tags[resource_id][1]
+                        continue
+                    tag_set_dict = dict()
+                    bucket_tag_dict = dict(current_tags[resource_id] or dict())
+                    bucket_tag_dict.update((tag['Key'], tag['Value']) for tag in tags)
+                    tag_set_dict['TagSet'] = [{'Key': tag_key, 'Value': tag_value} for tag_key, tag_value in bucket_tag_dict.items()]
+                    log.debug("The chosen tags for {} are {}".format(resource_id, tag_set_dict))
+                    bucket_puts.append((resource_id, {'Bucket': resource_id, 'Tagging': tag_set_dict}))
+                # Put every bucket's tag set concurrently through a client of the bucket's region
+                buckets_regions = bucket_reader.get_buckets_regions([resource_id for resource_id, _ in bucket_puts])
+                responses = tag_tamer_api_calls.run_calls(self.resource_type, 'put_bucket_tagging',
+                    [(buckets_regions[resource_id], put_params) for resource_id, put_params in bucket_puts], **session_credentials)
+                for (resource_id, _), (response, error) in zip(bucket_puts, responses):
+                    if error is None:
+                        write_errors[resource_id] = None
+                        log.debug("These tags are applied to the {} bucket: {}".format(resource_id, tags))
                     else:
-                        my_status.error()
-                if current_applied_tags.get('TagSet'):
-                    for current_tag in current_applied_tags['TagSet']:
-                        for new_tag in chosen_tags:
-                            if new_tag['Key'] != current_tag['Key']:
-                                chosen_tags.append(current_tag)
-                tag_set_dict['TagSet'] = chosen_tags
-                log.debug("The chosen tags for {} are {}".format(resource_id, tag_set_dict))
-                try:
-                    selected_resource_type = this_session.resource(self.resource_type, region_name=self.region)
-                    bucket_tagging = selected_resource_type.BucketTagging(resource_id)
-                    resource_tag_list = bucket_tagging.put(
-                        Tagging=tag_set_dict
-                    )
-                    resources_updated_tags[resource_id] = resource_tag_list
-                    my_status.success(message='Tags updated successfully!')
-                    log.debug("These tags are applied to the {} bucket: {}".format(resource_id, resource_tag_list))
-                except botocore.exceptions.ClientError as error:
-                    errorString = "Boto3 API returned error. function: {} - {}"
-                    log.error(errorString.format(resource_id, error))
-                    #log.error(error.response)
-                    resources_updated_tags["No Resources Found"] = "No Tags Applied"
-                    if error.response['Error']['Code'] == 'AccessDeniedException' or \
-                        error.response['Error']['Code'] == 'UnauthorizedOperation' or \
-                        error.response['Error']['Code'] == 'AccessDenied':       
-                        my_status.error(message='You are not authorized to modify these resources')
-                    else:
-                        my_status.error()
+                        errorString = "Boto3 API returned error. function: {} - {}"
+                        log.error(errorString.format(resource_id, error))
+                        write_errors[resource_id] = error
+                record_tag_writes(self.region, self.unit, [resource_id for resource_id, _ in bucket_puts if write_errors[resource_id] is None], tags)
+            record_tag_write_errors(self.region, self.unit, write_errors)
+            return get_tag_write_results(write_errors, unchanged_resource_ids)
         elif self.unit == 'functions':
-            functions_inventory = lambda_resources_tags(self.resource_type, self.region)
-            lambda_resources_status = functions_inventory.set_lambda_resources_tags(resources_to_tag, chosen_tags, **self.session_credentials)
-            return lambda_resources_status
+            functions_inventory = lambda_resources_tags(self.resource_type, self.region, inventory_engine=self.inventory_engines.get('functions'),
+                tag_write_engine=self.tag_write_engines.get('functions'))
+            return functions_inventory.set_lambda_resources_tags(resources_to_tag, chosen_tags, **session_credentials)
 
-        return my_status.get_status()
\ No newline at end of file
+        return resources_updated_tags, my_status.get_status()
\ No newline at end of file
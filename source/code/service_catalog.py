@@ -7,8 +7,8 @@
 
 # Import administrative functions
 from admin import execution_status
-# Import AWS module for python
-import boto3
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
 import botocore
 # Import Collections module to manipulate dictionaries
 import collections
@@ -36,12 +36,8 @@ class service_catalog:
         self.session_credentials['AccessKeyId'] = session_credentials['AccessKeyId']
         self.session_credentials['SecretKey'] = session_credentials['SecretKey']
         self.session_credentials['SessionToken'] = session_credentials['SessionToken']
-        this_session = boto3.session.Session(
-            aws_access_key_id=self.session_credentials['AccessKeyId'],
-            aws_secret_access_key=self.session_credentials['SecretKey'],
-            aws_session_token=self.session_credentials['SessionToken'])
         try:       
-            self.service_catalog_client = this_session.client('servicecatalog', region_name=self.region)
+            self.service_catalog_client = tag_tamer_session_pool.get_client('servicecatalog', self.region, **session_credentials)
         except botocore.exceptions.ClientError as error:
             log.error("Boto3 API returned error: {}".format(error))
             if error.response['Error']['Code'] == 'AccessDeniedException' or error.response['Error']['Code'] == 'UnauthorizedOperation':
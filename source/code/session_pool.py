@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Pool of Boto3 sessions, clients & resources shared by every request thread.
+# Sessions are keyed by the user's access key ID & a hash of their session token,
+# clients by session, service & region.  Entries are evicted when the user's
+# Amazon Cognito credentials expire.
+# Included class & methods
+# class - session_pool
+#  method - configure
+#  method - get_session
+#  method - get_client
+#  method - get_resource
+#  method - evict_expired
+#  method - clear
+
+# Import AWS module for python
+import boto3
+from botocore.config import Config
+# Import the AWS API call metrics
+from api_metrics import tag_tamer_api_metrics
+# Import collections to use ordered dictionaries for LRU ordering
+from collections import OrderedDict
+# Import hashlib to key sessions without holding session tokens in the keys
+import hashlib
+# Import logging module
+import logging
+# Import threading to guard the pool & hold each thread's resources
+import threading
+# Import epoch time method
+from time import time
+
+log = logging.getLogger(__name__)
+
+# Define session_pool class
+class session_pool:
+
+    #Class constructor
+    # Credentials without an expiration time are kept for default_ttl_seconds, the Cognito credentials lifetime
+    def __init__(self, max_pool_connections=32, max_sessions=256, default_ttl_seconds=3600):
+        self.configure(max_pool_connections, max_sessions)
+        self.default_ttl_seconds = default_ttl_seconds
+        # (access key ID, session token hash) -> pool entry dictionary
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Set the connection pool size of every new client & the maximum number of pooled sessions
+    def configure(self, max_pool_connections, max_sessions=256):
+        self.max_pool_connections = max_pool_connections
+        self.max_sessions = max_sessions
+        self.client_config = Config(max_pool_connections=max_pool_connections)
+
+    # Returns the epoch time the credentials expire at
+    def _get_expiration(self, **session_credentials):
+        expiration = session_credentials.get('Expiration')
+        if expiration is None:
+            return time() + self.default_ttl_seconds
+        if hasattr(expiration, 'timestamp'):
+            return expiration.timestamp()
+        return float(expiration)
+
+    # Returns the pool entry of the session credentials, creating it on first use
+    def _get_entry(self, **session_credentials):
+        session_token = session_credentials.get('SessionToken') or ''
+        entry_key = (session_credentials['AccessKeyId'], hashlib.sha256(session_token.encode()).hexdigest())
+        with self.lock:
+            self._evict_expired()
+            entry = self.entries.get(entry_key)
+            if entry is None:
+                entry = {
+                    'session': boto3.session.Session(
+                        aws_access_key_id=session_credentials['AccessKeyId'],
+                        aws_secret_access_key=session_credentials['SecretKey'],
+                        aws_session_token=session_credentials['SessionToken']),
+                    'expiration': self._get_expiration(**session_credentials),
+                    # (service, region) -> client shared by every thread
+                    'clients': dict(),
+                    # Boto3 resources are not thread safe so each thread keeps its own
+                    'resources': threading.local(),
+                    # Boto3 sessions are not thread safe so clients & resources are created under this lock
+                    'lock': threading.Lock()
+                }
+                tag_tamer_api_metrics.register(entry['session'].events)
+                self.entries[entry_key] = entry
+                while len(self.entries) > self.max_sessions:
+                    self.entries.popitem(last=False)
+            self.entries.move_to_end(entry_key)
+            return entry
+
+    # Remove the entries of expired credentials.  Called with the pool lock held
+    def _evict_expired(self):
+        now = time()
+        for entry_key in [entry_key for entry_key, entry in self.entries.items() if entry['expiration'] <= now]:
+            log.debug('Evicted expired Boto3 session for access key: %s', entry_key[0])
+            self.entries.pop(entry_key)
+
+    # Returns the pooled Boto3 session of the session credentials
+    def get_session(self, **session_credentials):
+        return self._get_entry(**session_credentials)['session']
+
+    # Returns the pooled, thread safe Boto3 client of the service & region for the session credentials
+    def get_client(self, service, region, **session_credentials):
+        entry = self._get_entry(**session_credentials)
+        client = entry['clients'].get((service, region))
+        if client is None:
+            with entry['lock']:
+                client = entry['clients'].get((service, region))
+                if client is None:
+                    client = entry['session'].client(service, region_name=region, config=self.client_config)
+                    entry['clients'][(service, region)] = client
+        return client
+
+    # Returns this thread's pooled Boto3 resource of the service & region for the session credentials
+    def get_resource(self, service, region, **session_credentials):
+        entry = self._get_entry(**session_credentials)
+        thread_resources = entry['resources'].__dict__
+        if (service, region) not in thread_resources:
+            with entry['lock']:
+                thread_resources[(service, region)] = entry['session'].resource(service, region_name=region,
+                    config=self.client_config)
+        return thread_resources[(service, region)]
+
+    # Remove the entries of expired credentials
+    def evict_expired(self):
+        with self.lock:
+            self._evict_expired()
+
+    # Remove every pooled session
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# Pool shared by every Tag Tamer module in this process
+tag_tamer_session_pool = session_pool()
@@ -3,34 +3,118 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
-# Purpose - functions to retrieve information regarding Amazon Cognito 
-# user pools & users
+# Purpose - functions to retrieve temporary session credentials for AWS IAM Roles
+# in Tag Tamer's member accounts.  Credentials are cached until shortly before they expire
+# Included functions
+# function - get_session_credentials
+# function - get_accounts_session_credentials
+# function - get_role_account_id
+# function - get_account_id
+# function - get_principal_arn
 
 # Import AWS module for python
 import botocore
 import boto3
+# Import the thread pool counting AWS API calls for the request using it, to assume many roles concurrently
+from api_metrics import context_thread_pool
+# Import hashlib to key cached credentials without holding session tokens in the keys
+import hashlib
 # Import logging module
 import logging
-# Import random number generator
-import random
+# Import Python's regex module to form valid role session names
+import re
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import threading to guard the credentials cache
+import threading
+# Import epoch time method
+from time import time
 
 log = logging.getLogger(__name__)
 
+# (role ARN, caller identity) -> assumed role session credentials
+assumed_role_credentials = dict()
+assumed_role_credentials_lock = threading.Lock()
+# Cached credentials are replaced this many seconds before they expire
+credentials_refresh_seconds = 300
+# Caller identity -> (AWS account ID, ARN) of the credentials' GetCallerIdentity response
+caller_identities = dict()
+
+# Returns the AWS account ID of an AWS IAM Role ARN
+def get_role_account_id(role_arn):
+    return role_arn.split(':')[4]
+
+# Returns the (AWS account ID, ARN) of the session credentials or None if they cannot be retrieved
+def _get_caller_identity(region, **session_credentials):
+    caller_identity = session_credentials.get('IdentityId') or session_credentials.get('AccessKeyId')
+    if caller_identity not in caller_identities:
+        try:
+            client = tag_tamer_session_pool.get_client('sts', region, **session_credentials)
+            response = client.get_caller_identity()
+            caller_identities[caller_identity] = (response['Account'], response['Arn'])
+        except botocore.exceptions.ClientError as error:
+            log.error("Boto3 API returned error: {}".format(error))
+            return None
+    return caller_identities[caller_identity]
+
+# Returns the AWS account ID of the session credentials or None if it cannot be retrieved
+def get_account_id(region, **session_credentials):
+    caller = _get_caller_identity(region, **session_credentials)
+    return caller[0] if caller is not None else None
+
+# Returns the ARN of the IAM role or user holding the session credentials or None if it cannot be retrieved.
+# Assumed role ARNs drop their session name so every session of a role shares one principal
+def get_principal_arn(region, **session_credentials):
+    caller = _get_caller_identity(region, **session_credentials)
+    if caller is None:
+        return None
+    return re.sub('^(arn:[^:]+:sts::[0-9]+:assumed-role/[^/]+)/.*$', r'\1', caller[1])
+
 # Function to return the temporary session credentials for given AWS IAM Role
-def get_session_credentials(role_arn, user_name, region):
-    session_credentials = dict()
-    role_session_name = user_name + "-session-" + str(random.randint(1,100))
+# The role is assumed with the caller's session credentials or, without them, the
+# credentials of the Tag Tamer instance
+def get_session_credentials(role_arn, user_name, region, **session_credentials):
+    if session_credentials.get('AccessKeyId'):
+        caller_identity = session_credentials.get('IdentityId') or session_credentials['AccessKeyId']
+    else:
+        caller_identity = ''
+    cache_key = (role_arn, hashlib.sha256(caller_identity.encode()).hexdigest())
+    with assumed_role_credentials_lock:
+        cached_credentials = assumed_role_credentials.get(cache_key)
+    if cached_credentials and cached_credentials['Expiration'].timestamp() - credentials_refresh_seconds > time():
+        return cached_credentials
+
+    role_credentials = dict()
+    # The same session name for every assumption lets AWS CloudTrail attribute the calls to the user
+    role_session_name = re.sub(r'[^\w+=,.@-]', '-', user_name + "-tag-tamer")[:64]
     try:
-        client = boto3.client('sts', region_name=region)
+        if session_credentials.get('AccessKeyId'):
+            client = tag_tamer_session_pool.get_client('sts', region, **session_credentials)
+        else:
+            client = boto3.client('sts', region_name=region)
         response = client.assume_role(
             RoleArn=role_arn,
             RoleSessionName=role_session_name
         )
-        session_credentials = response['Credentials']
+        role_credentials['AccessKeyId'] = response['Credentials']['AccessKeyId']
+        role_credentials['SecretKey'] = response['Credentials']['SecretAccessKey']
+        role_credentials['SessionToken'] = response['Credentials']['SessionToken']
+        # The role & caller stay the same across credential refreshes so they key per-user caches
+        role_credentials['IdentityId'] = caller_identity + '|' + role_arn
+        role_credentials['Expiration'] = response['Credentials']['Expiration']
+        with assumed_role_credentials_lock:
+            assumed_role_credentials[cache_key] = role_credentials
     except botocore.exceptions.ClientError as error:
         log.error("Boto3 API returned error: {}".format(error))
-        session_credentials['AccessKeyId'] = None
-        session_credentials['SecretKey'] = None
-        session_credentials['SessionToken'] = None
-    return session_credentials
+        role_credentials['AccessKeyId'] = None
+        role_credentials['SecretKey'] = None
+        role_credentials['SessionToken'] = None
+    return role_credentials
 
+# Function to return a dictionary of AWS IAM Role ARN -> temporary session credentials
+# assuming up to max_workers roles at a time
+def get_accounts_session_credentials(role_arns, user_name, region, max_workers=16, **session_credentials):
+    role_arns = list(dict.fromkeys(role_arns))
+    with context_thread_pool(max_workers=max_workers) as executor:
+        return dict(zip(role_arns, executor.map(
+            lambda role_arn: get_session_credentials(role_arn, user_name, region, **session_credentials), role_arns)))
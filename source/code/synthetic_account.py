@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Synthetic AWS accounts & the in-process AWS stand-in serving them to Tag Tamer's benchmarks.
+# An account holds the same number of EC2 instances, EBS volumes, S3 buckets & Lambda functions
+# tagged with a realistic, seeded tag distribution: a few common keys carried by most resources,
+# skewed values & a long tail of rarely used keys.  The stand-in answers every Boto3 call made by
+# Tag Tamer's getters & setters from the account before any HTTP request is sent, paginating like
+# the real APIs, & counts the calls by service & operation.
+# Included class & methods
+# class - synthetic_account
+#  method - get_tag_group_names
+# class - fake_aws
+#  method - install
+#  method - uninstall
+#  method - get_api_calls
+#  method - reset_api_calls
+
+# Import AWS module for python
+import boto3
+from botocore.awsrequest import AWSResponse
+# Import collections to keep resources in ID order & count API calls
+from collections import Counter, OrderedDict
+# Import itertools to build cumulative value weights
+import itertools
+# Import logging module
+import logging
+# Import random to draw seeded tag distributions
+import random
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import threading to guard the account during concurrent calls
+import threading
+
+log = logging.getLogger(__name__)
+
+# Common tag keys as (key, share of tagged resources carrying the key, values list or number of distinct values).
+# Values are drawn with Zipf-like weights so a few values are carried by most resources.  Name is unique per resource
+common_tag_keys = [
+    ('Name', 0.9, None),
+    ('Environment', 0.8, ['prod', 'staging', 'dev', 'test', 'qa']),
+    ('Owner', 0.6, 60),
+    ('Application', 0.55, 400),
+    ('CostCenter', 0.5, 200),
+    ('Team', 0.4, 40),
+    ('Project', 0.35, 150),
+    ('aws:cloudformation:stack-name', 0.3, 500),
+    ('Backup', 0.25, ['daily', 'weekly', 'none']),
+    ('DataClassification', 0.2, ['internal', 'confidential', 'public', 'restricted']),
+    ('Compliance', 0.1, ['pci', 'sox', 'hipaa'])
+]
+# Share of resources without any tags
+untagged_share = 0.15
+# Number of rarely used tag keys & the most of them one resource carries
+long_tail_keys = 2000
+long_tail_max_keys = 3
+# Regions holding the buckets that are not in the account's home region
+other_bucket_regions = ['us-west-2', 'eu-west-1', 'ap-southeast-2']
+
+# Returns a function drawing one of the values with Zipf-like weights
+def _get_value_picker(values, rng):
+    cumulative_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(values) + 1)))
+    return lambda: rng.choices(values, cum_weights=cumulative_weights)[0]
+
+# Define synthetic_account class holding the resources, tags, Tag Groups & Service Catalog items of one account
+class synthetic_account:
+
+    #Class constructor
+    # size is the number of resources of each type.  The same seed builds the same account
+    def __init__(self, size, seed=0, region='us-east-1', account_id='123456789012'):
+        self.size = size
+        self.region = region
+        self.account_id = account_id
+        rng = random.Random(seed)
+        value_pickers = dict()
+        for tag_key, _, values in common_tag_keys:
+            if isinstance(values, int):
+                values = ['{}-{:04d}'.format(tag_key.split(':')[-1].lower(), number) for number in range(values)]
+            if values is not None:
+                value_pickers[tag_key] = _get_value_picker(values, rng)
+        long_tail_picker = _get_value_picker(['custom-key-{:04d}'.format(number) for number in range(long_tail_keys)], rng)
+
+        # Returns a tags dictionary or None for an untagged resource
+        def _get_tags(resource_name):
+            if rng.random() < untagged_share:
+                return None
+            tags = dict()
+            for tag_key, share, _ in common_tag_keys:
+                if rng.random() < share:
+                    tags[tag_key] = value_pickers[tag_key]() if tag_key in value_pickers else resource_name
+            for _ in range(rng.randint(0, long_tail_max_keys)):
+                tags[long_tail_picker()] = 'value-{:02d}'.format(rng.randint(0, 49))
+            return tags or None
+
+        # resource ID -> tags dictionary or None, in resource ID order like the EC2 APIs
+        self.instances = OrderedDict(sorted(('i-{:017x}'.format(rng.getrandbits(68)), _get_tags('instance-' + str(number)))
+            for number in range(size)))
+        self.volumes = OrderedDict(sorted(('vol-{:017x}'.format(rng.getrandbits(68)), _get_tags('volume-' + str(number)))
+            for number in range(size)))
+        # bucket name -> tags dictionary or None & bucket name -> region
+        self.buckets = OrderedDict()
+        self.bucket_regions = dict()
+        for number in range(size):
+            bucket_name = 'tag-tamer-benchmark-{:06d}'.format(number)
+            self.buckets[bucket_name] = _get_tags(bucket_name)
+            self.bucket_regions[bucket_name] = region if rng.random() < 0.8 else rng.choice(other_bucket_regions)
+        # function ARN -> tags dictionary or None
+        self.functions = OrderedDict()
+        for number in range(size):
+            function_name = 'benchmark-function-{:06d}'.format(number)
+            self.functions['arn:aws:lambda:{}:{}:function:{}'.format(region, account_id, function_name)] = _get_tags(function_name)
+
+        # Tag Group name -> (tag key, list of values) for every common key with a fixed values list
+        self.tag_groups = OrderedDict()
+        for tag_key, _, values in common_tag_keys:
+            if isinstance(values, list):
+                self.tag_groups[tag_key.lower() + '-group'] = (tag_key, list(values))
+        # Service Catalog TagOption ID -> (key, value), one per Tag Group value, & product ID -> product
+        # dictionary with its name, owner & associated TagOption IDs.  AWS owned products are not listed by Tag Tamer
+        self.tag_options = OrderedDict()
+        for tag_key, values in self.tag_groups.values():
+            for value in values:
+                self.tag_options['tag-{:013x}'.format(rng.getrandbits(52))] = (tag_key, value)
+        self.products = OrderedDict()
+        for number in range(max(size // 100, 1)):
+            self.products['prod-{:013x}'.format(rng.getrandbits(52))] = {
+                'Name': 'Benchmark product {:04d}'.format(number),
+                'Owner': 'AWS Marketplace' if rng.random() < 0.1 else 'Platform Team',
+                'TagOptionIds': rng.sample(list(self.tag_options), 3)
+            }
+
+    # Returns the names of the account's Tag Groups
+    def get_tag_group_names(self):
+        return list(self.tag_groups)
+
+# Returns the stand-in's (HTTP response, parsed response) tuple ending a Boto3 call
+def _get_response(parsed_response, status_code=200):
+    parsed_response.setdefault('ResponseMetadata', {'HTTPStatusCode': status_code, 'HTTPHeaders': dict()})
+    return AWSResponse(None, status_code, dict(), None), parsed_response
+
+# Returns the stand-in's response to a failed Boto3 call, raised by Boto3 as a ClientError
+def _get_error(code, status_code=400):
+    return _get_response({'Error': {'Code': code, 'Message': code}}, status_code)
+
+# Returns the list of {'Key': ..., 'Value': ...} dictionaries of a tags dictionary
+def _get_tag_list(tags):
+    return [{'Key': tag_key, 'Value': tag_value} for tag_key, tag_value in (tags or dict()).items()]
+
+# Returns one page of items starting at the offset held by the request's pagination token
+def _get_page(items, params, items_key, page_size, token_key='NextToken', request_token_key=None):
+    start = int(params.get(request_token_key or token_key) or 0)
+    page = {items_key: items[start:start + page_size]}
+    if start + page_size < len(items):
+        page[token_key] = str(start + page_size)
+    return page
+
+# Returns the Python value of a DynamoDB attribute value, accepting values already deserialized
+def _get_attribute_value(value):
+    if isinstance(value, dict) and len(value) == 1 and 'S' in value:
+        return value['S']
+    return value
+
+# Define fake_aws class answering Tag Tamer's Boto3 calls from a synthetic account
+class fake_aws:
+
+    #Class constructor
+    def __init__(self, account):
+        self.account = account
+        self.installed = False
+        # (service, operation name) -> number of calls
+        self.api_calls = Counter()
+        # (operation name, filters) -> resources listed by filtered calls, reused across the pages of one listing
+        self.listings = dict()
+        self.lock = threading.Lock()
+        self.handlers = {
+            ('ec2', 'DescribeInstances'): self._describe_instances,
+            ('ec2', 'DescribeVolumes'): self._describe_volumes,
+            ('ec2', 'DescribeTags'): self._describe_tags,
+            ('ec2', 'CreateTags'): self._create_tags,
+            ('s3', 'ListBuckets'): self._list_buckets,
+            ('s3', 'GetBucketLocation'): self._get_bucket_location,
+            ('s3', 'GetBucketTagging'): self._get_bucket_tagging,
+            ('s3', 'PutBucketTagging'): self._put_bucket_tagging,
+            ('lambda', 'ListFunctions'): self._list_functions,
+            ('lambda', 'ListTags'): self._list_tags,
+            ('lambda', 'TagResource'): self._tag_resource,
+            ('resourcegroupstaggingapi', 'GetResources'): self._get_resources,
+            ('resourcegroupstaggingapi', 'TagResources'): self._tag_resources,
+            ('sts', 'GetCallerIdentity'): self._get_caller_identity,
+            ('dynamodb', 'Scan'): self._scan,
+            ('dynamodb', 'GetItem'): self._get_item,
+            ('servicecatalog', 'CreateTagOption'): self._create_tag_option,
+            ('servicecatalog', 'ListTagOptions'): self._list_tag_options,
+            ('servicecatalog', 'DeleteTagOption'): self._delete_tag_option,
+            ('servicecatalog', 'SearchProductsAsAdmin'): self._search_products_as_admin,
+            ('servicecatalog', 'DescribeProductAsAdmin'): self._describe_product_as_admin,
+            ('servicecatalog', 'AssociateTagOptionWithResource'): self._associate_tag_option,
+            ('servicecatalog', 'DisassociateTagOptionFromResource'): self._disassociate_tag_option
+        }
+
+    # Answer the calls of every Boto3 session created from now on, including the pooled sessions
+    def install(self):
+        if self.installed:
+            return
+        self.original_session_init = boto3.session.Session.__init__
+        stand_in = self
+        def _session_init(session, *args, **kwargs):
+            stand_in.original_session_init(session, *args, **kwargs)
+            session.events.register('before-parameter-build.*.*', stand_in._capture_params)
+            session.events.register('before-call.*.*', stand_in._handle_call)
+        boto3.session.Session.__init__ = _session_init
+        boto3.DEFAULT_SESSION = None
+        tag_tamer_session_pool.clear()
+        self.installed = True
+
+    # Stop answering calls.  Sessions created while installed are dropped from the session pool
+    def uninstall(self):
+        if not self.installed:
+            return
+        boto3.session.Session.__init__ = self.original_session_init
+        boto3.DEFAULT_SESSION = None
+        tag_tamer_session_pool.clear()
+        self.installed = False
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exception_info):
+        self.uninstall()
+
+    # Returns a dictionary of "service:Operation" -> number of calls answered since the last reset
+    def get_api_calls(self):
+        with self.lock:
+            return OrderedDict(('{}:{}'.format(service, operation), count)
+                for (service, operation), count in sorted(self.api_calls.items()))
+
+    # Forget the counted calls
+    def reset_api_calls(self):
+        with self.lock:
+            self.api_calls.clear()
+
+    # Keep the call's parameters as passed to Boto3 before they are serialized into the request
+    def _capture_params(self, params, context, **kwargs):
+        context['synthetic_account_params'] = params
+
+    # Returns the (HTTP response, parsed response) tuple answering the call so Boto3 sends no request
+    def _handle_call(self, model, params, context, **kwargs):
+        call_key = (model.service_model.service_name, model.name)
+        with self.lock:
+            self.api_calls[call_key] += 1
+        handler = self.handlers.get(call_key)
+        if handler is None:
+            log.warning('The AWS stand-in does not answer {}:{}'.format(*call_key))
+            return _get_error('UnsupportedOperation')
+        return handler(context.get('synthetic_account_params', dict()))
+
+    # Returns the resources of the account listed by a filtered call, computing the listing once for all of its pages
+    def _get_listing(self, operation, filters, list_resources):
+        listing_key = (operation, repr(filters))
+        listing = self.listings.get(listing_key)
+        if listing is None:
+            listing = list_resources()
+            self.listings[listing_key] = listing
+        return listing
+
+    # Apply a tag write to the account's resources & drop the listings it changed
+    def _write_tags(self, resources, resource_id, tags):
+        with self.lock:
+            resources[resource_id] = dict(resources.get(resource_id) or dict(), **tags)
+            self.listings.clear()
+
+    # Returns True if a tags dictionary or None matches every EC2 tag-key & tag:<key> filter
+    def _matches_ec2_filters(self, tags, filters):
+        tags = tags or dict()
+        for ec2_filter in filters or list():
+            if ec2_filter['Name'] == 'tag-key' and not any(value in tags for value in ec2_filter['Values']):
+                return False
+            if ec2_filter['Name'].startswith('tag:') and tags.get(ec2_filter['Name'][4:]) not in ec2_filter['Values']:
+                return False
+        return True
+
+    def _describe_instances(self, params):
+        instance_ids = set(params.get('InstanceIds') or list())
+        instances = self._get_listing('DescribeInstances', (sorted(instance_ids), params.get('Filters')), lambda: [
+            dict({'InstanceId': instance_id, 'State': {'Name': 'running'}}, **({'Tags': _get_tag_list(tags)} if tags else dict()))
+            for instance_id, tags in self.account.instances.items()
+            if (not instance_ids or instance_id in instance_ids) and self._matches_ec2_filters(tags, params.get('Filters'))])
+        page = _get_page(instances, params, 'Instances', params.get('MaxResults') or 1000)
+        # One instance per reservation
+        page['Reservations'] = [{'Instances': [instance]} for instance in page.pop('Instances')]
+        return _get_response(page)
+
+    def _describe_volumes(self, params):
+        volume_ids = set(params.get('VolumeIds') or list())
+        volumes = self._get_listing('DescribeVolumes', (sorted(volume_ids), params.get('Filters')), lambda: [
+            dict({'VolumeId': volume_id, 'State': 'in-use'}, **({'Tags': _get_tag_list(tags)} if tags else dict()))
+            for volume_id, tags in self.account.volumes.items()
+            if (not volume_ids or volume_id in volume_ids) and self._matches_ec2_filters(tags, params.get('Filters'))])
+        return _get_response(_get_page(volumes, params, 'Volumes', params.get('MaxResults') or 1000))
+
+    # Lists the tags of the resource-id filter's resources directly & the tags of every resource of the
+    # resource-type filter's types through a listing
+    def _describe_tags(self, params):
+        filters = {ec2_filter['Name']: ec2_filter['Values'] for ec2_filter in params.get('Filters') or list()}
+        resource_types = filters.get('resource-type', ['instance', 'volume'])
+        if 'resource-id' in filters:
+            resource_ids = filters['resource-id']
+        else:
+            resource_ids = None
+        def _list_tags():
+            resource_units = [(self.account.instances, 'instance'), (self.account.volumes, 'volume')]
+            tags_list = list()
+            for resources, resource_type in resource_units:
+                if resource_type not in resource_types:
+                    continue
+                unit_resource_ids = resources if resource_ids is None else sorted(resource_id for resource_id in resource_ids if resource_id in resources)
+                for resource_id in unit_resource_ids:
+                    for tag_key, tag_value in (resources[resource_id] or dict()).items():
+                        if 'key' not in filters or tag_key in filters['key']:
+                            tags_list.append({'ResourceId': resource_id, 'ResourceType': resource_type, 'Key': tag_key, 'Value': tag_value})
+            return tags_list
+        tags_list = self._get_listing('DescribeTags', filters, _list_tags) if resource_ids is None else _list_tags()
+        return _get_response(_get_page(tags_list, params, 'Tags', params.get('MaxResults') or 1000))
+
+    # Tags every resource or none of them when one resource does not exist, like CreateTags
+    def _create_tags(self, params):
+        resource_units = list()
+        for resource_id in params['Resources']:
+            resources = self.account.instances if resource_id.startswith('i-') else self.account.volumes
+            if resource_id not in resources:
+                return _get_error('InvalidInstanceID.NotFound' if resource_id.startswith('i-') else 'InvalidVolume.NotFound')
+            resource_units.append((resources, resource_id))
+        tags = {tag['Key']: tag['Value'] for tag in params['Tags']}
+        for resources, resource_id in resource_units:
+            self._write_tags(resources, resource_id, tags)
+        return _get_response(dict())
+
+    def _list_buckets(self, params):
+        return _get_response({'Buckets': [{'Name': bucket_name} for bucket_name in self.account.buckets],
+            'Owner': {'ID': self.account.account_id}})
+
+    def _get_bucket_location(self, params):
+        if params['Bucket'] not in self.account.buckets:
+            return _get_error('NoSuchBucket', 404)
+        bucket_region = self.account.bucket_regions[params['Bucket']]
+        return _get_response({'LocationConstraint': None if bucket_region == 'us-east-1' else bucket_region})
+
+    def _get_bucket_tagging(self, params):
+        if params['Bucket'] not in self.account.buckets:
+            return _get_error('NoSuchBucket', 404)
+        tags = self.account.buckets[params['Bucket']]
+        if not tags:
+            return _get_error('NoSuchTagSet', 404)
+        return _get_response({'TagSet': _get_tag_list(tags)})
+
+    # Replaces the bucket's whole tag set like PutBucketTagging
+    def _put_bucket_tagging(self, params):
+        if params['Bucket'] not in self.account.buckets:
+            return _get_error('NoSuchBucket', 404)
+        with self.lock:
+            self.account.buckets[params['Bucket']] = {tag['Key']: tag['Value'] for tag in params['Tagging']['TagSet']}
+            self.listings.clear()
+        return _get_response(dict())
+
+    def _list_functions(self, params):
+        functions = self._get_listing('ListFunctions', None, lambda: [{'FunctionName': function_arn.split(':')[-1], 'FunctionArn': function_arn}
+            for function_arn in self.account.functions])
+        return _get_response(_get_page(functions, params, 'Functions', min(params.get('MaxItems') or 50, 50), 'NextMarker', 'Marker'))
+
+    def _list_tags(self, params):
+        if params['Resource'] not in self.account.functions:
+            return _get_error('ResourceNotFoundException', 404)
+        return _get_response({'Tags': dict(self.account.functions[params['Resource']] or dict())})
+
+    def _tag_resource(self, params):
+        if params['Resource'] not in self.account.functions:
+            return _get_error('ResourceNotFoundException', 404)
+        self._write_tags(self.account.functions, params['Resource'], params['Tags'])
+        return _get_response(dict())
+
+    # Returns the (resources dictionary, resource ID) of a resource ARN or (None, None) for another resource
+    def _get_arn_resource(self, resource_arn):
+        if resource_arn.startswith('arn:aws:s3:::'):
+            return self.account.buckets, resource_arn.split(':::')[-1]
+        if ':function:' in resource_arn:
+            return self.account.functions, resource_arn
+        if ':instance/' in resource_arn:
+            return self.account.instances, resource_arn.split('/')[-1]
+        if ':volume/' in resource_arn:
+            return self.account.volumes, resource_arn.split('/')[-1]
+        return None, None
+
+    # Returns the ARN of a resource of the account
+    def _get_resource_arn(self, resources, resource_id):
+        if resources is self.account.buckets:
+            return 'arn:aws:s3:::' + resource_id
+        if resources is self.account.functions:
+            return resource_id
+        resource_type = 'instance' if resources is self.account.instances else 'volume'
+        return 'arn:aws:ec2:{}:{}:{}/{}'.format(self.account.region, self.account.account_id, resource_type, resource_id)
+
+    # Lists the tagged resources of the resource types matching every TagFilter.  Like the Tagging API,
+    # resources that were never tagged are not listed
+    def _get_resources(self, params):
+        if params.get('ResourceARNList'):
+            resource_mappings = list()
+            for resource_arn in params['ResourceARNList']:
+                resources, resource_id = self._get_arn_resource(resource_arn)
+                if resources is not None and resources.get(resource_id):
+                    resource_mappings.append({'ResourceARN': resource_arn, 'Tags': _get_tag_list(resources[resource_id])})
+        else:
+            type_resources = {'ec2:instance': self.account.instances, 'ec2:volume': self.account.volumes,
+                's3': self.account.buckets, 'lambda:function': self.account.functions, 'lambda': self.account.functions}
+            tag_filters = params.get('TagFilters') or list()
+            def _list_resources():
+                resource_mappings = list()
+                for resource_type in params.get('ResourceTypeFilters') or list(type_resources):
+                    resources = type_resources.get(resource_type, dict())
+                    for resource_id, tags in resources.items():
+                        if tags and all(tag_filter['Key'] in tags and (not tag_filter.get('Values') or tags[tag_filter['Key']] in tag_filter['Values'])
+                            for tag_filter in tag_filters):
+                            resource_mappings.append({'ResourceARN': self._get_resource_arn(resources, resource_id), 'Tags': _get_tag_list(tags)})
+                return resource_mappings
+            resource_mappings = self._get_listing('GetResources', (params.get('ResourceTypeFilters'), tag_filters), _list_resources)
+        return _get_response(_get_page(resource_mappings, params, 'ResourceTagMappingList', params.get('ResourcesPerPage') or 100, 'PaginationToken'))
+
+    # Adds the tags to every resource, reporting the unknown resources in FailedResourcesMap like TagResources
+    def _tag_resources(self, params):
+        failed_resources = dict()
+        for resource_arn in params['ResourceARNList']:
+            resources, resource_id = self._get_arn_resource(resource_arn)
+            if resources is None or resource_id not in resources:
+                failed_resources[resource_arn] = {'StatusCode': 400, 'ErrorCode': 'InvalidParameterException', 'ErrorMessage': 'Unknown resource'}
+            else:
+                self._write_tags(resources, resource_id, params['Tags'])
+        return _get_response({'FailedResourcesMap': failed_resources})
+
+    def _get_caller_identity(self, params):
+        return _get_response({'Account': self.account.account_id, 'UserId': 'AIDASYNTHETIC',
+            'Arn': 'arn:aws:iam::{}:user/benchmark'.format(self.account.account_id)})
+
+    # Returns the DynamoDB item of a Tag Group in DynamoDB's attribute value format
+    def _get_tag_group_item(self, tag_group_name):
+        tag_key, values = self.account.tag_groups[tag_group_name]
+        return {'tag_group_name': {'S': tag_group_name}, 'key_name': {'S': tag_key},
+            'key_values': {'L': [{'S': value} for value in values]}}
+
+    def _scan(self, params):
+        items = [self._get_tag_group_item(tag_group_name) for tag_group_name in self.account.tag_groups]
+        return _get_response({'Items': items, 'Count': len(items), 'ScannedCount': len(items)})
+
+    def _get_item(self, params):
+        tag_group_name = _get_attribute_value(params['Key']['tag_group_name'])
+        if tag_group_name not in self.account.tag_groups:
+            return _get_response(dict())
+        return _get_response({'Item': self._get_tag_group_item(tag_group_name)})
+
+    # Returns the TagOptionDetail dictionary of a Service Catalog TagOption
+    def _get_tag_option_detail(self, tag_option_id):
+        tag_key, value = self.account.tag_options[tag_option_id]
+        return {'Key': tag_key, 'Value': value, 'Active': True, 'Id': tag_option_id, 'Owner': self.account.account_id}
+
+    def _create_tag_option(self, params):
+        with self.lock:
+            if (params['Key'], params['Value']) in self.account.tag_options.values():
+                return _get_error('DuplicateResourceException')
+            tag_option_id = 'tag-{:013x}'.format(len(self.account.tag_options) + 1)
+            self.account.tag_options[tag_option_id] = (params['Key'], params['Value'])
+        return _get_response({'TagOptionDetail': self._get_tag_option_detail(tag_option_id)})
+
+    def _list_tag_options(self, params):
+        tag_key = (params.get('Filters') or dict()).get('Key')
+        return _get_response({'TagOptionDetails': [self._get_tag_option_detail(tag_option_id)
+            for tag_option_id, (option_key, _) in self.account.tag_options.items() if tag_key is None or option_key == tag_key]})
+
+    # Deletes an unassociated TagOption, like DeleteTagOption
+    def _delete_tag_option(self, params):
+        with self.lock:
+            if params['Id'] not in self.account.tag_options:
+                return _get_error('ResourceNotFoundException')
+            if any(params['Id'] in product['TagOptionIds'] for product in self.account.products.values()):
+                return _get_error('ResourceInUseException')
+            self.account.tag_options.pop(params['Id'])
+        return _get_response(dict())
+
+    def _search_products_as_admin(self, params):
+        products = sorted(self.account.products.items(), key=lambda item: item[1]['Name'], reverse=params.get('SortOrder') == 'DESCENDING')
+        return _get_response({'ProductViewDetails': [{'ProductViewSummary': {'ProductId': product_id, 'Name': product['Name'],
+            'Owner': product['Owner']}} for product_id, product in products]})
+
+    def _describe_product_as_admin(self, params):
+        product = self.account.products.get(params['Id'])
+        if product is None:
+            return _get_error('ResourceNotFoundException')
+        return _get_response({'ProductViewDetail': {'ProductViewSummary': {'ProductId': params['Id'], 'Name': product['Name'], 'Owner': product['Owner']}},
+            'TagOptions': [self._get_tag_option_detail(tag_option_id) for tag_option_id in product['TagOptionIds']]})
+
+    def _associate_tag_option(self, params):
+        with self.lock:
+            product = self.account.products.get(params['ResourceId'])
+            if product is None or params['TagOptionId'] not in self.account.tag_options:
+                return _get_error('ResourceNotFoundException')
+            if params['TagOptionId'] not in product['TagOptionIds']:
+                product['TagOptionIds'].append(params['TagOptionId'])
+        return _get_response(dict())
+
+    def _disassociate_tag_option(self, params):
+        with self.lock:
+            product = self.account.products.get(params['ResourceId'])
+            if product is None or params['TagOptionId'] not in product['TagOptionIds']:
+                return _get_error('ResourceNotFoundException')
+            product['TagOptionIds'].remove(params['TagOptionId'])
+        return _get_response(dict())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Tag Tamer's benchmark suite.  Runs every resources_tags, lambda_resources_tags, get_tag_groups &
+# service_catalog method against synthetic accounts served by an in-process AWS stand-in & reports
+# each method's wall time, peak memory & AWS API calls by operation, for example:
+#   python3 tag-tamer-benchmark.py [--sizes 1000 10000 100000] [--methods get_resources_tags ...] [--output results.json]
+# Every method starts with an empty inventory cache & a disabled inventory store, like the first
+# request after a restart.  Wall times include the stand-in answering the calls.  Peak memory is
+# measured by a second run of every method with tracemalloc, which slows Python down
+
+# Import argument parser
+import argparse
+# Import the bucket region cache
+import bucket_tags
+# Import getter for TagOption Groups
+from get_tag_groups import get_tag_groups
+# Import the inventory cache shared across requests
+from inventory_cache import tag_tamer_inventory_cache
+# Import the inventory store
+from inventory_store import tag_tamer_inventory_store
+# Import JSON to read Tag Tamer's parameters & write the results
+import json
+# Import AWS Lambda resources & tags getters & setters
+from lambda_resources_tags import lambda_resources_tags
+# Import logging module
+import logging
+# Import os to build the path of the temporary inventory store
+import os
+# Import getter/setter module for AWS resources & tags
+from resources_tags import resources_tags
+# Import getter & setter for AWS Service Catalog items
+from service_catalog import service_catalog
+# Import the cached account ID lookup
+import sts
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import the synthetic accounts & the AWS stand-in serving them
+from synthetic_account import synthetic_account, fake_aws
+# Import the single-pass tag index
+from tag_index import tag_index
+# Import the engine sending per-resource AWS API calls
+from api_calls import tag_tamer_api_calls
+# Import tempfile to hold the inventory store refreshed by refresh_stored_inventory
+import tempfile
+# Import time methods
+from time import perf_counter
+# Import tracemalloc to measure peak memory
+import tracemalloc
+
+log = logging.getLogger('tag_tamer_benchmark')
+
+# The stand-in's credentials
+session_credentials = {
+    'AccessKeyId': 'AKIASYNTHETIC',
+    'SecretKey': 'synthetic-secret-key',
+    'SessionToken': 'synthetic-session-token'
+}
+# Tags applied by the setters & the search run by the filtered getters
+chosen_tags = [{'Key': 'Environment', 'Value': 'prod'}, {'Key': 'CostCenter', 'Value': 'costcenter-0001'}]
+filter_tags = {'tag_key1': 'Environment', 'tag_value1': 'prod', 'tag_key2': 'Owner', 'conjunction': 'AND'}
+
+# Returns the list of (method name, function) benchmark cases of a synthetic account.  Each function
+# calls one method with the arguments the Tag Tamer routes pass it.  Getters run before the setters
+def get_benchmark_cases(account):
+    region = account.region
+    cases = list()
+    # Resources passed to the by-ID getters & setters: every tenth resource.  The lambda_resources_tags
+    # methods use other functions than the resources_tags methods so their setter still has tags to write
+    sampled_resources = {
+        'instances': list(account.instances)[::10],
+        'volumes': list(account.volumes)[::10],
+        'buckets': list(account.buckets)[::10],
+        'functions': list(account.functions)[::10]
+    }
+    sampled_function_arns = list(account.functions)[5::10]
+
+    for resource_type, unit in [('ec2', 'instances'), ('ebs', 'volumes'), ('s3', 'buckets'), ('lambda', 'functions')]:
+        def _get_inventory(resource_type=resource_type, unit=unit):
+            return resources_tags(resource_type, unit, region)
+
+        def _refresh_stored_inventory(_get_inventory=_get_inventory):
+            with tempfile.TemporaryDirectory() as store_directory:
+                tag_tamer_inventory_store.configure(os.path.join(store_directory, 'inventory_store.db'))
+                try:
+                    return _get_inventory().refresh_stored_inventory(**session_credentials)
+                finally:
+                    tag_tamer_inventory_store.configure(None)
+
+        def _stream_resources_tags(_get_inventory=_get_inventory):
+            rows, execution_status = _get_inventory().stream_resources_tags(**session_credentials)
+            return sum(1 for _ in rows), execution_status
+
+        def _stream_resources(_get_inventory=_get_inventory):
+            rows, execution_status = _get_inventory().stream_resources(filter_tags, **session_credentials)
+            return sum(1 for _ in rows), execution_status
+
+        unit_cases = [
+            ('get_resources', lambda _get_inventory=_get_inventory: _get_inventory().get_resources(dict(), **session_credentials)),
+            ('get_resources filtered', lambda _get_inventory=_get_inventory: _get_inventory().get_resources(filter_tags, **session_credentials)),
+            ('get_resources_tags', lambda _get_inventory=_get_inventory: _get_inventory().get_resources_tags(**session_credentials)),
+            ('get_resources_tags_by_id', lambda _get_inventory=_get_inventory, unit=unit:
+                _get_inventory().get_resources_tags_by_id(sampled_resources[unit], **session_credentials)),
+            ('get_tag_keys', lambda _get_inventory=_get_inventory: _get_inventory().get_tag_keys(**session_credentials)),
+            ('get_tag_values', lambda _get_inventory=_get_inventory: _get_inventory().get_tag_values(**session_credentials)),
+            ('stream_resources_tags', _stream_resources_tags),
+            ('stream_resources filtered', _stream_resources),
+            ('refresh_stored_inventory', _refresh_stored_inventory),
+            ('set_resources_tags', lambda _get_inventory=_get_inventory, unit=unit:
+                _get_inventory().set_resources_tags(sampled_resources[unit], chosen_tags, **session_credentials))
+        ]
+        cases.extend(('resources_tags.{} ({})'.format(method_name, unit), function) for method_name, function in unit_cases)
+
+    def _get_functions_inventory():
+        return lambda_resources_tags('lambda', region, inventory_engine=resources_tags.inventory_engines.get('functions', 'describe'),
+            tag_write_engine=resources_tags.tag_write_engines.get('functions', 'native'))
+
+    def _walk_lambda_tag_index():
+        inventory_index = tag_index()
+        return sum(1 for _ in _get_functions_inventory().walk_lambda_tag_index(inventory_index, **session_credentials)), \
+            inventory_index.my_status.get_status()
+
+    def _get_lambda_tag_index():
+        inventory_index = _get_functions_inventory().get_lambda_tag_index(**session_credentials)
+        return inventory_index, inventory_index.my_status.get_status()
+
+    lambda_cases = [
+        ('get_lambda_names_ids', lambda: _get_functions_inventory().get_lambda_names_ids(filter_tags, **session_credentials)),
+        ('get_lambda_resources_tags', lambda: _get_functions_inventory().get_lambda_resources_tags(**session_credentials)),
+        ('get_lambda_functions_tags', lambda: (_get_functions_inventory().get_lambda_functions_tags(sampled_function_arns,
+            **session_credentials), None)),
+        ('get_lambda_tag_index', _get_lambda_tag_index),
+        ('walk_lambda_tag_index', _walk_lambda_tag_index),
+        ('get_lambda_tag_keys', lambda: _get_functions_inventory().get_lambda_tag_keys(**session_credentials)),
+        ('get_lambda_tag_values', lambda: _get_functions_inventory().get_lambda_tag_values(**session_credentials)),
+        ('set_lambda_resources_tags', lambda: _get_functions_inventory().set_lambda_resources_tags(sampled_function_arns,
+            chosen_tags, **session_credentials))
+    ]
+    cases.extend(('lambda_resources_tags.' + method_name, function) for method_name, function in lambda_cases)
+
+    tag_group_name = account.get_tag_group_names()[0]
+    tag_group_cases = [
+        ('get_tag_group_names', lambda: get_tag_groups(region, **session_credentials).get_tag_group_names()),
+        ('get_tag_group_key_values', lambda: get_tag_groups(region, **session_credentials).get_tag_group_key_values(tag_group_name)),
+        ('get_all_tag_groups_key_values', lambda: get_tag_groups(region, **session_credentials).get_all_tag_groups_key_values(region,
+            **session_credentials))
+    ]
+    cases.extend(('get_tag_groups.' + method_name, function) for method_name, function in tag_group_cases)
+
+    product_id = list(account.products)[0]
+    service_catalog_cases = [
+        ('get_sc_tag_options', lambda: service_catalog(region, **session_credentials).get_sc_tag_options()),
+        ('get_sc_product_templates', lambda: service_catalog(region, **session_credentials).get_sc_product_templates()),
+        ('create_sc_tag_option', lambda: service_catalog(region, **session_credentials).create_sc_tag_option('Benchmark', 'created')),
+        ('update_sc_tag_option', lambda: service_catalog(region, **session_credentials).update_sc_tag_option('Benchmark', 'updated')),
+        ('assign_tg_sc_product_template', lambda: service_catalog(region, **session_credentials).assign_tg_sc_product_template(
+            tag_group_name, product_id, **session_credentials))
+    ]
+    cases.extend(('service_catalog.' + method_name, function) for method_name, function in service_catalog_cases)
+    return cases
+
+# Forget everything cached by earlier methods so each method starts cold
+def reset_caches():
+    tag_tamer_inventory_cache.clear()
+    with bucket_tags.bucket_regions_lock:
+        bucket_tags.bucket_regions.clear()
+    sts.caller_identities.clear()
+
+# Create the pooled clients & resources of every benchmarked service so no method pays for loading their models
+def warm_up_clients(region):
+    for service in ['ec2', 's3', 'lambda', 'resourcegroupstaggingapi', 'sts', 'dynamodb', 'servicecatalog']:
+        tag_tamer_session_pool.get_client(service, region, **session_credentials)
+    for service in ['ec2', 's3', 'dynamodb']:
+        tag_tamer_session_pool.get_resource(service, region, **session_credentials)
+
+# Returns the alert level of a method's execution status or the name of the exception it raised
+def get_outcome(function):
+    try:
+        result = function()
+    except Exception as error:
+        log.debug('The benchmarked method raised: %s', error)
+        return type(error).__name__
+    execution_status = result[-1] if isinstance(result, tuple) else result
+    if isinstance(execution_status, dict) and 'alert_level' in execution_status:
+        return execution_status['alert_level']
+    return 'success'
+
+# Returns a list of result dictionaries of every selected method run against a synthetic account of the size
+def run_benchmarks(size, seed, method_names, measure_memory):
+    results = list()
+    account = synthetic_account(size, seed)
+    with fake_aws(account) as stand_in:
+        warm_up_clients(account.region)
+        for method_name, function in get_benchmark_cases(account):
+            if method_names and not any(selected_name in method_name for selected_name in method_names):
+                continue
+            reset_caches()
+            stand_in.reset_api_calls()
+            start_time = perf_counter()
+            outcome = get_outcome(function)
+            wall_seconds = perf_counter() - start_time
+            api_calls = stand_in.get_api_calls()
+            results.append({
+                'size': size,
+                'method': method_name,
+                'outcome': outcome,
+                'wall_seconds': round(wall_seconds, 4),
+                'peak_memory_mib': None,
+                'api_calls': sum(api_calls.values()),
+                'api_calls_by_operation': api_calls
+            })
+            log.info('%s %s: %.3fs, %s API calls', size, method_name, wall_seconds, sum(api_calls.values()))
+
+    # The setters changed the account so the memory run starts from a new copy of it
+    if measure_memory:
+        account = synthetic_account(size, seed)
+        results_by_method = {result['method']: result for result in results}
+        with fake_aws(account):
+            warm_up_clients(account.region)
+            for method_name, function in get_benchmark_cases(account):
+                if method_name not in results_by_method:
+                    continue
+                reset_caches()
+                tracemalloc.start()
+                baseline_memory, _ = tracemalloc.get_traced_memory()
+                get_outcome(function)
+                _, peak_memory = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results_by_method[method_name]['peak_memory_mib'] = round((peak_memory - baseline_memory) / 1048576, 2)
+    return results
+
+# Print the results as a table
+def print_results(results):
+    print('{:>7}  {:<58} {:<24} {:>9} {:>9} {:>9}  {}'.format('size', 'method', 'outcome', 'seconds', 'peak MiB', 'API calls',
+        'API calls by operation'))
+    for result in results:
+        peak_memory = '' if result['peak_memory_mib'] is None else '{:.2f}'.format(result['peak_memory_mib'])
+        print('{:>7}  {:<58} {:<24} {:>9.3f} {:>9} {:>9}  {}'.format(result['size'], result['method'], result['outcome'],
+            result['wall_seconds'], peak_memory, result['api_calls'],
+            ', '.join('{}={}'.format(operation, count) for operation, count in result['api_calls_by_operation'].items())))
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    with open('tag_tamer_parameters.json') as parameters_file:
+        tag_tamer_parameters = json.load(parameters_file)['parameters']
+    parser = argparse.ArgumentParser(description='Benchmark the Tag Tamer getters & setters against synthetic accounts')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+        help='number of instances, volumes, buckets & functions of each synthetic account')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic accounts')
+    parser.add_argument('--methods', nargs='+', default=list(), help='only run the methods whose names include one of these')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    arguments = parser.parse_args()
+
+    # Benchmark the configured inventory & tag write engines.  The asyncio API call engine sends its calls with
+    # aiobotocore, which the stand-in cannot answer, so per-resource calls always use the threads engine.  Check the
+    # asyncio engine against a stub endpoint with tag-tamer-engine-check.py
+    resources_tags.inventory_engines.update(tag_tamer_parameters.get('inventory_engines', dict()))
+    resources_tags.tag_write_engines.update(tag_tamer_parameters.get('tag_write_engines', dict()))
+    tag_tamer_api_calls.configure('threads', tag_tamer_parameters.get('api_call_concurrency', 64))
+    tag_tamer_inventory_store.configure(None)
+
+    results = list()
+    for size in arguments.sizes:
+        results.extend(run_benchmarks(size, arguments.seed, arguments.methods, not arguments.no_memory))
+    print_results(results)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Checks the asyncio API call engine against a stub AWS endpoint, for example:
+#   python3 tag-tamer-engine-check.py [--endpoint-url http://127.0.0.1:5000] [--concurrency 8]
+# Without --endpoint-url the check starts an in-process stub endpoint answering Amazon S3 get_bucket_tagging &
+# AWS Lambda list_tags calls.  The stub also throttles one bucket & counts the calls in flight, to check the
+# engine's retries & its max_concurrency limit.  With --endpoint-url the check first creates its buckets &
+# functions through the endpoint, for example a moto server started with "moto_server -p 5000".
+# Exits with status 1 when any call returns another response or error than expected.
+# Needs the aiobotocore package, like the asyncio engine
+
+# Import argument parser
+import argparse
+# Import AWS module for python
+import boto3, botocore
+# Import the engine sending per-resource AWS API calls
+from api_calls import tag_tamer_api_calls
+# Import the HTTP server of the stub endpoint
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# Import io to build the deployment package of the functions created through --endpoint-url
+import io
+# Import JSON to answer the AWS Lambda calls
+import json
+# Import logging module
+import logging
+# Import sys to return the check's exit status
+import sys
+# Import threading to serve the stub endpoint & count its calls in flight
+import threading
+# Import time to slow the stub's answers down enough to overlap calls
+import time
+# Import urllib to parse the stub's request paths
+from urllib.parse import unquote, urlparse
+# Import zipfile to build the deployment package of the functions created through --endpoint-url
+import zipfile
+
+log = logging.getLogger('tag_tamer_engine_check')
+
+# The stub endpoint's credentials, account & region
+session_credentials = {
+    'AccessKeyId': 'AKIAENGINECHECK',
+    'SecretKey': 'engine-check-secret-key',
+    'SessionToken': 'engine-check-session-token'
+}
+account_id = '123456789012'
+region = 'us-east-1'
+# Tags of the tagged bucket & function
+check_tags = {'Owner': 'tag-tamer', 'Environment': 'engine-check'}
+# Number of tagged buckets called at once to check the engine's concurrency
+load_buckets = 64
+
+# Returns the ARN of the function
+def get_function_arn(function_name):
+    return 'arn:aws:lambda:{}:{}:function:{}'.format(region, account_id, function_name)
+
+# Define stub_endpoint class to answer the engine's calls like Amazon S3 & AWS Lambda
+class stub_endpoint(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # Bucket name -> tag dictionary, or None for an untagged bucket
+    buckets = dict()
+    # Function name -> tag dictionary
+    functions = dict()
+    # Bucket name -> number of get_bucket_tagging calls still answered with SlowDown
+    throttled = dict()
+    lock = threading.Lock()
+    in_flight = 0
+    peak_in_flight = 0
+
+    # Silence the per-request log lines
+    def log_message(self, format, *args):
+        pass
+
+    # Send the response of one call
+    def _send(self, status, body, content_type, headers=None):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Send an Amazon S3 error
+    def _send_s3_error(self, status, code):
+        self._send(status, '<Error><Code>{}</Code><Message>{}</Message></Error>'.format(code, code), 'application/xml')
+
+    # Answer AWS Lambda list_tags calls
+    def _list_tags(self, path):
+        function_name = unquote(path.split('/tags/', 1)[1]).split(':')[-1]
+        if function_name not in self.functions:
+            return self._send(404, json.dumps({'Message': 'Function not found: ' + function_name}), 'application/json',
+                {'x-amzn-ErrorType': 'ResourceNotFoundException'})
+        self._send(200, json.dumps({'Tags': self.functions[function_name]}), 'application/json')
+
+    # Answer Amazon S3 get_bucket_tagging calls
+    def _get_bucket_tagging(self, bucket_name):
+        if bucket_name not in self.buckets:
+            return self._send_s3_error(404, 'NoSuchBucket')
+        with self.lock:
+            throttled = self.throttled.get(bucket_name, 0)
+            if throttled:
+                self.throttled[bucket_name] = throttled - 1
+        if throttled:
+            return self._send_s3_error(503, 'SlowDown')
+        if self.buckets[bucket_name] is None:
+            return self._send_s3_error(404, 'NoSuchTagSet')
+        tag_set = ''.join('<Tag><Key>{}</Key><Value>{}</Value></Tag>'.format(key, value)
+            for key, value in self.buckets[bucket_name].items())
+        self._send(200, '<Tagging><TagSet>{}</TagSet></Tagging>'.format(tag_set), 'application/xml')
+
+    # Answer one GET call, counting the calls in flight
+    def do_GET(self):
+        with self.lock:
+            stub_endpoint.in_flight += 1
+            stub_endpoint.peak_in_flight = max(stub_endpoint.peak_in_flight, stub_endpoint.in_flight)
+        try:
+            time.sleep(0.02)
+            path = urlparse(self.path)
+            if path.path.startswith('/2017-03-31/tags/'):
+                self._list_tags(path.path)
+            elif path.query.startswith('tagging'):
+                self._get_bucket_tagging(path.path.strip('/'))
+            else:
+                self._send_s3_error(400, 'NotImplemented')
+        finally:
+            with self.lock:
+                stub_endpoint.in_flight -= 1
+
+# Starts the stub endpoint in a daemon thread & returns its URL
+def start_stub_endpoint():
+    stub_endpoint.buckets.update({'tagged-bucket': dict(check_tags), 'untagged-bucket': None,
+        'throttled-bucket': dict(check_tags)})
+    stub_endpoint.buckets.update({'load-bucket-{}'.format(number): {'Number': str(number)} for number in range(load_buckets)})
+    stub_endpoint.functions.update({'tagged-function': dict(check_tags)})
+    stub_endpoint.throttled.update({'throttled-bucket': 2})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), stub_endpoint)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-endpoint', daemon=True).start()
+    return 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+# Creates the buckets & function of the check through the endpoint, for example a moto server
+def create_check_resources(endpoint_url):
+    client_arguments = {'region_name': region, 'endpoint_url': endpoint_url,
+        'aws_access_key_id': session_credentials['AccessKeyId'],
+        'aws_secret_access_key': session_credentials['SecretKey'],
+        'aws_session_token': session_credentials['SessionToken']}
+    s3_client = boto3.client('s3', **client_arguments)
+    for bucket_name in ['tagged-bucket', 'untagged-bucket'] + ['load-bucket-{}'.format(number) for number in range(load_buckets)]:
+        s3_client.create_bucket(Bucket=bucket_name)
+    s3_client.put_bucket_tagging(Bucket='tagged-bucket',
+        Tagging={'TagSet': [{'Key': key, 'Value': value} for key, value in check_tags.items()]})
+    for number in range(load_buckets):
+        s3_client.put_bucket_tagging(Bucket='load-bucket-{}'.format(number),
+            Tagging={'TagSet': [{'Key': 'Number', 'Value': str(number)}]})
+
+    # The role & function are kept from earlier checks against the same endpoint
+    iam_client = boto3.client('iam', **client_arguments)
+    try:
+        role_arn = iam_client.create_role(RoleName='tag-tamer-engine-check',
+            AssumeRolePolicyDocument=json.dumps({'Version': '2012-10-17', 'Statement': [{'Effect': 'Allow',
+                'Principal': {'Service': 'lambda.amazonaws.com'}, 'Action': 'sts:AssumeRole'}]}))['Role']['Arn']
+    except botocore.exceptions.ClientError as error:
+        if error.response['Error']['Code'] != 'EntityAlreadyExists':
+            raise
+        role_arn = iam_client.get_role(RoleName='tag-tamer-engine-check')['Role']['Arn']
+    deployment_package = io.BytesIO()
+    with zipfile.ZipFile(deployment_package, 'w') as package_file:
+        package_file.writestr('handler.py', 'def handler(event, context):\n    return event\n')
+    try:
+        boto3.client('lambda', **client_arguments).create_function(FunctionName='tagged-function', Runtime='python3.12',
+            Role=role_arn, Handler='handler.handler', Code={'ZipFile': deployment_package.getvalue()}, Tags=check_tags)
+    except botocore.exceptions.ClientError as error:
+        if error.response['Error']['Code'] != 'ResourceConflictException':
+            raise
+
+# Returns the tag dictionary of the response, or the error code of the ClientError, of one call
+def get_call_result(service, response, error):
+    if error is not None:
+        return error.response['Error']['Code']
+    if service == 's3':
+        return {tag['Key']: tag['Value'] for tag in response['TagSet']}
+    return response['Tags']
+
+# Sends the calls through the engine & returns the number of calls whose result is not the expected one
+def check_calls(description, service, operation, calls, expected_results):
+    started = time.perf_counter()
+    results = [get_call_result(service, response, error) for response, error in
+        tag_tamer_api_calls.run_calls(service, operation, [(region, params) for params in calls], **session_credentials)]
+    failures = sum(1 for result, expected_result in zip(results, expected_results) if result != expected_result)
+    print('{}  {} ({} calls, {:.2f}s)'.format('FAIL' if failures else 'ok  ', description, len(calls),
+        time.perf_counter() - started))
+    for params, result, expected_result in zip(calls, results, expected_results):
+        if result != expected_result:
+            print('      {} returned {}, expected {}'.format(params, result, expected_result))
+    return failures
+
+# Runs every check of the asyncio engine & returns the number of failures
+def run_checks(endpoint_url, max_concurrency, stub_checks):
+    tag_tamer_api_calls.configure('asyncio', max_concurrency, {'s3': endpoint_url, 'lambda': endpoint_url})
+    if tag_tamer_api_calls.engine != 'asyncio':
+        print('FAIL  the asyncio engine is unavailable.  Install the aiobotocore package')
+        return 1
+
+    failures = check_calls('s3 get_bucket_tagging of tagged, untagged & missing buckets', 's3', 'get_bucket_tagging',
+        [{'Bucket': 'tagged-bucket'}, {'Bucket': 'untagged-bucket'}, {'Bucket': 'missing-bucket'}],
+        [check_tags, 'NoSuchTagSet', 'NoSuchBucket'])
+    failures += check_calls('lambda list_tags of tagged & missing functions', 'lambda', 'list_tags',
+        [{'Resource': get_function_arn('tagged-function')}, {'Resource': get_function_arn('missing-function')}],
+        [check_tags, 'ResourceNotFoundException'])
+    failures += check_calls('s3 get_bucket_tagging results kept in call order', 's3', 'get_bucket_tagging',
+        [{'Bucket': 'load-bucket-{}'.format(number)} for number in range(load_buckets)],
+        [{'Number': str(number)} for number in range(load_buckets)])
+    if not stub_checks:
+        return failures
+
+    failures += check_calls('s3 get_bucket_tagging retried after SlowDown', 's3', 'get_bucket_tagging',
+        [{'Bucket': 'throttled-bucket'}], [check_tags])
+    peak_in_flight = stub_endpoint.peak_in_flight
+    if 1 < peak_in_flight <= max_concurrency:
+        print('ok    at most {} calls in flight, {} at the peak'.format(max_concurrency, peak_in_flight))
+    else:
+        print('FAIL  {} calls in flight at the peak, expected 2 to {}'.format(peak_in_flight, max_concurrency))
+        failures += 1
+    return failures
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='Check the asyncio API call engine against a stub AWS endpoint')
+    parser.add_argument('--endpoint-url', help='endpoint to check against, for example a moto server, instead of the built-in stub')
+    parser.add_argument('--concurrency', type=int, default=8, help='maximum number of calls the engine has in flight')
+    arguments = parser.parse_args()
+
+    if arguments.endpoint_url:
+        create_check_resources(arguments.endpoint_url)
+        failures = run_checks(arguments.endpoint_url, arguments.concurrency, False)
+    else:
+        failures = run_checks(start_stub_endpoint(), arguments.concurrency, True)
+    print('{} failed check(s)'.format(failures) if failures else 'All checks passed')
+    sys.exit(1 if failures else 0)
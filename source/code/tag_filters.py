@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Compiler for the tag key:value searches users build in the Tag Tamer UI.
+# A search is any number of tag_keyN / tag_valueN clauses, each optionally negated by tag_notN,
+# joined by one "AND" or "OR" conjunction.  The compiled expression pushes as much of the search
+# as possible down to the AWS APIs & evaluates the whole search in memory against the returned tags.
+# Included class & methods
+# class - tag_filter_expression
+#  method - matches
+#  method - filter_resources
+#  method - get_tagging_api_filter_lists
+# function - compile_tag_filters
+
+# Import collections to group clauses by tag key
+from collections import OrderedDict
+# Import Python's regex module to find the numbered tag clauses
+import re
+
+# Define tag_filter_expression class holding the compiled tag clauses of one search
+class tag_filter_expression:
+
+    #Class constructor
+    # clauses is a list of (tag key, tag value or None, negated) tuples; a clause without a value
+    # matches any resource carrying the tag key & a negated clause matches every other resource
+    def __init__(self, clauses, conjunction='AND'):
+        self.clauses = list(clauses)
+        self.conjunction = 'OR' if conjunction == 'OR' else 'AND'
+
+    # Returns True if the dictionary of tag key:value pairs, or None for a resource
+    # without a tag set, satisfies the search.  An empty search matches every resource
+    def matches(self, tags):
+        if not self.clauses:
+            return True
+        tags = tags or dict()
+        results = ((tag_key in tags and (tag_value is None or tags[tag_key] == tag_value)) != negated
+            for tag_key, tag_value, negated in self.clauses)
+        if self.conjunction == 'OR':
+            return any(results)
+        return all(results)
+
+    # Returns the IDs of the (resource ID, tags dictionary or None) tuples satisfying the search
+    # in one pass.  A resource returned by several pushed-down calls is only returned once
+    def filter_resources(self, resources):
+        matching_resource_ids = OrderedDict()
+        for resource_id, tags in resources:
+            if resource_id not in matching_resource_ids and self.matches(tags):
+                matching_resource_ids[resource_id] = True
+        return list(matching_resource_ids)
+
+    # Returns (tag key, list of values or None for any value) tuples merging the clauses of an
+    # "OR" search by tag key.  A key-only clause absorbs the valued clauses of the same key
+    def _get_or_key_groups(self):
+        key_groups = OrderedDict()
+        for tag_key, tag_value, _ in self.clauses:
+            if tag_value is None:
+                key_groups[tag_key] = None
+            elif tag_key not in key_groups:
+                key_groups[tag_key] = [tag_value]
+            elif key_groups[tag_key] is not None and tag_value not in key_groups[tag_key]:
+                key_groups[tag_key].append(tag_value)
+        return list(key_groups.items())
+
+    # Returns a list of Resource Groups Tagging API "TagFilters" lists, one per GetResources call
+    # stream, whose merged results are a superset of the resources satisfying the search.  The
+    # Tagging API joins a call's TagFilters with AND & a TagFilter's values with OR so an "AND"
+    # search needs one call stream & an "OR" search one call stream per tag key.  TagFilters cannot negate
+    # so negated clauses are left to the in-memory evaluation & an "OR" search with a negated clause
+    # needs one unfiltered call stream
+    def get_tagging_api_filter_lists(self):
+        if self.conjunction == 'OR' and any(negated for _, _, negated in self.clauses):
+            return [list()]
+        if self.conjunction == 'AND':
+            tag_filters = OrderedDict()
+            for tag_key, tag_value, negated in self.clauses:
+                # Further clauses of the same key are left to the in-memory evaluation
+                if not negated and tag_key not in tag_filters:
+                    tag_filters[tag_key] = {'Key': tag_key}
+                    if tag_value is not None:
+                        tag_filters[tag_key]['Values'] = [tag_value]
+            return [list(tag_filters.values())]
+
+        filter_lists = list()
+        for tag_key, tag_values in self._get_or_key_groups():
+            tag_filter = {'Key': tag_key}
+            if tag_values is not None:
+                tag_filter['Values'] = tag_values
+            filter_lists.append([tag_filter])
+        return filter_lists
+
+# Returns the tag_filter_expression of the filter tags dictionary submitted by the UI.
+# Clauses are read from every numbered tag_keyN entry, with its optional tag_valueN & tag_notN
+# entries, in clause number order.  Values submitted without their tag key are ignored
+def compile_tag_filters(filter_tags):
+    clause_numbers = list()
+    for filter_name in filter_tags:
+        clause_number = re.search("^tag_key([0-9]+)$", filter_name)
+        if clause_number and filter_tags.get(filter_name):
+            clause_numbers.append(int(clause_number.group(1)))
+    clauses = list()
+    for clause_number in sorted(clause_numbers):
+        clauses.append((filter_tags['tag_key' + str(clause_number)],
+            filter_tags.get('tag_value' + str(clause_number)) or None,
+            bool(filter_tags.get('tag_not' + str(clause_number)))))
+    return tag_filter_expression(clauses, filter_tags.get('conjunction'))
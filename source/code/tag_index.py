@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Index of resources & their tags built from a single inventory pass.
+# Resources are numbered densely & an inverted index maps every tag key & tag key:value pair to the
+# set of resource numbers carrying it so searches are answered with set algebra on integer bitmaps.
+# Each distinct tag key:value pair is stored once with an interned tag key & resources keep compact
+# records of tag pair numbers so large inventories of a few users fit in one worker's memory.
+# Included classes & methods
+# class - resource_record
+# class - tag_index
+#  method - add_resource
+#  method - update_resource_tags
+#  method - get_resource_tags
+#  method - get_resources_by_id
+#  method - get_resources
+#  method - find_resources
+#  method - get_resources_tags
+#  method - get_tag_keys
+#  method - get_tag_values
+# function - get_cached_tag_index
+# function - peek_cached_tag_index
+# function - put_cached_tag_index
+# function - patch_cached_tag_indexes
+# function - invalidate_cached_tag_indexes
+
+# Import administrative functions
+from admin import execution_status
+# Import the inventory cache shared across requests
+from inventory_cache import tag_tamer_inventory_cache
+# Import arrays to store posting lists as unsigned integers
+from array import array
+# Import bisect to keep posting lists in resource number order
+from bisect import bisect_left, insort
+# Import Python's regex module to filter Boto3's API responses
+import re
+# Import sys to intern tag strings
+import sys
+# Import threading to guard updates made while other requests read the index
+import threading
+
+# Define resource_record class to hold one indexed resource.  tag_pairs is a tuple of
+# tag pair numbers or None if the resource has no tag set
+class resource_record:
+    __slots__ = ('resource_id', 'tag_pairs')
+
+    #Class constructor
+    def __init__(self, resource_id, tag_pairs):
+        self.resource_id = resource_id
+        self.tag_pairs = tag_pairs
+
+# Define tag_index class to hold one resource type's resources & tags
+class tag_index:
+
+    #Class constructor
+    def __init__(self):
+        # resource ID -> dense resource number & resource number -> resource record
+        self.resource_numbers = dict()
+        self.records = list()
+        # (tag key, tag value) -> tag pair number & tag pair number -> (tag key, tag value)
+        self.tag_pair_numbers = dict()
+        self.tag_pairs = list()
+        # tag key -> posting & tag pair number -> posting or None of the numbers of the resources carrying it.
+        # A posting carried by one resource is its resource number, otherwise an array of resource numbers in order
+        self.key_postings = dict()
+        self.pair_postings = list()
+        # tag key or tag pair number -> bitmap of its resource numbers, built when first searched
+        self.bitmaps = dict()
+        # False when the index was built by an inventory engine listing tagged resources only
+        self.lists_untagged = True
+        self.my_status = execution_status()
+        self.lock = threading.RLock()
+
+    # Add one resource & its tags to the index.  Tags is an iterable of
+    # (key, value) tuples or None when the resource has no tag set
+    def add_resource(self, resource_id, tags):
+        with self.lock:
+            resource_number = self.resource_numbers.get(resource_id)
+            if resource_number is None:
+                resource_number = len(self.records)
+                self.resource_numbers[resource_id] = resource_number
+                self.records.append(resource_record(resource_id, None))
+            record = self.records[resource_number]
+            self._remove_postings(resource_number, record)
+            if tags is None:
+                record.tag_pairs = None
+                return
+            resource_tags = dict()
+            for tag_key, tag_value in tags:
+                # Exclude any AWS-applied tags which begin with "aws:"
+                if not re.search("^aws:", tag_key):
+                    resource_tags[tag_key] = tag_value
+            record.tag_pairs = tuple(self._get_tag_pair_number(tag_pair) for tag_pair in resource_tags.items())
+            for posting in self._get_postings(record.tag_pairs):
+                self._add_posting(posting, resource_number)
+
+    # Merge newly applied (key, value) tags into an indexed resource's tags
+    def update_resource_tags(self, resource_id, tags):
+        with self.lock:
+            if resource_id in self.resource_numbers:
+                resource_tags = self.get_resource_tags(resource_id) or {}
+                resource_tags.update(tags)
+                self.add_resource(resource_id, resource_tags.items())
+
+    # Returns the number of a (tag key, tag value) pair, adding the pair with an interned tag key when first seen.
+    # Tag values are shared through the pair
+    def _get_tag_pair_number(self, tag_pair):
+        tag_pair_number = self.tag_pair_numbers.get(tag_pair)
+        if tag_pair_number is None:
+            tag_pair = (sys.intern(tag_pair[0]), tag_pair[1])
+            tag_pair_number = len(self.tag_pairs)
+            self.tag_pair_numbers[tag_pair] = tag_pair_number
+            self.tag_pairs.append(tag_pair)
+            self.pair_postings.append(None)
+        return tag_pair_number
+
+    # Returns the tag keys & tag pair numbers of a resource record's tag pairs
+    def _get_postings(self, tag_pairs):
+        for tag_pair_number in tag_pairs:
+            yield self.tag_pairs[tag_pair_number][0]
+            yield tag_pair_number
+
+    # Returns the resource numbers of a tag key or tag pair number posting or None
+    def _get_posting(self, posting):
+        if type(posting) is int:
+            return self.pair_postings[posting]
+        return self.key_postings.get(posting)
+
+    # Replace the resource numbers of a tag key or tag pair number posting
+    def _set_posting(self, posting, resource_numbers):
+        if type(posting) is int:
+            self.pair_postings[posting] = resource_numbers
+        elif resource_numbers is None:
+            del self.key_postings[posting]
+        else:
+            self.key_postings[posting] = resource_numbers
+
+    # Add a resource number to a posting
+    def _add_posting(self, posting, resource_number):
+        resource_numbers = self._get_posting(posting)
+        if resource_numbers is None:
+            self._set_posting(posting, resource_number)
+        else:
+            if type(resource_numbers) is int:
+                resource_numbers = array('I', (resource_numbers,))
+                self._set_posting(posting, resource_numbers)
+            # Inventory passes add resources in resource number order
+            if resource_numbers[-1] < resource_number:
+                resource_numbers.append(resource_number)
+            else:
+                insort(resource_numbers, resource_number)
+        self.bitmaps.pop(posting, None)
+
+    # Forget the postings of an indexed resource's tags
+    def _remove_postings(self, resource_number, record):
+        for posting in self._get_postings(record.tag_pairs or ()):
+            resource_numbers = self._get_posting(posting)
+            if type(resource_numbers) is int:
+                self._set_posting(posting, None)
+            else:
+                del resource_numbers[bisect_left(resource_numbers, resource_number)]
+                if len(resource_numbers) == 1:
+                    self._set_posting(posting, resource_numbers[0])
+            self.bitmaps.pop(posting, None)
+
+    # Returns the bitmap of the numbers of the resources carrying a tag key or tag pair number
+    def _get_bitmap(self, posting):
+        bitmap = self.bitmaps.get(posting)
+        if bitmap is None:
+            resource_numbers = self._get_posting(posting)
+            if resource_numbers is None:
+                resource_numbers = ()
+            if type(resource_numbers) is int:
+                bitmap = 1 << resource_numbers
+            else:
+                bits = bytearray((len(self.records) + 7) // 8)
+                for resource_number in resource_numbers:
+                    bits[resource_number >> 3] |= 1 << (resource_number & 7)
+                bitmap = int.from_bytes(bits, 'little')
+            self.bitmaps[posting] = bitmap
+        return bitmap
+
+    # Returns the tags dictionary of a resource record or None if the resource has no tag set
+    def _get_record_tags(self, record):
+        if record.tag_pairs is None:
+            return None
+        return dict(self.tag_pairs[tag_pair_number] for tag_pair_number in record.tag_pairs)
+
+    # Returns the tags dictionary of an indexed resource or None if the resource has no tag set or is not indexed
+    def get_resource_tags(self, resource_id):
+        with self.lock:
+            resource_number = self.resource_numbers.get(resource_id)
+            if resource_number is None:
+                return None
+            return self._get_record_tags(self.records[resource_number])
+
+    # Returns a dictionary of resource ID -> tags dictionary or None for the indexed resource IDs given.
+    # Resource IDs missing from the index are left out
+    def get_resources_by_id(self, resource_ids):
+        with self.lock:
+            return {resource_id: self._get_record_tags(self.records[self.resource_numbers[resource_id]])
+                for resource_id in resource_ids if resource_id in self.resource_numbers}
+
+    # Returns a list of (resource ID, tags dictionary or None) tuples for every indexed resource
+    def get_resources(self):
+        with self.lock:
+            return [(record.resource_id, self._get_record_tags(record)) for record in self.records]
+
+    # Returns the IDs of the indexed resources satisfying a tag_filter_expression in index order.  Each clause
+    # is one bitmap, negated against the bitmap of every resource, & the clauses are joined with AND or OR
+    def find_resources(self, tag_filter):
+        with self.lock:
+            all_resources_bitmap = (1 << len(self.records)) - 1
+            matching_bitmap = all_resources_bitmap
+            for clause_number, (tag_key, tag_value, negated) in enumerate(tag_filter.clauses):
+                if tag_value is None:
+                    clause_bitmap = self._get_bitmap(tag_key)
+                elif (tag_key, tag_value) in self.tag_pair_numbers:
+                    clause_bitmap = self._get_bitmap(self.tag_pair_numbers[(tag_key, tag_value)])
+                else:
+                    clause_bitmap = 0
+                if negated:
+                    clause_bitmap = all_resources_bitmap & ~clause_bitmap
+                if clause_number == 0:
+                    matching_bitmap = clause_bitmap
+                elif tag_filter.conjunction == 'OR':
+                    matching_bitmap |= clause_bitmap
+                else:
+                    matching_bitmap &= clause_bitmap
+            return [self.records[resource_number].resource_id for resource_number in _get_bitmap_numbers(matching_bitmap)]
+
+    # Returns a nested dictionary of every resource & its key:value tags in index order.
+    # The found tags & updated tags pages sort resources & tags when they are rendered
+    def get_resources_tags(self):
+        tagged_resource_inventory = dict()
+        with self.lock:
+            for record in self.records:
+                resource_tags = self._get_record_tags(record)
+                if resource_tags is None:
+                    resource_tags = {"No Tags Found": "No Tags Found"}
+                tagged_resource_inventory[record.resource_id] = resource_tags
+        return tagged_resource_inventory
+
+    # Returns the sorted list of distinct tag keys
+    def get_tag_keys(self):
+        with self.lock:
+            tag_keys = list(self.key_postings)
+        return sorted(tag_keys, key=str.lower)
+
+    # Returns the sorted list of distinct, non-empty tag values
+    def get_tag_values(self):
+        with self.lock:
+            tag_values = {tag_value for (_, tag_value), resource_numbers in zip(self.tag_pairs, self.pair_postings)
+                if resource_numbers is not None and tag_value}
+        return sorted(tag_values, key=str.lower)
+
+# Returns the list of the set bit numbers of a bitmap in increasing order
+def _get_bitmap_numbers(bitmap):
+    bit_numbers = list()
+    for byte_number, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')):
+        while byte:
+            lowest_bit = byte & -byte
+            bit_numbers.append(byte_number * 8 + lowest_bit.bit_length() - 1)
+            byte ^= lowest_bit
+    return bit_numbers
+
+# Returns the cached tag index for the user's identity, region & unit, calling scan() to build
+# a new index on a cache miss.  Only successfully scanned indexes are cached
+def get_cached_tag_index(region, unit, scan, **session_credentials):
+    index_key = (session_credentials.get('IdentityId') or session_credentials['AccessKeyId'], region, unit)
+    return tag_tamer_inventory_cache.get(index_key, scan,
+        cacheable=lambda inventory_index: inventory_index.my_status.get_status().get('alert_level') == 'success')
+
+# Returns the user's cached tag index for the region & unit if it is younger than the cache TTL, otherwise None
+def peek_cached_tag_index(region, unit, **session_credentials):
+    index_key = (session_credentials.get('IdentityId') or session_credentials['AccessKeyId'], region, unit)
+    return tag_tamer_inventory_cache.peek(index_key)
+
+# Cache a successfully built tag index for the user's identity, region & unit
+def put_cached_tag_index(region, unit, inventory_index, **session_credentials):
+    if inventory_index.my_status.get_status().get('alert_level') == 'success':
+        index_key = (session_credentials.get('IdentityId') or session_credentials['AccessKeyId'], region, unit)
+        tag_tamer_inventory_cache.put(index_key, inventory_index)
+
+# Write-through update of every cached tag index for the region & unit after
+# chosen_tags, a list of {'Key': ..., 'Value': ...} dictionaries, are applied to resource_ids
+def patch_cached_tag_indexes(region, unit, resource_ids, chosen_tags):
+    applied_tags = [(tag['Key'], tag['Value']) for tag in chosen_tags]
+    def _patch(inventory_index):
+        for resource_id in resource_ids:
+            inventory_index.update_resource_tags(resource_id, applied_tags)
+    tag_tamer_inventory_cache.patch((region, unit), _patch)
+
+# Remove every cached tag index for the region & unit so the next request rescans it
+def invalidate_cached_tag_indexes(region, unit):
+    tag_tamer_inventory_cache.invalidate((region, unit))
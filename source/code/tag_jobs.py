@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Runner of bulk tagging jobs outside of the request threads.
+# Jobs are queued to a bounded thread pool, tag their resources one chunk at a time, report
+# their progress after every chunk, stop at the next chunk once cancelled & keep their
+# per-resource results until they are older than the retention time.
+# Included class & methods
+# class - tag_job
+#  method - cancel
+#  method - get_progress
+# class - tag_job_runner
+#  method - configure
+#  method - submit
+#  method - get_job
+#  method - cancel
+
+# Import the AWS API call metrics
+from api_metrics import tag_tamer_api_metrics
+# Import AWS module for python
+import botocore
+# Import thread pool to run the jobs
+from concurrent.futures import ThreadPoolExecutor
+# Import collections to keep the jobs & their results in submission order
+from collections import OrderedDict
+# Import logging module
+import logging
+# Import threading to guard the jobs
+import threading
+# Import the tag write execution status
+from tag_writers import get_tag_write_status
+# Import epoch time method
+from time import time
+# Import uuid to give every job an unguessable ID
+import uuid
+
+log = logging.getLogger(__name__)
+
+# Define tag_job class holding one bulk tagging job & its per-resource results
+class tag_job:
+
+    #Class constructor
+    # inventory is the multi-region or multi-account getter/setter the resources are tagged with
+    def __init__(self, owner, inventory, resources_to_tag, chosen_tags):
+        self.job_id = uuid.uuid4().hex
+        self.owner = owner
+        self.inventory = inventory
+        self.resources_to_tag = list(OrderedDict.fromkeys(resources_to_tag))
+        self.chosen_tags = chosen_tags
+        # "queued", "running", "completed", "cancelled" or "failed"
+        self.state = 'queued'
+        self.cancelled = False
+        # qualified resource ID -> 'success', 'unchanged' or AWS error code
+        self.results = OrderedDict()
+        self.submitted_time = time()
+        self.finished_time = None
+        self.lock = threading.Lock()
+
+    # Ask the job to stop before its next chunk of resources
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.state == 'queued':
+                self.state = 'cancelled'
+                self.finished_time = time()
+
+    # Returns a dictionary of the job's state, resource counts, per-resource results & execution status
+    def get_progress(self):
+        with self.lock:
+            results = OrderedDict(self.results)
+            state = self.state
+        done_count = len([result for result in results.values() if result == 'success' or result == 'unchanged'])
+        progress = {
+            'job_id': self.job_id,
+            'state': state,
+            'total': len(self.resources_to_tag),
+            'done': done_count,
+            'failed': len(results) - done_count,
+            'remaining': len(self.resources_to_tag) - len(results),
+            'results': results
+        }
+        if results:
+            progress['status'] = get_tag_write_status(results)
+        else:
+            progress['status'] = {'status_message': 'Your tags have not been applied yet', 'alert_level': 'info'}
+        if state == 'cancelled':
+            progress['status'] = {'status_message': 'The tagging job was cancelled after tagging {} of {} resources'.format(
+                len(results), len(self.resources_to_tag)), 'alert_level': 'warning'}
+        return progress
+
+    # Tag the resources chunk_size at a time until every resource is tagged or the job is cancelled.
+    # The job's AWS API calls are counted for the "tag_job" route & summarized once it ends
+    def _run(self, chunk_size, **session_credentials):
+        with self.lock:
+            if self.cancelled:
+                return
+            self.state = 'running'
+        tag_tamer_api_metrics.start_request('tag_job')
+        try:
+            for chunk_start in range(0, len(self.resources_to_tag), chunk_size):
+                if self.cancelled:
+                    break
+                chunk = self.resources_to_tag[chunk_start:chunk_start + chunk_size]
+                try:
+                    chunk_results, _ = self.inventory.set_resources_tags(chunk, self.chosen_tags, **session_credentials)
+                except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as error:
+                    log.error("Boto3 API returned error. tag job: {} - {}".format(self.job_id, error))
+                    chunk_results = {resource_id: 'JobFailed' for resource_id in chunk}
+                with self.lock:
+                    for resource_id in chunk:
+                        self.results[resource_id] = chunk_results.get(resource_id, 'JobFailed')
+            final_state = 'cancelled' if self.cancelled and len(self.results) < len(self.resources_to_tag) else 'completed'
+        except Exception as error:
+            log.exception('Tag job {} failed - {}'.format(self.job_id, error))
+            final_state = 'failed'
+        with self.lock:
+            self.state = final_state
+            self.finished_time = time()
+        log.info('Tag job {}: {}'.format(self.job_id, tag_tamer_api_metrics.end_request().get_summary()))
+
+# Define tag_job_runner class queuing bulk tagging jobs to a bounded thread pool
+class tag_job_runner:
+
+    #Class constructor
+    def __init__(self, max_workers=2, chunk_size=100, retention_seconds=3600):
+        self.executor = None
+        self.configure(max_workers, chunk_size, retention_seconds)
+        # job ID -> tag_job
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Set the number of jobs run at once, the number of resources tagged between progress updates
+    # & how long finished jobs keep their results
+    def configure(self, max_workers, chunk_size, retention_seconds):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tag-job')
+        self.chunk_size = max(chunk_size, 1)
+        self.retention_seconds = retention_seconds
+
+    # Remove the finished jobs older than the retention time
+    def _expire_jobs(self):
+        expired_time = time() - self.retention_seconds
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                if job.finished_time is not None and job.finished_time < expired_time]:
+                self.jobs.pop(job_id)
+
+    # Queue a job tagging the qualified resource IDs with the chosen tags & return its job ID
+    def submit(self, owner, inventory, resources_to_tag, chosen_tags, **session_credentials):
+        self._expire_jobs()
+        job = tag_job(owner, inventory, resources_to_tag, chosen_tags)
+        with self.lock:
+            self.jobs[job.job_id] = job
+        self.executor.submit(job._run, self.chunk_size, **session_credentials)
+        log.info('User "{}" submitted tag job {} for {} resources'.format(owner, job.job_id, len(job.resources_to_tag)))
+        return job.job_id
+
+    # Returns the owner's tag_job of the job ID or None if it does not exist, has expired or belongs to another user
+    def get_job(self, job_id, owner):
+        self._expire_jobs()
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    # Cancel the owner's job & return its tag_job or None if it cannot be found
+    def cancel(self, job_id, owner):
+        job = self.get_job(job_id, owner)
+        if job is not None:
+            job.cancel()
+            log.info('User "{}" cancelled tag job {}'.format(owner, job_id))
+        return job
+
+# Tag job runner shared by every request thread in this process
+tag_tamer_tag_jobs = tag_job_runner()
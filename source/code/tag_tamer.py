@@ -17,6 +17,24 @@ from config import config
 # Import getter/setter module for AWS resources & tags
 import resources_tags
 from resources_tags import resources_tags
+# Import getter/setter module for AWS resources & tags in every selected region
+from multi_region_resources_tags import multi_region_resources_tags
+# Import getter/setter module for AWS resources & tags in every member account
+from multi_account_resources_tags import multi_account_resources_tags
+# Import the inventory cache shared across requests
+from inventory_cache import tag_tamer_inventory_cache
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import the persisted inventory store kept up to date by AWS CloudTrail events
+from inventory_store import tag_tamer_inventory_store
+# Import the pages & cursors of the JSON inventory API
+from inventory_pages import encode_cursor, decode_cursor, get_inventory_page
+# Import the runner of bulk tagging jobs
+from tag_jobs import tag_tamer_tag_jobs
+# Import the engine sending per-resource AWS API calls concurrently
+from api_calls import tag_tamer_api_calls
+# Import the AWS API call metrics
+from api_metrics import tag_tamer_api_metrics
 # Import getter/setter module for AWS IAM
 import iam
 from iam import roles
@@ -36,14 +54,18 @@ from ssm_parameter_store import ssm_parameter_store
 #from sts import get_session_credentials
 # Import Tag Tamer utility functions
 from utilities import *
+# Import AWS module for python
+import boto3
 
 # Import flask framework module & classes to build API's
 import flask, flask_wtf
-from flask import Flask, flash, jsonify, make_response, redirect, render_template, request, url_for
+from flask import Flask, flash, g, get_flashed_messages, jsonify, make_response, redirect, render_template, request, url_for
 # Use only flask_awscognito version 1.2.6 or higher from Tag Tamer
 from flask_awscognito import AWSCognitoAuthentication
 #from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity, set_access_cookies, unset_jwt_cookies
-from flask_wtf.csrf import CSRFProtect
+from flask_wtf.csrf import CSRFProtect, generate_csrf
+# Import itertools to read the first row of streamed inventories
+import itertools
 # Import JSON parser
 import json
 # Import logging module
@@ -78,6 +100,44 @@ logging.getLogger('werkzeug').setLevel('ERROR')
 selected_regions = tag_tamer_parameters['parameters']['selected_regions']
 region = selected_regions[0]
 log.debug('The selected AWS region is: \"%s\"', region)
+# Get the AWS IAM Roles to assume in each member account.  Without them only the user's own account is managed
+member_account_role_arns = tag_tamer_parameters['parameters'].get('member_account_role_arns', list())
+
+# Set how long resource & tag inventories are reused across requests
+tag_tamer_inventory_cache.configure(tag_tamer_parameters['parameters'].get('inventory_cache_ttl_seconds', 300),
+    tag_tamer_parameters['parameters'].get('inventory_cache_max_stale_seconds', 3600),
+    tag_tamer_parameters['parameters'].get('inventory_cache_max_entries', 64))
+# Set where the inventory store is persisted, how old a unit's last full inventory pass or applied AWS CloudTrail events
+# may get before it is read again & how long applied events keep a unit current before a full inventory pass reconciles it
+tag_tamer_inventory_store.configure(tag_tamer_parameters['parameters'].get('inventory_store_path'),
+    tag_tamer_parameters['parameters'].get('inventory_store_max_age_seconds', 300),
+    tag_tamer_parameters['parameters'].get('inventory_store_reconcile_seconds', 86400))
+# Set the connection pool size of every pooled Boto3 client
+tag_tamer_session_pool.configure(tag_tamer_parameters['parameters'].get('max_pool_connections', 32))
+# Choose the "threads" or "asyncio" engine sending per-resource API calls, how many calls the asyncio engine has in flight
+# & the endpoint URL of any service whose calls it sends to another endpoint, for example a local stub
+tag_tamer_api_calls.configure(tag_tamer_parameters['parameters'].get('api_call_engine', 'threads'),
+    tag_tamer_parameters['parameters'].get('api_call_concurrency', 64),
+    tag_tamer_parameters['parameters'].get('api_endpoint_urls', dict()))
+# Choose the "describe", "describe_tags" or "tagging_api" inventory engine for each resource type
+resources_tags.inventory_engines.update(tag_tamer_parameters['parameters'].get('inventory_engines', dict()))
+# Choose the "native" or "tagging_api" tag write engine for buckets & functions
+resources_tags.tag_write_engines.update(tag_tamer_parameters['parameters'].get('tag_write_engines', dict()))
+# Stream the found tags & tag resources pages to the browser as the inventory pages arrive
+stream_responses = tag_tamer_parameters['parameters'].get('stream_responses', False)
+# Set the number of bulk tagging jobs run at once, the resources tagged between progress updates & how long results are kept
+tag_tamer_tag_jobs.configure(tag_tamer_parameters['parameters'].get('tag_job_workers', 2),
+    tag_tamer_parameters['parameters'].get('tag_job_chunk_size', 100),
+    tag_tamer_parameters['parameters'].get('tag_job_retention_seconds', 3600))
+# Load the found tags & tag resources pages' rows from the JSON inventory API one page at a time
+paged_responses = tag_tamer_parameters['parameters'].get('paged_responses', False)
+# Set the default & largest number of rows in one page of the JSON inventory API
+inventory_page_size = tag_tamer_parameters['parameters'].get('inventory_page_size', 100)
+inventory_max_page_size = tag_tamer_parameters['parameters'].get('inventory_max_page_size', 1000)
+
+# Count & time the AWS API calls of the modules creating their clients from Boto3's default session
+boto3.setup_default_session()
+tag_tamer_api_metrics.register(boto3.DEFAULT_SESSION.events)
 
 # Get AWS Service parameters from AWS SSM Parameter Store
 ssm_ps = ssm_parameter_store(region)
@@ -108,6 +168,19 @@ csrf.init_app(app)
 aws_auth = AWSCognitoAuthentication(app)
 #jwt = JWTManager(app)
 
+# Count the AWS API calls of every request, including the calls of its worker threads, by the request's route
+@app.before_request
+def start_request_metrics():
+    tag_tamer_api_metrics.start_request(request.endpoint or 'unknown')
+
+# Log the request's duration & AWS API calls once its response is sent, which is after every row of a streamed response
+@app.after_request
+def end_request_metrics(response):
+    this_request = tag_tamer_api_metrics.get_request()
+    if this_request is not None:
+        response.call_on_close(lambda: log.info(tag_tamer_api_metrics.end_request(this_request).get_summary()))
+    return response
+
 
 # Get the user's session credentials based on username passed in JWT
 def get_user_session_credentials(cognito_id_token):
@@ -117,6 +190,96 @@ def get_user_session_credentials(cognito_id_token):
         ssm_parameters['cognito-default-region-value'])
     return user_session_credentials
 
+# Returns the getters & setters for resources & tags in every selected region & member account.
+# Member account roles are assumed with a session named after the user's Cognito user name.
+# refresh reads resources & tags from AWS instead of the inventory store & cached tag indexes
+def get_resources_tags_inventory(resource_type, unit, refresh=False):
+    if member_account_role_arns:
+        return multi_account_resources_tags(resource_type, unit, selected_regions, member_account_role_arns,
+            g.cognito_claims.get('username', 'tag-tamer'), refresh=refresh)
+    return multi_region_resources_tags(resource_type, unit, selected_regions, refresh=refresh)
+
+# Returns True if the submitted form or query string arguments ask to read resources & tags from AWS
+# instead of the inventory store & cached tag indexes.  Only the first page of a paged inventory refreshes it
+def get_refresh_requested(arguments):
+    return bool(arguments.get('refresh')) and not arguments.get('cursor')
+
+# Returns a response rendering template_name while the inventory rows arrive.  The first row is read before
+# the response starts so an inventory that fails outright still returns the blank page & its flashed status.
+# The template shows stream_status when the inventory ends with an error or a warning
+def stream_inventory_template(template_name, rows, execution_status, rows_name, **context):
+    rows = iter(rows)
+    first_rows = list(itertools.islice(rows, 1))
+    if not first_rows and execution_status.get('alert_level') == 'danger':
+        flash(execution_status['status_message'], execution_status['alert_level'])
+        return render_template('blank.html')
+    # The session cookie is sent before the template renders so read the flashed messages & CSRF token now
+    get_flashed_messages()
+    generate_csrf()
+    context[rows_name] = itertools.chain(first_rows, rows)
+    # stream_template needs Flask 2.2 or later so it is only imported when the stream_responses parameter is set
+    from flask import stream_template
+    response = make_response(stream_template(template_name, stream_status=execution_status, **context))
+    # Ask the nginx proxy to forward every rendered row instead of buffering the whole page
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Returns the dictionary of numbered tag_keyN, tag_valueN & tag_notN search clauses & their conjunction
+# found in the submitted form or query string arguments
+def get_filter_elements(arguments):
+    filter_elements = dict()
+    for form_element, form_value in arguments.items():
+        if form_value and re.search("^(tag_key[0-9]+|tag_value[0-9]+|tag_not[0-9]+|conjunction)$", form_element):
+            filter_elements[form_element] = form_value
+    return filter_elements
+
+# Sort keys of the (resource ID, resource name, region, account) rows of the resources API
+resource_page_sort_keys = OrderedDict((
+    ('name', lambda row: (row[1], row[2], row[3], row[0])),
+    ('id', lambda row: (row[0], row[2], row[3])),
+    ('region', lambda row: (row[2], row[0], row[3])),
+    ('account', lambda row: (row[3], row[2], row[0]))))
+# Sort keys of the (account, region, resource ID, tags) rows of the resources tags API
+tags_page_sort_keys = OrderedDict((
+    ('id', lambda row: (row[2], row[1], row[0])),
+    ('region', lambda row: (row[1], row[2], row[0])),
+    ('account', lambda row: (row[0], row[1], row[2]))))
+# Sort key of the tag keys & tag values APIs ignoring case like the tag search page
+value_page_sort_keys = {'value': lambda value: (value.lower(), value)}
+
+# Returns the JSON response of one page of the inventory rows returned by get_rows(resource_type, unit) for the
+# resource_type query string argument.  The query string chooses the sort key, the "asc" or "desc" order, the
+# page size & the cursor of the previous page.  Every page but the last returns the cursor of the next page.
+# Invalid arguments, including a missing or unknown resource type, return an HTTP 400 response before the
+# inventory is read
+def get_inventory_page_response(sort_keys, get_rows, get_item):
+    sort = request.args.get('sort') or next(iter(sort_keys))
+    order = request.args.get('order') or 'asc'
+    try:
+        page_size = min(int(request.args.get('page_size') or inventory_page_size), inventory_max_page_size)
+    except ValueError:
+        page_size = 0
+    cursor_scope = ':'.join((request.path, request.args.get('resource_type', ''), sort, order))
+    after_key = None
+    if request.args.get('cursor'):
+        after_key = decode_cursor(request.args.get('cursor'), cursor_scope)
+    # get_resource_type_unit reads an unknown resource type as "ec2"
+    resource_type_unit = None
+    if request.args.get('resource_type') in ('ebs', 'ec2', 'lambda', 's3'):
+        resource_type_unit = get_resource_type_unit(request.args.get('resource_type'))
+    if (sort not in sort_keys or order not in ('asc', 'desc') or page_size < 1 or resource_type_unit is None
+            or (request.args.get('cursor') and after_key is None)):
+        return jsonify(items=list(), next_cursor=None,
+            status={'status_message': 'The inventory page request is not valid', 'alert_level': 'danger'}), 400
+
+    rows, execution_status = get_rows(*resource_type_unit)
+    if execution_status.get('alert_level') == 'danger':
+        rows = list()
+    page_rows, next_key = get_inventory_page(rows, sort_keys[sort], page_size, after_key, order == 'desc')
+    return jsonify(items=[get_item(row) for row in page_rows],
+        next_cursor=encode_cursor(next_key, cursor_scope) if next_key is not None else None,
+        status=execution_status)
+
 # Allow users to sign into Tag Tamer via an Amazon Cognito User Pool
 @app.route('/log-in')
 @app.route('/sign-in')
@@ -145,7 +308,7 @@ def aws_cognito_redirect():
 @app.route('/', methods=['GET'])
 @aws_auth.authentication_required
 def index():
-    claims = aws_auth.claims
+    claims = g.cognito_claims
     # Get the user's assigned Cognito user pool group
     cognito_user_group_arn = get_user_group_arns(claims.get('username'), 
         ssm_parameters['cognito-user-pool-id-value'],
@@ -179,10 +342,17 @@ def found_tags():
     #log.debug('The claims in the received JWT are: %s', claims)
     log.debug('The received cookies are: %s', request.cookies.items())
     session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
-    inventory = resources_tags(resource_type, unit, region)
+    if paged_responses:
+        return render_template('found-tags.html', inventory=list(),
+            inventory_page_url=url_for('api_resources_tags', resource_type=request.form.get('resource_type'),
+                refresh=request.form.get('refresh')))
+    inventory = get_resources_tags_inventory(resource_type, unit, get_refresh_requested(request.form))
+    if stream_responses:
+        tagged_inventory_rows, execution_status = inventory.stream_resources_tags(**session_credentials)
+        return stream_inventory_template('found-tags.html', tagged_inventory_rows, execution_status, 'inventory')
     sorted_tagged_inventory, execution_status = inventory.get_resources_tags(**session_credentials)
     flash(execution_status['status_message'], execution_status['alert_level'])
-    if execution_status.get('alert_level') == 'success':
+    if execution_status.get('alert_level') == 'success' or execution_status.get('alert_level') == 'warning':
         return render_template('found-tags.html', inventory=sorted_tagged_inventory)
     else:
         return render_template('blank.html')
@@ -308,7 +478,8 @@ def select_resource_type():
 @aws_auth.authentication_required
 def tag_filter():
     if request.form.get('resource_type'):
-        return render_template('search-tag-resources-container.html', resource_type=request.form.get('resource_type')) 
+        return render_template('search-tag-resources-container.html', resource_type=request.form.get('resource_type'),
+            refresh=request.form.get('refresh'))
     else:
         return render_template('select-resource-type.html', destination_route='tag_filter')
 
@@ -319,10 +490,12 @@ def tag_based_search():
     if request.args.get('resource_type'):
         resource_type, unit = get_resource_type_unit(request.args.get('resource_type'))
         session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
-        inventory = resources_tags(resource_type, unit, region)
+        inventory = get_resources_tags_inventory(resource_type, unit, get_refresh_requested(request.args))
         selected_tag_keys, execution_status_tag_keys = inventory.get_tag_keys(**session_credentials)
         selected_tag_values, execution_status_tag_values = inventory.get_tag_values(**session_credentials)
-        if execution_status_tag_keys.get('alert_level') == 'success' and execution_status_tag_values.get('alert_level') == 'success':
+        if execution_status_tag_keys.get('alert_level') != 'danger' and execution_status_tag_values.get('alert_level') != 'danger':
+            if execution_status_tag_keys.get('alert_level') == 'warning':
+                flash(execution_status_tag_keys['status_message'], execution_status_tag_keys['alert_level'])
             return render_template('tag-search.html', 
                     resource_type=request.args.get('resource_type'),
                     tag_keys=selected_tag_keys, 
@@ -339,27 +512,39 @@ def tag_based_search():
 def tag_resources():
     #if request.form.get('tag_key1') or request.form.get('tag_key2'):
     if request.form.get('resource_type'):
-        filter_elements = dict()
-        if request.form.get('tag_key1'):
-            filter_elements['tag_key1'] = request.form.get('tag_key1')
-        if request.form.get('tag_value1'):
-            filter_elements['tag_value1'] = request.form.get('tag_value1')
-        if request.form.get('tag_key2'):
-            filter_elements['tag_key2'] = request.form.get('tag_key2')
-        if request.form.get('tag_value2'):
-            filter_elements['tag_value2'] = request.form.get('tag_value2')
-        if request.form.get('conjunction'):
-            filter_elements['conjunction'] = request.form.get('conjunction')
+        # Any number of numbered tag_keyN, tag_valueN & tag_notN search clauses joined by the conjunction
+        filter_elements = get_filter_elements(request.form)
         
         resource_type, unit = get_resource_type_unit(request.form.get('resource_type'))
         session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
-        chosen_resource_inventory = resources_tags(resource_type, unit, region)
+        chosen_resource_inventory = get_resources_tags_inventory(resource_type, unit, get_refresh_requested(request.form))
         chosen_resources = OrderedDict()
-        chosen_resources, resources_execution_status = chosen_resource_inventory.get_resources(filter_elements, **session_credentials)
+        if paged_responses:
+            chosen_resources, resources_execution_status = list(), {'alert_level': 'success'}
+        elif stream_responses:
+            chosen_resources, resources_execution_status = chosen_resource_inventory.stream_resources(filter_elements, **session_credentials)
+        else:
+            chosen_resources, resources_execution_status = chosen_resource_inventory.get_resources(filter_elements, **session_credentials)
         
         tag_group_inventory = get_tag_groups(region, **session_credentials)
         tag_groups_all_info, tag_groups_execution_status = tag_group_inventory.get_all_tag_groups_key_values(region, **session_credentials)
-        if resources_execution_status.get('alert_level') == 'success' and tag_groups_execution_status.get('alert_level') == 'success':
+        if paged_responses:
+            if tag_groups_execution_status.get('alert_level') == 'success':
+                return render_template('tag-resources.html', resource_type=resource_type, resource_inventory=chosen_resources,
+                    tag_groups_all_info=tag_groups_all_info,
+                    inventory_page_url=url_for('api_resources', resource_type=request.form.get('resource_type'),
+                        refresh=request.form.get('refresh'), **filter_elements))
+            flash('You are not authorized to modify these resources', 'danger')
+            return render_template('blank.html')
+        if stream_responses:
+            if tag_groups_execution_status.get('alert_level') == 'success':
+                return stream_inventory_template('tag-resources.html', chosen_resources, resources_execution_status, 'resource_inventory',
+                    resource_type=resource_type, tag_groups_all_info=tag_groups_all_info)
+            flash('You are not authorized to modify these resources', 'danger')
+            return render_template('blank.html')
+        if resources_execution_status.get('alert_level') != 'danger' and tag_groups_execution_status.get('alert_level') == 'success':
+            if resources_execution_status.get('alert_level') == 'warning':
+                flash(resources_execution_status['status_message'], resources_execution_status['alert_level'])
             return render_template('tag-resources.html', resource_type=resource_type, resource_inventory=chosen_resources, tag_groups_all_info=tag_groups_all_info) 
         else:
             flash('You are not authorized to modify these resources', 'danger')
@@ -380,7 +565,7 @@ def apply_tags_to_resources():
     
         resource_type, unit = get_resource_type_unit(request.form.get('resource_type'))
         session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
-        chosen_resources_to_tag = resources_tags(resource_type, unit, region) 
+        chosen_resources_to_tag = get_resources_tags_inventory(resource_type, unit)
         form_contents.pop("resource_type")
         form_contents.pop("csrf_token")
 
@@ -391,16 +576,52 @@ def apply_tags_to_resources():
                 tag_kv["Key"] = key
                 tag_kv["Value"] = value
                 chosen_tags.append(tag_kv)
-        execution_status = chosen_resources_to_tag.set_resources_tags(resources_to_tag, chosen_tags, **session_credentials)
-        flash(execution_status['status_message'], execution_status['alert_level'])
-        if execution_status.get('alert_level') == 'success':
-            updated_sorted_tagged_inventory = dict()
-            all_sorted_tagged_inventory, all_sorted_tagged_inventory_execution_status = chosen_resources_to_tag.get_resources_tags(**session_credentials)
-            for resource_id in resources_to_tag:
-                updated_sorted_tagged_inventory[resource_id] = all_sorted_tagged_inventory[resource_id]   
-            return render_template('updated-tags.html', inventory=updated_sorted_tagged_inventory)
-        else:
-            return render_template('blank.html')
+        # Tag the resources in a background job so long writes never hold a request thread
+        job_id = tag_tamer_tag_jobs.submit(g.cognito_claims.get('username'), chosen_resources_to_tag, resources_to_tag, chosen_tags,
+            **session_credentials)
+        return render_template('tag-job.html', job_id=job_id)
+    else:
+        return render_template('blank.html')
+
+# Returns the JSON progress of the user's bulk tagging job: its state, done, failed & remaining resource counts
+# & the result of every tagged resource
+@app.route('/tag-jobs/<job_id>', methods=['GET'])
+@aws_auth.authentication_required
+def get_tag_job(job_id):
+    job = tag_tamer_tag_jobs.get_job(job_id, g.cognito_claims.get('username'))
+    if job is None:
+        return jsonify(job_id=job_id, status={'status_message': 'The tagging job was not found', 'alert_level': 'danger'}), 404
+    return jsonify(job.get_progress())
+
+# Cancels the user's bulk tagging job before its next chunk of resources & returns its JSON progress
+@app.route('/tag-jobs/<job_id>/cancel', methods=['POST'])
+@aws_auth.authentication_required
+def cancel_tag_job(job_id):
+    job = tag_tamer_tag_jobs.cancel(job_id, g.cognito_claims.get('username'))
+    if job is None:
+        return jsonify(job_id=job_id, status={'status_message': 'The tagging job was not found', 'alert_level': 'danger'}), 404
+    return jsonify(job.get_progress())
+
+# Delivers HTML UI showing the resources a finished bulk tagging job tagged & their current tags
+@app.route('/tag-jobs/<job_id>/results', methods=['GET'])
+@aws_auth.authentication_required
+def tag_job_results(job_id):
+    job = tag_tamer_tag_jobs.get_job(job_id, g.cognito_claims.get('username'))
+    if job is None:
+        flash('The tagging job was not found', 'danger')
+        return render_template('blank.html')
+    job_progress = job.get_progress()
+    execution_status = job_progress['status']
+    flash(execution_status['status_message'], execution_status['alert_level'])
+    if job_progress['done']:
+        session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
+        # Only read back the resources now carrying the chosen tags
+        updated_sorted_tagged_inventory, updated_execution_status = job.inventory.get_resources_tags_by_id(
+            [resource_id for resource_id, result in job_progress['results'].items() if result == 'success' or result == 'unchanged'],
+            **session_credentials)
+        if updated_execution_status.get('alert_level') != 'success':
+            flash(updated_execution_status['status_message'], updated_execution_status['alert_level'])
+        return render_template('updated-tags.html', inventory=updated_sorted_tagged_inventory)
     else:
         return render_template('blank.html')
 
@@ -582,10 +803,65 @@ def set_roles_tags():
         flash('Please select at least one Tag Group and IAM SSO Role.', 'warning')
         return redirect(url_for('select_roles_tags'))
 
+# Returns one JSON page of the resources of the resource_type query string argument matching the tag search of
+# its tag_keyN, tag_valueN, tag_notN & conjunction arguments.  Pages sort by resource "name", "id", "region" or "account".
+# Every inventory API reads resources & tags from AWS instead of the inventory store & cached tag indexes for the
+# first page of a request with a non-empty refresh argument
+@app.route('/api/resources', methods=['GET'])
+@aws_auth.authentication_required
+def api_resources():
+    def _get_rows(resource_type, unit):
+        session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
+        named_resources, execution_status = get_resources_tags_inventory(resource_type, unit, get_refresh_requested(request.args)).get_resources(
+            get_filter_elements(request.args), **session_credentials)
+        return ((resource[0], resource[1], resource[2], resource[3] if len(resource) > 3 else '')
+            for resource in named_resources), execution_status
+    return get_inventory_page_response(resource_page_sort_keys, _get_rows,
+        lambda row: {'resource_id': row[0], 'resource_name': row[1], 'region': row[2], 'account': row[3] or None})
+
+# Returns one JSON page of the resources of the resource_type query string argument & their tags.
+# Pages sort by resource "id", "region" or "account"
+@app.route('/api/resources-tags', methods=['GET'])
+@aws_auth.authentication_required
+def api_resources_tags():
+    def _get_rows(resource_type, unit):
+        session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
+        tagged_inventory, execution_status = get_resources_tags_inventory(resource_type, unit,
+            get_refresh_requested(request.args)).get_resources_tags(**session_credentials)
+        return (((inventory_key[0] if len(inventory_key) > 2 else ''), inventory_key[-2], inventory_key[-1], resource_tags)
+            for inventory_key, resource_tags in tagged_inventory.items()), execution_status
+    return get_inventory_page_response(tags_page_sort_keys, _get_rows,
+        lambda row: {'account': row[0] or None, 'region': row[1], 'resource_id': row[2], 'tags': row[3]})
+
+# Returns one JSON page of the tag keys of the resource_type query string argument
+@app.route('/api/tag-keys', methods=['GET'])
+@aws_auth.authentication_required
+def api_tag_keys():
+    def _get_rows(resource_type, unit):
+        session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
+        return get_resources_tags_inventory(resource_type, unit, get_refresh_requested(request.args)).get_tag_keys(**session_credentials)
+    return get_inventory_page_response(value_page_sort_keys, _get_rows, lambda tag_key: tag_key)
+
+# Returns one JSON page of the tag values of the resource_type query string argument
+@app.route('/api/tag-values', methods=['GET'])
+@aws_auth.authentication_required
+def api_tag_values():
+    def _get_rows(resource_type, unit):
+        session_credentials = get_user_session_credentials(request.cookies.get('id_token'))
+        return get_resources_tags_inventory(resource_type, unit, get_refresh_requested(request.args)).get_tag_values(**session_credentials)
+    return get_inventory_page_response(value_page_sort_keys, _get_rows, lambda tag_value: tag_value)
+
+# Returns the AWS API call counters & latency histograms by service, operation, route & outcome and the request
+# latency histograms by route in the Prometheus text format
+@app.route('/metrics', methods=['GET'])
+@aws_auth.authentication_required
+def metrics():
+    return tag_tamer_api_metrics.get_prometheus_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/logout', methods=['GET'])
 @aws_auth.authentication_required
 def logout():
-    claims = aws_auth.claims
+    claims = g.cognito_claims
     log.info("User \"{}\" signed out on {}".format(claims.get('username'), date_time_now()))
     response = make_response(render_template('logout.html'))
     response.delete_cookie('access_token')
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Bulk writers applying the same tags to many resources with as few API calls as possible.
+# Every writer returns a dictionary of resource ID -> None if the resource was tagged or the
+# Boto3 ClientError that prevented tagging it.
+# Included class & methods
+# class - ec2_tag_writer
+#  method - create_tags
+# class - tagging_api_tag_writer
+#  method - tag_resources
+# function - get_tag_changes
+# function - write_tag_changes
+# function - record_tag_writes
+# function - record_first_tag_writes
+# function - record_tag_write_errors
+# function - get_tag_write_results
+# function - get_tag_write_status
+
+# Import administrative functions
+from admin import execution_status
+# Import AWS module for python
+import botocore
+# Import collections to group resources needing the same tag changes
+from collections import OrderedDict
+# Import the thread pool counting AWS API calls for the request using it, to send tag batches concurrently
+from api_metrics import context_thread_pool
+# Import logging module
+import logging
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import the inventory store kept current with tag writes
+from inventory_store import tag_tamer_inventory_store
+# Import the cached account ID lookup
+from sts import get_account_id
+# Import write-through updates of the cached tag indexes
+from tag_index import patch_cached_tag_indexes, invalidate_cached_tag_indexes, peek_cached_tag_index
+# Import sleep to back off before retrying failed resources & epoch time method
+from time import sleep, time
+
+log = logging.getLogger(__name__)
+
+# Define ec2_tag_writer class to tag EC2 instances & EBS volumes with batched CreateTags requests
+class ec2_tag_writer:
+
+    #Class constructor
+    # CreateTags accepts up to 1000 resource IDs per request; smaller batches let more requests
+    # run in parallel & keep the cost of isolating a failing resource low
+    def __init__(self, region, batch_size=200, max_workers=8, max_attempts=4, **session_credentials):
+        self.region = region
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.client = tag_tamer_session_pool.get_client('ec2', self.region, **session_credentials)
+
+    # Tag a batch of resources with one CreateTags request.  A failed request tags none of its resources.
+    # When it failed on a resource ID the batch is split in half & retried until the failing resources are
+    # isolated.  Throttled requests are resent after backing off & any other error fails the whole batch
+    def _create_tags_batch(self, resource_ids, tags):
+        for attempt in range(self.max_attempts):
+            if attempt:
+                sleep(0.2 * 2 ** attempt)
+            try:
+                self.client.create_tags(
+                    Resources=resource_ids,
+                    Tags=tags
+                )
+                return {resource_id: None for resource_id in resource_ids}
+            except botocore.exceptions.ClientError as error:
+                error_code = error.response['Error']['Code']
+                if error_code == 'RequestLimitExceeded' and attempt + 1 < self.max_attempts:
+                    log.debug("Backing off the throttled CreateTags batch of {} resources".format(len(resource_ids)))
+                    continue
+                if len(resource_ids) > 1 and _is_resource_id_error(error_code):
+                    log.debug("Splitting the CreateTags batch of {} resources - {}".format(len(resource_ids), error))
+                    middle = len(resource_ids) // 2
+                    write_errors = self._create_tags_batch(resource_ids[:middle], tags)
+                    write_errors.update(self._create_tags_batch(resource_ids[middle:], tags))
+                    return write_errors
+                log.error("Boto3 API returned error: resources {} - {}".format(resource_ids, error))
+                return {resource_id: error for resource_id in resource_ids}
+
+    # Returns a dictionary of resource ID -> None or ClientError after applying tags, a list of
+    # {'Key': ..., 'Value': ...} dictionaries, to every resource ID using concurrent batches
+    def create_tags(self, resource_ids, tags):
+        resource_ids = list(dict.fromkeys(resource_ids))
+        batches = [resource_ids[start:start + self.batch_size] for start in range(0, len(resource_ids), self.batch_size)]
+        write_errors = dict()
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            for batch_errors in executor.map(lambda batch: self._create_tags_batch(batch, tags), batches):
+                write_errors.update(batch_errors)
+        return write_errors
+
+# Returns True if an EC2 error code reports a bad resource ID, which fails the request of every resource ID sent with it
+def _is_resource_id_error(error_code):
+    return error_code.startswith('InvalidInstanceID.') or error_code.startswith('InvalidVolumeID.') or \
+        error_code in ('InvalidVolume.NotFound', 'InvalidID')
+
+# Define tagging_api_tag_writer class to tag resources of any type, addressed by ARN, with batched
+# Resource Groups Tagging API TagResources requests.  TagResources adds to or updates a resource's
+# existing tags so Amazon S3 bucket tags are preserved without reading them first
+class tagging_api_tag_writer:
+
+    #Class constructor
+    # TagResources accepts up to 20 ARNs per request
+    def __init__(self, region, batch_size=20, max_workers=8, max_attempts=3, **session_credentials):
+        self.region = region
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.client = tag_tamer_session_pool.get_client('resourcegroupstaggingapi', self.region, **session_credentials)
+
+    # Tag a batch of resource ARNs, resending only the ARNs reported in FailedResourcesMap with a
+    # server-side error until max_attempts requests were made
+    def _tag_resources_batch(self, resource_arns, tags):
+        write_errors = dict()
+        for attempt in range(self.max_attempts):
+            if attempt:
+                sleep(0.2 * 2 ** attempt)
+            try:
+                response = self.client.tag_resources(
+                    ResourceARNList=resource_arns,
+                    Tags=tags
+                )
+            except botocore.exceptions.ClientError as error:
+                log.error("Boto3 API returned error: resources {} - {}".format(resource_arns, error))
+                write_errors.update({resource_arn: error for resource_arn in resource_arns})
+                return write_errors
+            write_errors.update({resource_arn: None for resource_arn in resource_arns})
+            retry_arns = list()
+            for resource_arn, failure in response.get('FailedResourcesMap', dict()).items():
+                # Report each failed resource the way Boto3 reports a failed API call
+                write_errors[resource_arn] = botocore.exceptions.ClientError(
+                    {'Error': {'Code': failure.get('ErrorCode'), 'Message': failure.get('ErrorMessage')}}, 'TagResources')
+                if failure.get('StatusCode', 500) >= 500:
+                    retry_arns.append(resource_arn)
+                else:
+                    log.error("Tagging API failed to tag resource {} - {}".format(resource_arn, failure))
+            if not retry_arns:
+                return write_errors
+            log.debug("Retrying TagResources for {} resources".format(len(retry_arns)))
+            resource_arns = retry_arns
+        for resource_arn in resource_arns:
+            log.error("Tagging API failed to tag resource {} - {}".format(resource_arn, write_errors[resource_arn]))
+        return write_errors
+
+    # Returns a dictionary of resource ARN -> None or ClientError after applying tags, a list of
+    # {'Key': ..., 'Value': ...} dictionaries, to every resource ARN using concurrent batches
+    def tag_resources(self, resource_arns, tags):
+        resource_arns = list(dict.fromkeys(resource_arns))
+        tag_dict = {tag['Key']: tag['Value'] for tag in tags}
+        batches = [resource_arns[start:start + self.batch_size] for start in range(0, len(resource_arns), self.batch_size)]
+        write_errors = dict()
+        with context_thread_pool(max_workers=self.max_workers) as executor:
+            for batch_errors in executor.map(lambda batch: self._tag_resources_batch(batch, tag_dict), batches):
+                write_errors.update(batch_errors)
+        return write_errors
+
+# Returns a list of (tags to write, resource IDs) tuples grouping the resources that need the same
+# changes to carry every chosen tag & the list of resource IDs already carrying every chosen tag.
+# current_tags is a dictionary of resource ID -> tags dictionary or None for a resource without a tag
+# set; resources missing from current_tags are written every chosen tag
+def get_tag_changes(resource_ids, chosen_tags, current_tags):
+    chosen_tag_dict = OrderedDict((tag['Key'], tag['Value']) for tag in chosen_tags)
+    tag_changes = OrderedDict()
+    unchanged_resource_ids = list()
+    for resource_id in dict.fromkeys(resource_ids):
+        if resource_id in current_tags:
+            resource_tags = current_tags[resource_id] or dict()
+            changed_tags = tuple((tag_key, tag_value) for tag_key, tag_value in chosen_tag_dict.items()
+                if resource_tags.get(tag_key) != tag_value)
+        else:
+            changed_tags = tuple(chosen_tag_dict.items())
+        if changed_tags:
+            tag_changes.setdefault(changed_tags, list()).append(resource_id)
+        else:
+            unchanged_resource_ids.append(resource_id)
+    return [([{'Key': tag_key, 'Value': tag_value} for tag_key, tag_value in changed_tags], changed_resource_ids)
+        for changed_tags, changed_resource_ids in tag_changes.items()], unchanged_resource_ids
+
+# Returns a dictionary of resource ID -> None or ClientError after applying each (tags, resource IDs)
+# change set with write_function(resource_ids, tags) & patching the cached tag indexes of the region & unit
+def write_tag_changes(region, unit, tag_changes, write_function):
+    write_errors = dict()
+    for tags, resource_ids in tag_changes:
+        change_errors = write_function(resource_ids, tags)
+        record_tag_writes(region, unit, [resource_id for resource_id, error in change_errors.items() if error is None], tags)
+        write_errors.update(change_errors)
+    record_tag_write_errors(region, unit, write_errors)
+    return write_errors
+
+# Write-through update of the cached tag indexes & the inventory store for the region & unit after
+# chosen_tags, a list of {'Key': ..., 'Value': ...} dictionaries, are applied to resource_ids
+def record_tag_writes(region, unit, resource_ids, chosen_tags):
+    patch_cached_tag_indexes(region, unit, resource_ids, chosen_tags)
+    tag_dict = {tag['Key']: tag['Value'] for tag in chosen_tags}
+    # Resource IDs are unique across accounts & buckets are stored under the region they were listed from
+    tag_tamer_inventory_store.apply_deltas([(None, None if unit == 'buckets' else region, unit, resource_id, 'tag', tag_dict, time())
+        for resource_id in resource_ids])
+
+# Add resources of the region & unit tagged for the first time that are missing from the user's cached tag index,
+# which only holds tagged resources when its inventory engine does not list untagged resources, & the inventory store
+def record_first_tag_writes(region, unit, resource_ids, chosen_tags, **session_credentials):
+    if not resource_ids:
+        return
+    applied_tags = [(tag['Key'], tag['Value']) for tag in chosen_tags]
+    inventory_index = peek_cached_tag_index(region, unit, **session_credentials)
+    if inventory_index is not None:
+        for resource_id in resource_ids:
+            if resource_id not in inventory_index.resource_numbers:
+                inventory_index.add_resource(resource_id, applied_tags)
+    account_id = get_account_id(region, **session_credentials) if tag_tamer_inventory_store.path is not None else None
+    if account_id is not None:
+        tag_tamer_inventory_store.apply_deltas([(account_id, region, unit, resource_id, 'create', dict(applied_tags), time())
+            for resource_id in resource_ids])
+
+# Invalidate the cached tag indexes of the region & unit when a tag write found a resource that no longer
+# exists, as the indexes still list it.  write_errors is a writer's dictionary of resource ID -> None or ClientError
+def record_tag_write_errors(region, unit, write_errors):
+    missing_resource_ids = [resource_id for resource_id, error in write_errors.items()
+        if error is not None and _is_missing_resource_error(error)]
+    if missing_resource_ids:
+        log.info("Invalidating the cached {} inventories of {} - resources not found: {}".format(unit, region, ', '.join(missing_resource_ids)))
+        invalidate_cached_tag_indexes(region, unit)
+        tag_tamer_inventory_store.apply_deltas([(None, None if unit == 'buckets' else region, unit, resource_id, 'delete', None, time())
+            for resource_id in missing_resource_ids])
+
+# Returns True if a tag write's ClientError reports that the resource does not exist
+def _is_missing_resource_error(error):
+    error_code = error.response.get('Error', dict()).get('Code') or ''
+    return error_code.endswith('NotFound') or error_code.startswith('NoSuch') or error_code == 'ResourceNotFoundException'
+
+# Returns a dictionary of resource ID -> 'success', 'unchanged' or the AWS error code of a tag write & the
+# execution status of the whole write built from a writer's dictionary of resource ID -> None or ClientError
+# & the list of resource IDs skipped because they already carried every chosen tag
+def get_tag_write_results(write_errors, unchanged_resource_ids=()):
+    resources_updated_tags = dict()
+    for resource_id, error in write_errors.items():
+        if error is None:
+            resources_updated_tags[resource_id] = 'success'
+        else:
+            resources_updated_tags[resource_id] = error.response['Error']['Code']
+    for resource_id in unchanged_resource_ids:
+        resources_updated_tags[resource_id] = 'unchanged'
+    return resources_updated_tags, get_tag_write_status(resources_updated_tags)
+
+# Returns the execution status of a tag write from its dictionary of resource ID -> 'success', 'unchanged'
+# or the AWS error code
+def get_tag_write_status(resources_updated_tags):
+    my_status = execution_status()
+    changed_count = len([result for result in resources_updated_tags.values() if result == 'success'])
+    unchanged_count = len([result for result in resources_updated_tags.values() if result == 'unchanged'])
+    failed_resource_ids = [resource_id for resource_id, result in resources_updated_tags.items()
+        if result != 'success' and result != 'unchanged']
+    if not failed_resource_ids:
+        my_status.success(message='Tags updated successfully!  {} resources changed & {} resources already had these tags.'.format(
+            changed_count, unchanged_count))
+    elif changed_count or unchanged_count:
+        my_status.warning(message='Tags updated on {} of {} resources.  Tags were not applied to: {}'.format(
+            changed_count + unchanged_count, len(resources_updated_tags), ', '.join(failed_resource_ids)))
+    elif any(resources_updated_tags[resource_id] == 'AccessDeniedException' or \
+        resources_updated_tags[resource_id] == 'UnauthorizedOperation' or \
+        resources_updated_tags[resource_id] == 'AccessDenied' for resource_id in failed_resource_ids):
+        my_status.error(message='You are not authorized to modify these resources')
+    else:
+        my_status.error()
+    return my_status.get_status()
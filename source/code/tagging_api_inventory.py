@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+# Resource & tag inventory engine using the AWS Resource Groups Tagging API.
+# One paginated GetResources call stream returns the ARNs & tags of every
+# resource of a type, replacing per-bucket & per-function tag reads.
+# The Tagging API only returns resources that are or have been tagged.
+# Included class & methods
+# class - tagging_api_inventory
+#  method - get_resources_tags
+#  method - get_resources_tags_by_arn
+#  method - walk_tag_index
+#  method - get_tag_index
+# function - get_resource_id
+# function - get_resource_arn
+
+# Import the Boto3 session & client pool shared across requests
+from session_pool import tag_tamer_session_pool
+# Import single-pass index of resources & tags
+from tag_index import tag_index
+
+# Resource Groups Tagging API resource type filter for each Tag Tamer unit
+resource_type_filters = {
+    'instances': 'ec2:instance',
+    'volumes': 'ec2:volume',
+    'buckets': 's3',
+    'functions': 'lambda:function'
+}
+
+# Returns the resource ID Tag Tamer uses for a resource ARN.  Instances & volumes
+# use their EC2 ID, buckets their name & Lambda functions their full ARN
+def get_resource_id(unit, resource_arn):
+    if unit == 'instances' or unit == 'volumes':
+        return resource_arn.split('/')[-1]
+    elif unit == 'buckets':
+        return resource_arn.split(':::')[-1]
+    else:
+        return resource_arn
+
+# Returns the ARN of a bucket or Lambda function from the resource ID Tag Tamer uses for it
+def get_resource_arn(unit, resource_id, partition='aws'):
+    if unit == 'buckets':
+        return 'arn:' + partition + ':s3:::' + resource_id
+    else:
+        return resource_id
+
+# Define tagging_api_inventory class to get resources & their tags using the Tagging API
+class tagging_api_inventory:
+
+    #Class constructor
+    def __init__(self, region, **session_credentials):
+        self.region = region
+        self.client = tag_tamer_session_pool.get_client('resourcegroupstaggingapi', self.region, **session_credentials)
+
+    # Yields a (resource ID, list of (key, value) tag tuples) tuple for every resource of the unit.
+    # tag_filters is an optional Tagging API TagFilters list; every filter must match.
+    # Boto3 ClientErrors are raised to the caller so it may fall back to another engine
+    def get_resources_tags(self, unit, tag_filters=None):
+        paginate_arguments = {
+            'ResourceTypeFilters': [resource_type_filters[unit]],
+            'ResourcesPerPage': 100
+        }
+        if tag_filters:
+            paginate_arguments['TagFilters'] = tag_filters
+        paginator = self.client.get_paginator('get_resources')
+        for page in paginator.paginate(**paginate_arguments):
+            for resource in page['ResourceTagMappingList']:
+                yield get_resource_id(unit, resource['ResourceARN']), \
+                    [(tag['Key'], tag['Value']) for tag in resource.get('Tags', list())]
+
+    # Returns a dictionary of resource ID -> tags dictionary for the given resource ARNs of the unit, reading
+    # up to 100 ARNs per call.  Resources that were never tagged are not returned by the Tagging API
+    def get_resources_tags_by_arn(self, unit, resource_arns):
+        resources_tags = dict()
+        resource_arns = list(resource_arns)
+        paginator = self.client.get_paginator('get_resources')
+        for start in range(0, len(resource_arns), 100):
+            for page in paginator.paginate(ResourceARNList=resource_arns[start:start + 100]):
+                for resource in page['ResourceTagMappingList']:
+                    resources_tags[get_resource_id(unit, resource['ResourceARN'])] = \
+                        {tag['Key']: tag['Value'] for tag in resource.get('Tags', list())}
+        return resources_tags
+
+    # Adds every resource of the unit to the tag index, yielding its (resource ID, tags dictionary) tuple
+    # as each page arrives
+    def walk_tag_index(self, inventory_index, unit):
+        for resource_id, tags in self.get_resources_tags(unit):
+            inventory_index.add_resource(resource_id, tags)
+            yield resource_id, inventory_index.get_resource_tags(resource_id)
+
+    # Returns a tag index of every resource of the unit
+    def get_tag_index(self, unit):
+        inventory_index = tag_index()
+        for _ in self.walk_tag_index(inventory_index, unit):
+            pass
+        inventory_index.my_status.success(message='Resources and tags found!')
+        return inventory_index
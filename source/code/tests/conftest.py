@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tag Tamer's modules import each other from the source/code directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
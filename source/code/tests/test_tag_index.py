@@ -0,0 +1,21 @@
+from tag_filters import compile_tag_filters
+from tag_index import tag_index
+
+
+def test_find_tag_of_first_resource_only():
+    inventory_index = tag_index()
+    inventory_index.add_resource("i-0", [("Env", "prod")])
+    inventory_index.add_resource("i-1", [("Env", "dev")])
+    assert inventory_index.find_resources(compile_tag_filters({"tag_key1": "Env", "tag_value1": "prod"})) == ["i-0"]
+    assert inventory_index.find_resources(compile_tag_filters({"tag_key1": "Env", "tag_value1": "prod", "tag_not1": "yes"})) == ["i-1"]
+
+
+def test_find_tag_key_after_retagging():
+    inventory_index = tag_index()
+    inventory_index.add_resource("i-0", [("Env", "prod")])
+    inventory_index.add_resource("i-1", [("Env", "prod"), ("Owner", "ops")])
+    inventory_index.add_resource("i-2", None)
+    inventory_index.add_resource("i-1", [("Env", "dev")])
+    assert inventory_index.find_resources(compile_tag_filters({"tag_key1": "Env"})) == ["i-0", "i-1"]
+    assert inventory_index.find_resources(compile_tag_filters({"tag_key1": "Owner"})) == []
+    assert inventory_index.get_resource_tags("i-2") is None
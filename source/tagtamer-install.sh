@@ -10,7 +10,9 @@ mkdir -p /home/ec2-user/tag-tamer/prod
 chown -R ec2-user:ec2-user /home/ec2-user/tag-tamer
 #pip3 install boto3 botocore flask flask-WTF gunicorn Flask_jwt_Extended flask_login
 #pip3 install /var/tmp/tagtamer/source/Flask-AWSCognito
-su - ec2-user -c "python3 -m venv /home/ec2-user/tag-tamer/prod;source /home/ec2-user/tag-tamer/prod/bin/activate; pip3 install boto3 botocore flask flask-WTF gunicorn Flask_jwt_Extended flask_login /var/tmp/tagtamer/source/Flask-AWSCognito; deactivate"
+# Flask-AWSCognito uses Flask's _app_ctx_stack, removed in Flask 2.3, & streamed responses need Flask 2.2
+# aiobotocore sends the calls of the asyncio API call engine & pins the botocore versions pip can install
+su - ec2-user -c "python3 -m venv /home/ec2-user/tag-tamer/prod;source /home/ec2-user/tag-tamer/prod/bin/activate; pip3 install boto3 botocore aiobotocore 'flask>=2.2,<2.3' 'werkzeug>=2.2.2,<2.3' flask-WTF gunicorn Flask_jwt_Extended flask_login /var/tmp/tagtamer/source/Flask-AWSCognito; deactivate"
 
 # Copy code and config
 cd /var/tmp/tagtamer/source
@@ -18,6 +20,7 @@ cp config/tag-tamer.conf /etc/nginx/conf.d
 cp config/proxy_params /etc/nginx
 cp config/ssl-redirect.conf  /etc/nginx/default.d/
 cp config/tagtamer.service /etc/systemd/system
+cp config/tagtamer-inventory-events.service /etc/systemd/system
 cp -pr code/* to /home/ec2-user/tag-tamer/
 
 mkdir -p /home/ec2-user/tag-tamer/log
@@ -26,7 +29,7 @@ touch /var/log/tag-tamer/tag-tamer.err.log
 touch /var/log/tag-tamer/tag-tamer.out.log
 
 # Permissions
-chown root:root /etc/nginx/conf.d/tag-tamer.conf /etc/nginx/proxy_params /etc/nginx/default.d/ssl-redirect.conf /etc/systemd/system/tagtamer.service
+chown root:root /etc/nginx/conf.d/tag-tamer.conf /etc/nginx/proxy_params /etc/nginx/default.d/ssl-redirect.conf /etc/systemd/system/tagtamer.service /etc/systemd/system/tagtamer-inventory-events.service
 chown -R ec2-user:ec2-user /home/ec2-user/tag-tamer /var/log/tag-tamer
 
 dos2unix /home/ec2-user/tag-tamer/*.py
@@ -42,4 +45,5 @@ openssl dhparam -out /etc/pki/nginx/dhparam.pem 2048
 
 # Enable and start services
 systemctl  enable tagtamer.service; systemctl  start tagtamer.service
+systemctl  enable tagtamer-inventory-events.service; systemctl  start tagtamer-inventory-events.service
 systemctl enable nginx; systemctl start nginx
\ No newline at end of file